@@ -0,0 +1,8 @@
+"""Benchmarks for the Streamlit pipeline, run from the repository root with `python -m benchmarks.<name>`."""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the Streamlit app modules (utils, pages helpers) importable the same way the app imports them
+sys.path.insert(0, os.path.join(REPO_ROOT, 'streamlit'))
@@ -0,0 +1,31 @@
+"""Runs a benchmark by name, e.g. `python -m benchmarks e2e --output e2e.json`; without a name, lists them."""
+import importlib
+import pkgutil
+import sys
+
+import benchmarks
+
+
+def available():
+    return sorted(
+        module.name for module in pkgutil.iter_modules(benchmarks.__path__)
+        if not module.name.startswith('_') and module.name not in ('stub_es', 'synthetic')
+    )
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        print('\nBenchmarks:', ', '.join(available()))
+        return
+    name = sys.argv[1]
+    if name not in available():
+        raise SystemExit(f"Unknown benchmark '{name}', expected one of: {', '.join(available())}")
+    module = importlib.import_module(f'benchmarks.{name}')
+    # Each benchmark parses sys.argv itself, so hand it its own arguments
+    sys.argv = [f'benchmarks {name}', *sys.argv[2:]]
+    module.main()
+
+
+if __name__ == '__main__':
+    main()
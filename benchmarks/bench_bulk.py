@@ -0,0 +1,97 @@
+"""Docs/sec and peak RSS of the streaming bulk indexer vs the old in-memory helpers.bulk path.
+
+Each run happens in its own subprocess, so peak RSS covers only that indexing path; the stub ES
+also runs in a separate process and only counts documents.
+
+    python -m benchmarks.bench_bulk --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from elasticsearch import Elasticsearch, helpers
+
+from benchmarks.synthetic import synthetic_clients
+from es_index import COMBINED_TABLE, document_hash, sync_client_index
+from utils import build_client_combined
+
+
+def build_database(db_path, rows):
+    with sqlite3.connect(db_path) as conn:
+        for df_client, df_student in synthetic_clients(rows):
+            df = build_client_combined(df_client, df_student)
+            records = df.to_dict(orient='records')
+            df['doc_hash'] = [document_hash({k: v for k, v in r.items() if not pd.isna(v)}) for r in records]
+            df.to_sql(COMBINED_TABLE, conn, if_exists='append', index=False)
+
+
+def peak_rss_mb():
+    """Peak RSS of this process; VmHWM is used on Linux because ru_maxrss survives exec from a larger parent."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(mode, db_path, url, threads):
+    es = Elasticsearch(url, request_timeout=120)
+    start = time.perf_counter()
+    if mode == 'legacy':
+        with sqlite3.connect(db_path) as conn:
+            df = pd.read_sql(f"SELECT * FROM {COMBINED_TABLE}", conn).drop(columns='doc_hash')
+        actions = [
+            {"_index": "bench_legacy", "_id": str(record['client id']), "_source": record}
+            for record in df.to_dict(orient='records')
+        ]
+        docs, _ = helpers.bulk(es, actions)
+    else:
+        report = sync_client_index(es, db_path, alias=f"bench_{os.getpid()}", full_rebuild=True, thread_count=threads)
+        docs = report['updated']
+    seconds = time.perf_counter() - start
+    print(json.dumps({'docs': docs, 'seconds': seconds, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--worker', choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker, args.db, args.url, args.threads)
+
+    stub = subprocess.Popen([sys.executable, '-m', 'benchmarks.stub_es', '--discard-sources'], stdout=subprocess.PIPE, text=True)
+    url = stub.stdout.readline().strip()
+    try:
+        print(f"{'rows':>8} {'mode':>10} {'docs/s':>10} {'peak RSS MB':>12}")
+        for rows in args.rows:
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, 'bench.db')
+                build_database(db_path, rows)
+                for mode in ('legacy', 'streaming'):
+                    out = subprocess.run(
+                        [sys.executable, '-m', 'benchmarks.bench_bulk', '--worker', mode, '--db', db_path, '--url', url, '--threads', str(args.threads)],
+                        capture_output=True, text=True, check=True
+                    )
+                    result = json.loads(out.stdout.strip().splitlines()[-1])
+                    print(f"{rows:>8} {mode:>10} {result['docs'] / result['seconds']:>10.0f} {result['peak_rss_mb']:>12.0f}")
+    finally:
+        stub.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Time to first render of a new session in a fresh Streamlit process, without and with streamlit/warmup.py.
+
+Every (mode, page) pair runs in its own process, on its own copy of a synthetic dataset, next to
+fastapi/remote_bank.py and the stub Elasticsearch. 'cold' opens the page straight away, the way the first
+user after `docker-compose up` did; 'warmed' first runs warmup.warm_up() in the process, as the container
+does before its healthcheck passes. 'first render' is the page's first script run, 'data ready' adds the
+reruns until the background jobs the session follows are done (the data the page shows is complete).
+
+    python -m benchmarks.bench_cold_start --clients 10000 --transactions 50000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import REPO_ROOT
+from benchmarks.bench_remote_bank import SERVER_DIR, free_port, wait_until_up
+from benchmarks.e2e import synthetic_dataset, write_dataset
+from benchmarks.stub_es import start_stub_server
+
+APP_DIR = os.path.join(REPO_ROOT, 'streamlit')
+PAGES = {
+    'Bank API': None,
+    'Existing Tables': 'pages/2_Existing_Tables.py',
+    'Combined Clients': 'pages/3_Combined_Clients.py',
+    'Match ClientID': 'pages/4_Match_ClientID.py',
+    'Sync ERP': 'pages/5_Sync_ERP.py',
+    'Search': 'pages/6_Search.py',
+}
+MODES = ('cold', 'warmed')
+# Reruns while waiting for the session's background jobs, and the pause between them
+MAX_RERUNS = 600
+RERUN_SECONDS = 0.1
+
+
+def open_page(directory, page, warm):
+    """Opens page in a new session of this process and prints its timings as JSON."""
+    os.chdir(directory)
+    warm_up_seconds = None
+    if warm:
+        import warmup
+
+        start = time.perf_counter()
+        warmup.warm_up(os.path.join(directory, 'warmup.json'))
+        warm_up_seconds = time.perf_counter() - start
+
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(APP_DIR, 'Bank_API.py'), default_timeout=600)
+    if PAGES[page]:
+        app.switch_page(PAGES[page])
+    start = time.perf_counter()
+    app.run()
+    first_render = time.perf_counter() - start
+    for _ in range(MAX_RERUNS):
+        if not app.session_state['jobs']:
+            break
+        time.sleep(RERUN_SECONDS)
+        app.run()
+    data_ready = time.perf_counter() - start
+    print(json.dumps({
+        'warm_up_seconds': warm_up_seconds, 'first_render': first_render, 'data_ready': data_ready,
+        'exceptions': [exception.value for exception in app.exception],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--transactions', type=int, default=50000)
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+    parser.add_argument('--worker', nargs=3, metavar=('DIRECTORY', 'PAGE', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        directory, page, mode = args.worker
+        return open_page(directory, page, mode == 'warmed')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = os.path.join(tmp, 'dataset')
+        df_client, df_student, df_bank_remote = synthetic_dataset(args.clients, args.transactions)
+        remote_path = write_dataset(dataset, df_client, df_student, df_bank_remote, synced_share=0.5)
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'remote_bank:app', '--app-dir', SERVER_DIR, '--port', str(port), '--log-level', 'warning'],
+            env={**os.environ, 'REMOTE_BANK_DATABASE_URL': f'sqlite:///{remote_path}', 'ERP_DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'erp.db')}"}
+        )
+        stub, es_url = start_stub_server()
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            wait_until_up(base_url)
+            env = {**os.environ, 'BANK_API_URL': base_url, 'ELASTIC_URL': es_url, 'MATCHER_BACKEND': 'local', 'ERP_URL': base_url + '/erp'}
+            print(f"{'page':>16} {'mode':>7} {'warm-up s':>10} {'first render s':>15} {'data ready s':>13}")
+            for page in args.pages:
+                for mode in MODES:
+                    directory = os.path.join(tmp, f'{mode}-{len(os.listdir(tmp))}')
+                    shutil.copytree(dataset, directory)
+                    output = subprocess.run(
+                        [sys.executable, '-m', 'benchmarks.bench_cold_start', '--worker', directory, page, mode],
+                        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+                    ).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    warm_up = f"{result['warm_up_seconds']:.2f}" if result['warm_up_seconds'] is not None else '-'
+                    print(f"{page:>16} {mode:>7} {warm_up:>10} {result['first_render']:>15.2f} {result['data_ready']:>13.2f}"
+                          + (f"   exceptions: {result['exceptions']}" if result['exceptions'] else ''))
+        finally:
+            server.terminate()
+            server.wait()
+            stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Duplicate-client detection at growing sizes: time per stage, pairs compared, and pairwise precision/recall.
+
+Clients come from benchmarks.synthetic.synthetic_duplicates (the generate_random_dataset.ipynb scheme),
+whose 'entity' column says which rows really are the same client or family.
+
+    python -m benchmarks.bench_dedupe --sizes 5000 100000 1000000 --workers 4
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_duplicates
+from dedupe import DEFAULT_THRESHOLD, find_duplicates
+
+
+def pair_count(sizes):
+    return int((sizes * (sizes - 1) // 2).sum())
+
+
+def precision_recall(df, duplicates):
+    """Pairwise precision and recall of the matched sets against the true entities."""
+    predicted = pd.Series(0, index=df.index)
+    predicted[duplicates.index] = duplicates['matched_set']
+    # Rows outside every set are singletons, so give each its own negative set number
+    predicted[predicted == 0] = -pd.RangeIndex(1, (predicted == 0).sum() + 1)
+    true_pairs = pair_count(df.groupby('entity').size())
+    found_pairs = pair_count(predicted.value_counts())
+    correct = pair_count(pd.DataFrame({'entity': df['entity'], 'set': predicted}).groupby(['entity', 'set']).size())
+    return correct / max(found_pairs, 1), correct / max(true_pairs, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 100000, 1000000])
+    parser.add_argument('--workers', type=int, default=None, help='scoring processes (default: one per CPU)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    print(f"{'clients':>9} {'all pairs':>14} {'compared':>11} {'blocking':>9} {'scoring':>8} {'union':>7} "
+          f"{'total s':>8} {'sets':>8} {'precision':>9} {'recall':>7}")
+    for size in args.sizes:
+        df = synthetic_duplicates(size)
+        stats = {}
+        start = time.perf_counter()
+        duplicates = find_duplicates(df.drop(columns='entity'), threshold=args.threshold, workers=args.workers, stats=stats)
+        total = time.perf_counter() - start
+        precision, recall = precision_recall(df, duplicates)
+        print(f"{size:>9} {size * (size - 1) // 2:>14} {stats['compared_pairs']:>11} {stats['blocking_seconds']:>9.2f} "
+              f"{stats['scoring_seconds']:>8.2f} {stats['clustering_seconds']:>7.2f} {total:>8.2f} {stats['clusters']:>8} "
+              f"{precision:>9.3f} {recall:>7.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Payments/sec posting matched payments to the stand-in ERP: one payment per request vs batches over a worker pool.
+
+Each mode gets a fresh outbox and a fresh fastapi/erp_stand_in.py database, served by uvicorn with
+--latency seconds added to every request in place of the round trip to a real ERP. 'row by row' is the old
+draft's shape (one payment per request, one connection); the others post through erp.export_payments.
+
+    python -m benchmarks.bench_erp --payments 20000 --latency 0.02
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+import requests
+
+from benchmarks import REPO_ROOT
+from benchmarks.bench_remote_bank import SERVER_DIR, free_port, wait_until_up
+
+sys.path.insert(0, os.path.join(REPO_ROOT, 'streamlit'))
+
+from erp import ERPOutbox, HttpConnector, build_payments, export_payments  # noqa: E402
+
+# (batch size, workers)
+MODES = {'row by row': (1, 1), 'batches': (100, 1), 'batches + pool': (100, 4)}
+
+
+def matched_bank(payments):
+    """A matched bank frame with payments incoming transactions, a few of them without a client."""
+    return pd.DataFrame({
+        'id': range(10000000, 10000000 + payments),
+        'date': '2024-01-01',
+        'sender': 'Sender',
+        'description': 'Tuition',
+        'amount': 100.0,
+        'matched client id': pd.array([None if i % 50 == 0 else 1000 + i % 5000 for i in range(payments)], dtype='Int64'),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payments', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every ERP request')
+    args = parser.parse_args()
+
+    df_bank_matched = matched_bank(args.payments)
+    print(f"{'mode':>15} {'payments':>9} {'batches':>8} {'seconds':>8} {'payments/s':>11} {'failed':>7} {'in ERP':>7}")
+    for mode, (batch_size, workers) in MODES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'uvicorn', 'erp_stand_in:app', '--app-dir', SERVER_DIR, '--port', str(port), '--log-level', 'warning'],
+                env={**os.environ, 'ERP_DATABASE_URL': f"sqlite:///{os.path.join(directory, 'erp.db')}", 'ERP_LATENCY_SECONDS': str(args.latency)}
+            )
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                wait_until_up(base_url)
+                outbox = ERPOutbox(os.path.join(directory, 'streamlit.db'))
+                outbox.enqueue(build_payments(df_bank_matched, outbox.load()))
+                connector = HttpConnector(base_url, workers=workers)
+                report = export_payments(outbox, connector, batch_size=batch_size, workers=workers)
+                connector.close()
+                in_erp = requests.get(base_url + '/payments/count').json()['count']
+            finally:
+                server.terminate()
+                server.wait()
+        posted = report['sent'] + report['duplicates'] + report['rejected']
+        print(f"{mode:>15} {posted:>9} {report['batches']:>8} {report['seconds']:>8.2f} {report['payments_per_second']:>11.0f} "
+              f"{report['rejected'] + report['failed']:>7} {in_erp:>7}")
+
+
+if __name__ == '__main__':
+    main()
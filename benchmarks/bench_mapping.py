@@ -0,0 +1,109 @@
+"""Query latency and index size of es_client_combined's explicit mapping vs the old dynamic mapping.
+
+Indexes notebooks/csv/clients_with_duplicates.csv (5k clients) twice, once with no mapping and
+multi_match over every field, once through es_index.index_template() and a match on its search field,
+then times the same name queries against both. Needs a real Elasticsearch; latencies from the
+benchmarks.stub_es stand-in are meaningless.
+
+    python -m benchmarks.bench_mapping --queries 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import pandas as pd
+from elasticsearch import Elasticsearch, helpers
+
+import config
+from benchmarks import REPO_ROOT
+from es_index import SEARCH_FIELD, ensure_index_template
+
+CSV_PATH = os.path.join(REPO_ROOT, 'notebooks', 'csv', 'clients_with_duplicates.csv')
+BEFORE_INDEX = 'bench_mapping_before'
+AFTER_ALIAS = 'bench_mapping_after'
+
+
+def load_documents():
+    df = pd.read_csv(CSV_PATH, encoding='utf-8-sig', dtype={'legal': str}).rename(columns={'id': 'client id'})
+    return [{key: value for key, value in record.items() if not pd.isna(value)} for record in df.to_dict(orient='records')]
+
+
+def build_index(es, index_name, documents):
+    """Loads the documents into a fresh index, merges it to one segment and returns its store size in bytes."""
+    es.indices.delete(index=index_name, ignore_unavailable=True)
+    es.indices.create(index=index_name)
+    helpers.bulk(es, ({'_index': index_name, '_id': f"{i}", '_source': doc} for i, doc in enumerate(documents)))
+    es.indices.refresh(index=index_name)
+    es.indices.forcemerge(index=index_name, max_num_segments=1)
+    stats = es.indices.stats(index=index_name)['indices'][index_name]['primaries']
+    return stats['store']['size_in_bytes']
+
+
+def sample_queries(documents, count, seed=0):
+    """Bank-style search terms: client names, sometimes with an email local part or legal id."""
+    rng = random.Random(seed)
+    queries = []
+    for doc in rng.choices(documents, k=count):
+        extra = rng.choice([doc.get('email1', '').split('@')[0], doc.get('legal', ''), ''])
+        queries.append(f"{doc.get('name', '')} {extra}".strip())
+    return queries
+
+
+def time_queries(es, index_name, query_for, queries):
+    """Returns (server 'took' ms, client wall ms, top hit ids) for every query."""
+    took, wall, top = [], [], []
+    for text in queries:
+        start = time.perf_counter()
+        response = es.search(index=index_name, query=query_for(text), size=2)
+        wall.append((time.perf_counter() - start) * 1000)
+        took.append(response['took'])
+        hits = response['hits']['hits']
+        top.append(hits[0]['_id'] if hits else None)
+    return took, wall, top
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=config.ELASTIC_URL)
+    parser.add_argument('--user', default=config.ELASTIC_USER)
+    parser.add_argument('--password', default=config.ELASTIC_PASSWORD)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--keep', action='store_true', help='leave the benchmark indices in place')
+    args = parser.parse_args()
+
+    es = Elasticsearch(args.url, basic_auth=(args.user, args.password), verify_certs=config.ELASTIC_VERIFY_CERTS, ca_certs=config.ELASTIC_CA_CERTS, ssl_show_warn=False, request_timeout=120)
+    documents = load_documents()
+    queries = sample_queries(documents, args.queries)
+
+    after_index = f'{AFTER_ALIAS}_1'
+    ensure_index_template(es, AFTER_ALIAS)
+    runs = {
+        'dynamic': (BEFORE_INDEX, lambda text: {'multi_match': {'query': text, 'fields': ['*'], 'type': 'best_fields', 'minimum_should_match': '1'}}),
+        'explicit': (after_index, lambda text: {'match': {SEARCH_FIELD: {'query': text, 'minimum_should_match': '1'}}}),
+    }
+    results = {}
+    try:
+        print(f"{'mapping':>9} {'size KB':>8} {'took p50':>9} {'took p95':>9} {'wall p50':>9} {'wall p95':>9}")
+        for name, (index_name, query_for) in runs.items():
+            size = build_index(es, index_name, documents)
+            time_queries(es, index_name, query_for, queries[:50])  # warm caches
+            took, wall, top = time_queries(es, index_name, query_for, queries)
+            results[name] = top
+            print(f"{name:>9} {size / 1024:>8.0f} {percentile(took, 50):>9.1f} {percentile(took, 95):>9.1f} "
+                  f"{percentile(wall, 50):>9.1f} {percentile(wall, 95):>9.1f}")
+        same = sum(a == b for a, b in zip(results['dynamic'], results['explicit']))
+        print(f"same top hit for {same} of {len(queries)} queries")
+    finally:
+        if not args.keep:
+            es.indices.delete(index=f'{BEFORE_INDEX},{after_index}', ignore_unavailable=True)
+            es.indices.delete_index_template(name=f'{AFTER_ALIAS}_template')
+
+
+if __name__ == '__main__':
+    main()
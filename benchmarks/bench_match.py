@@ -0,0 +1,96 @@
+"""Rows-per-second of ClientID matching: per-row Search.execute() vs batched _msearch, against the local stub ES.
+
+Runs in a temporary directory holding a copy of databases/streamlit.db, so the app's database and snapshots
+are not touched.
+
+    python -m benchmarks.bench_match --rows 1000 10000 100000 --latency 0.002
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Search
+
+from benchmarks import REPO_ROOT
+from benchmarks.stub_es import start_stub_server
+import utils
+from match_cache import normalize_search_terms
+
+SAMPLE_DB = os.path.join(REPO_ROOT, 'databases', 'streamlit.db')
+SENDERS = ['Acme Inc.', 'Globex Corporation', 'Initech', 'Witch Foods', '', '']
+WORDS = ['Karina', 'Weeks', 'Anders', 'Klein', 'Elianna', 'Evans', 'Fiona', 'Jaylan', 'Rebecca', 'Camilla', '4', '8', '12']
+
+
+def make_bank_terms(rows, seed=42):
+    rng = random.Random(seed)
+    terms = [
+        f"{rng.choice(SENDERS)} {' '.join(rng.choices(WORDS, k=rng.randint(0, 3)))}"
+        for _ in range(rows)
+    ]
+    return pd.DataFrame({'bank search terms': terms})
+
+
+def per_row_match(es, dataframe, index_name, min_score_difference=1.0):
+    """The pre-batching path: one Search.execute() round trip per bank row, with the query and terms production sends."""
+    def get_clientid(text):
+        if not text:
+            return None
+        response = Search(using=es, index=index_name).query(utils.match_query(text)).extra(size=2).execute()
+        if len(response.hits) == 0:
+            return None
+        if len(response.hits) == 1 or response.hits[0].meta.score - response.hits[1].meta.score >= min_score_difference:
+            return response.hits[0].meta.id
+        return None
+    return normalize_search_terms(dataframe['bank search terms']).apply(get_clientid).astype('Int64')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated network round trip per request (s)')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--per-row-limit', type=int, default=10000, help='skip the slow per-row baseline above this size')
+    args = parser.parse_args()
+
+    # utils reads and writes databases/ relative to the working directory
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'databases'))
+        shutil.copy(SAMPLE_DB, os.path.join(tmp, 'databases', 'streamlit.db'))
+        os.chdir(tmp)
+        try:
+            st.session_state.logs = []
+            server, url = start_stub_server(latency=args.latency)
+            es = Elasticsearch(url)
+
+            print(f"{'rows':>8} {'per-row rows/s':>15} {'batched rows/s':>15} {'speedup':>8} {'identical':>10}")
+            for rows in args.rows:
+                df = make_bank_terms(rows)
+
+                start = time.perf_counter()
+                batched = utils.get_highest_relevance_clientid(df.copy(), 'es_client_combined', batch_size=args.batch_size, max_workers=args.workers, es=es, use_cache=False)
+                batched_rate = rows / (time.perf_counter() - start)
+
+                if rows <= args.per_row_limit:
+                    start = time.perf_counter()
+                    baseline = per_row_match(es, df, 'es_client_combined')
+                    per_row_rate = rows / (time.perf_counter() - start)
+                    identical = baseline.equals(batched['matched client id'])
+                    print(f"{rows:>8} {per_row_rate:>15.0f} {batched_rate:>15.0f} {batched_rate / per_row_rate:>7.1f}x {str(identical):>10}")
+                else:
+                    print(f"{rows:>8} {'-':>15} {batched_rate:>15.0f} {'-':>8} {'-':>10}")
+
+            server.shutdown()
+            print("'identical' compares both paths against the stub Elasticsearch, which ignores relevance.")
+        finally:
+            os.chdir(REPO_ROOT)
+
+
+if __name__ == '__main__':
+    main()
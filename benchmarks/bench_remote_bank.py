@@ -0,0 +1,175 @@
+"""Rows/sec and server peak RSS of the remote bank date range endpoint.
+
+Compares the old ORM query (three queries, ORM objects, one JSON array), the Core select returning one
+JSON array, keyset pages of --page-size rows, and the NDJSON stream. 'revalidate' pages through the range a
+second time with the ETags of the first pass in If-None-Match, so its pages come back 304 without a body. Each
+mode gets a fresh uvicorn process over the same generated database, so peak RSS covers that mode only.
+
+    python -m benchmarks.bench_remote_bank --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import requests
+
+from benchmarks import REPO_ROOT
+
+SERVER_DIR = os.path.join(REPO_ROOT, 'fastapi')
+TYPES = ['Transfer', 'Direct Debit', 'Card Payment', 'Standing Order']
+MODES = ('legacy', 'json', 'paged', 'ndjson', 'revalidate')
+
+
+def build_database(db_path, rows, days):
+    """Writes rows transactions spread evenly over days, ending today, into bank_remote."""
+    rng = random.Random(0)
+    first_day = date.today() - timedelta(days=days - 1)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE bank_remote (id INTEGER PRIMARY KEY, date DATE, type VARCHAR, sender VARCHAR, "
+            "description VARCHAR, amount FLOAT)"
+        )
+        conn.executemany(
+            "INSERT INTO bank_remote VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (10000000 + i, (first_day + timedelta(days=i * days // rows)).isoformat(), rng.choice(TYPES),
+                 f"Sender {rng.randint(1, 50000)}", f"Invoice {rng.randint(1, 999999)}", round(rng.uniform(5, 500), 2))
+                for i in range(rows)
+            )
+        )
+
+
+def peak_rss_mb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def serve(port):
+    """Runs remote_bank with the pre-change endpoint mounted at /legacy/date_range/."""
+    import uvicorn
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import Session
+
+    sys.path.insert(0, SERVER_DIR)
+    import remote_bank
+    from remote_bank import RemoteBank, Transaction, app, engine
+
+    @app.get('/legacy/date_range/', response_model=list[Transaction])
+    def legacy_date_range(start_date: date, end_date: date):
+        with Session(engine) as session:
+            adjusted_start = session.query(func.min(RemoteBank.date)).filter(RemoteBank.date >= start_date).scalar()
+            adjusted_end = session.query(func.max(RemoteBank.date)).filter(RemoteBank.date <= end_date).scalar()
+            if not adjusted_start or not adjusted_end:
+                return []
+            stmt = select(RemoteBank).where(RemoteBank.date.between(adjusted_start, adjusted_end))
+            return session.execute(stmt).scalars().all()
+
+    uvicorn.run(remote_bank.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(base_url + '/openapi.json', timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def fetch(mode, base_url, params, page_size, validated=None):
+    """Returns the number of rows the mode received for params.
+
+    Pages walk the range with X-Next-Cursor. Given validated, a {cursor: (ETag, rows, next cursor)} dict, they
+    are asked for with the ETag it holds for their cursor, and it is filled with the ones they come back with.
+    """
+    if mode == 'legacy':
+        return len(requests.get(base_url + '/legacy/date_range/', params=params).json())
+    if mode == 'json':
+        return len(requests.get(base_url + '/transactions/date_range/', params=params).json())
+    if mode == 'ndjson':
+        with requests.get(base_url + '/transactions/date_range/', params={**params, 'format': 'ndjson'}, stream=True) as response:
+            return sum(1 for line in response.iter_lines() if line and json.loads(line))
+
+    rows, cursor = 0, None
+    while True:
+        page_params = {**params, 'limit': page_size, **({'cursor': cursor} if cursor else {})}
+        known = validated.get(cursor) if validated is not None else None
+        response = requests.get(base_url + '/transactions/date_range/', params=page_params,
+                                headers={'If-None-Match': known[0]} if known else {})
+        if response.status_code == 304:
+            rows += known[1]
+            cursor = known[2]
+        else:
+            page = len(response.json())
+            rows += page
+            next_cursor = response.headers.get('X-Next-Cursor')
+            if validated is not None:
+                validated[cursor] = (response.headers['ETag'], page, next_cursor)
+            cursor = next_cursor
+        if not cursor:
+            return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=1095, help='days the rows are spread over')
+    parser.add_argument('--range-days', type=int, default=365, help='days requested from the endpoint')
+    parser.add_argument('--page-size', type=int, default=10000)
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve)
+
+    end = date.today()
+    params = {'start_date': (end - timedelta(days=args.range_days - 1)).isoformat(), 'end_date': end.isoformat()}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'remote_bank.db')
+        build_database(db_path, args.rows, args.days)
+        env = {**os.environ, 'REMOTE_BANK_DATABASE_URL': f'sqlite:///{db_path}', 'ERP_DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'erp.db')}"}
+
+        print(f"{'mode':>10} {'rows':>9} {'seconds':>8} {'rows/s':>9} {'server peak RSS MB':>19}")
+        counts = {}
+        for mode in MODES:
+            port = free_port()
+            server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_remote_bank', '--serve', str(port)], env=env)
+            validated = {} if mode == 'revalidate' else None
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                wait_until_up(base_url)
+                if mode == 'revalidate':
+                    # The first pass downloads every page and keeps its ETag
+                    fetch(mode, base_url, params, args.page_size, validated)
+                start = time.perf_counter()
+                counts[mode] = fetch(mode, base_url, params, args.page_size, validated)
+                seconds = time.perf_counter() - start
+                print(f"{mode:>10} {counts[mode]:>9} {seconds:>8.2f} {counts[mode] / seconds:>9.0f} {peak_rss_mb(server.pid):>19.0f}")
+            finally:
+                server.terminate()
+                server.wait()
+        if len(set(counts.values())) != 1:
+            raise SystemExit(f"modes returned different row counts: {counts}")
+
+
+if __name__ == '__main__':
+    main()
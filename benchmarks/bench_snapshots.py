@@ -0,0 +1,78 @@
+"""Cold-start time and memory of the shared frames: rebuilt from SQLite vs memory-mapped Arrow snapshots.
+
+Each mode runs in a fresh process over the same synthetic streamlit.db and loads what a cold session needs
+for the Combined Clients and Match ClientID pages: the bank frame, the combined clients and the bank search
+terms. 'sqlite' is the path without snapshots, 'first run' builds the frames and writes their snapshots,
+and 'snapshot' is every later start.
+
+    python -m benchmarks.bench_snapshots --clients 100000 --transactions 500000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import REPO_ROOT
+from benchmarks.e2e import synthetic_dataset, write_dataset
+
+MODES = {'sqlite': '0', 'first run': '1', 'snapshot': '1'}
+
+
+def memory_mb():
+    """Returns (current, peak) resident set size of this process in MB."""
+    values = {}
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(('VmRSS:', 'VmHWM:')):
+                values[line.split(':')[0]] = int(line.split()[1]) / 1024
+    return values['VmRSS'], values['VmHWM']
+
+
+def cold_load(directory):
+    """Loads the shared frames the way a cold session does and prints seconds and memory as JSON."""
+    os.chdir(directory)
+    import streamlit as st
+    import utils
+    from instrumentation import log_buffer
+
+    st.session_state.logs = log_buffer()
+    baseline, _ = memory_mb()
+    start = time.perf_counter()
+    df_bank = utils.shared_table('bank')
+    df_client_combined = utils.shared_client_combined()
+    df_bank_terms = utils._shared_bank_terms(utils.get_table_version(utils.db_path, 'bank'))
+    seconds = time.perf_counter() - start
+    rss, peak = memory_mb()
+    frames_mb = sum(frame.memory_usage(deep=True).sum() for frame in (df_bank, df_client_combined, df_bank_terms)) / 2 ** 20
+    print(json.dumps({'seconds': seconds, 'rss_mb': rss - baseline, 'peak_mb': peak - baseline, 'frames_mb': frames_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=500000)
+    parser.add_argument('--worker', metavar='DIRECTORY', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return cold_load(args.worker)
+
+    with tempfile.TemporaryDirectory() as directory:
+        df_client, df_student, df_bank_remote = synthetic_dataset(args.clients, args.transactions)
+        write_dataset(directory, df_client, df_student, df_bank_remote, synced_share=1.0)
+
+        print(f"{'mode':>10} {'seconds':>8} {'RSS MB':>8} {'peak MB':>8} {'frames MB':>10}")
+        for mode, snapshots in MODES.items():
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_snapshots', '--worker', directory],
+                cwd=REPO_ROOT, env={**os.environ, 'SNAPSHOTS': snapshots}, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>10} {result['seconds']:>8.2f} {result['rss_mb']:>8.0f} {result['peak_mb']:>8.0f} {result['frames_mb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
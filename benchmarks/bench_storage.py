@@ -0,0 +1,101 @@
+"""Inserts/sec of storage.upsert vs the old DataFrame.to_sql append into the bank table.
+
+The sequential run writes --rows rows in syncs of --batch rows each. The concurrent run has --threads
+sessions sync the same batches at once, the way several open browser tabs do, and counts lock errors
+and duplicate ids.
+
+    python -m benchmarks.bench_storage --rows 200000 --batch 1000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+import storage
+
+TYPES = ['transfer received', 'direct debit received', 'Bank fee', 'Expense payment']
+SCHEMA = (
+    'CREATE TABLE bank (id INTEGER, date TEXT, type TEXT, sender TEXT, description TEXT, amount REAL, '
+    'bank_synced TEXT, bank_sync_date TEXT, erp_synced TEXT, erp_sync_date TEXT)'
+)
+
+
+def synthetic_batches(rows, batch, seed=0):
+    rng = random.Random(seed)
+    frame = pd.DataFrame({
+        'id': range(10000000, 10000000 + rows),
+        'date': [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(rows)],
+        'type': [rng.choice(TYPES) for _ in range(rows)],
+        'sender': [f"Sender {rng.randint(1, 5000)}" for _ in range(rows)],
+        'description': [f"Invoice {rng.randint(1, 99999)}" for _ in range(rows)],
+        'amount': [round(rng.uniform(-500, 500), 2) for _ in range(rows)],
+        'bank_sync_date': '2024-10-13 12:27:53',
+    })
+    return [frame.iloc[i:i + batch] for i in range(0, rows, batch)]
+
+
+def create_bank(db_path, unique):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(SCHEMA)
+        if unique:
+            conn.execute('CREATE UNIQUE INDEX idx_bank_id ON bank (id)')
+
+
+def to_sql_sync(db_path, frame):
+    """The pre-storage sync_transactions write."""
+    with sqlite3.connect(db_path) as conn:
+        frame.to_sql('bank', conn, if_exists='append', index=False)
+
+
+def upsert_sync(db_path, frame):
+    storage.upsert(db_path, 'bank', frame, key='id', update_columns=['date', 'type', 'sender', 'description', 'amount'])
+
+
+def run(path, db_path, batches, threads):
+    errors = []
+
+    def session():
+        for frame in batches:
+            try:
+                path(db_path, frame)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=session) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+    with sqlite3.connect(db_path) as conn:
+        stored, distinct = conn.execute('SELECT COUNT(*), COUNT(DISTINCT id) FROM bank').fetchone()
+    return seconds, len(errors), stored - distinct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=1000, help='rows per sync')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent sessions in the concurrent run')
+    args = parser.parse_args()
+
+    batches = synthetic_batches(args.rows, args.batch)
+    print(f"{'run':>10} {'path':>7} {'rows/s':>9} {'lock errors':>12} {'duplicate ids':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in (1, args.threads):
+            run_name = 'sequential' if threads == 1 else f'{threads} threads'
+            for name, path, unique in (('to_sql', to_sql_sync, False), ('upsert', upsert_sync, True)):
+                db_path = os.path.join(tmp, f'{name}_{threads}.db')
+                create_bank(db_path, unique)
+                seconds, errors, duplicates = run(path, db_path, batches, threads)
+                print(f"{run_name:>10} {name:>7} {args.rows * threads / seconds:>9.0f} {errors:>12} {duplicates:>14}")
+
+
+if __name__ == '__main__':
+    main()
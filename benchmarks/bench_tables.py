@@ -0,0 +1,113 @@
+"""Render time and payload of the Bank API table: whole frame with a per-row Styler vs one page from tables.py.
+
+'whole frame' is the old page1 path: fillna and date formatting over every row, Styler.apply(highlight_rows,
+axis=1), all of it marshalled for the browser. 'first page' sorts the frame on the server, then formats,
+highlights and marshals one page; 'next rerun' is the same page on a rerun, when the sorted order is reused.
+Payload is the size of the Arrow message st.dataframe would send.
+
+    python -m benchmarks.bench_tables --rows 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from pandas.io.formats.style import Styler
+from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+from streamlit.errors import StreamlitAPIException
+from streamlit.proto.Arrow_pb2 import Arrow as ArrowProto
+
+from benchmarks import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, 'streamlit'))
+
+from tables import PAGE_ROWS, filter_positions, format_dates, page_view, sort_positions, synced_today  # noqa: E402
+
+COLUMNS = ['id', 'date', 'type', 'sender', 'description', 'amount', 'bank_sync_date']
+
+
+def bank_frame(rows, seed=0):
+    """Bank rows over the last year, a tenth of them synced today."""
+    rng = np.random.default_rng(seed)
+    today = datetime.now()
+    dates = [(today - timedelta(days=int(days))).strftime('%Y-%m-%d') for days in rng.integers(0, 365, rows)]
+    synced = [(today - timedelta(days=int(days))).strftime('%Y-%m-%d %H:%M:%S') for days in rng.integers(0, 10, rows)]
+    return pd.DataFrame({
+        'id': np.arange(10000000, 10000000 + rows),
+        'date': dates,
+        'type': rng.choice(['Transfer', 'Direct Debit', 'Card Payment'], rows),
+        'sender': rng.choice(['Acme Inc.', 'Globex Corporation', None], rows),
+        'description': [f"Invoice {n}" for n in rng.integers(1, 999999, rows)],
+        'amount': rng.uniform(5, 500, rows).round(2),
+        'bank_sync_date': synced,
+        'erp_synced': None,
+    })
+
+
+def payload_bytes(data):
+    """Size of the Arrow message st.dataframe builds for a frame or Styler."""
+    proto = ArrowProto()
+    if isinstance(data, Styler):
+        marshall_styler(proto, data, 'bench')
+        data = data.data
+    proto.data = convert_anything_to_arrow_bytes(data)
+    return proto.ByteSize()
+
+
+def whole_frame(df_bank):
+    """The pre-change page1 body."""
+    df = df_bank[COLUMNS].sort_values(by='date', ascending=False).fillna(value="")
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%m/%d/%Y')
+    df['bank_sync_date'] = pd.to_datetime(df['bank_sync_date']).dt.strftime('%m/%d/%Y').fillna("")
+
+    def highlight_rows(s):
+        today_str = datetime.now().strftime('%m/%d/%Y')
+        if s['bank_sync_date'] and s['bank_sync_date'] == today_str:
+            return ['background-color: #d2f4ea'] * len(s)
+        return [''] * len(s)
+
+    return payload_bytes(df.style.apply(highlight_rows, axis=1))
+
+
+def one_page(df_bank, positions=None):
+    if positions is None:
+        positions = sort_positions(df_bank, filter_positions(df_bank, '', COLUMNS), 'date', False)
+    page = page_view(
+        df_bank, positions[:PAGE_ROWS], COLUMNS, highlight=lambda page: synced_today(page['bank_sync_date']),
+        formatters={'date': format_dates, 'bank_sync_date': format_dates}, fill_value=''
+    )
+    return payload_bytes(page), positions
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return time.perf_counter() - start, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'mode':>12} {'ms':>9} {'payload KB':>11}")
+    for rows in args.rows:
+        df_bank = bank_frame(rows)
+        try:
+            seconds, size = timed(whole_frame, df_bank)
+            print(f"{rows:>8} {'whole frame':>12} {seconds * 1000:>9.1f} {size / 1024:>11.1f}")
+        except StreamlitAPIException:
+            # Past styler.render.max_elements cells st.dataframe refuses the Styler and the page shows an error
+            print(f"{rows:>8} {'whole frame':>12} {'fails: too many cells to style':>21}")
+        seconds, (size, positions) = timed(one_page, df_bank)
+        print(f"{rows:>8} {'first page':>12} {seconds * 1000:>9.1f} {size / 1024:>11.1f}")
+        seconds, (size, _) = timed(one_page, df_bank, positions)
+        print(f"{rows:>8} {'next rerun':>12} {seconds * 1000:>9.1f} {size / 1024:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
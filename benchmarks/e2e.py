@@ -0,0 +1,260 @@
+"""End-to-end pipeline timings over seeded synthetic data, written as JSON so runs can be compared.
+
+Builds a fresh streamlit.db (clients, students, and the first --synced-share of the bank transactions, with
+the sync watermark after them) and a remote_bank.db holding every transaction in a temporary directory.
+Starts fastapi/remote_bank.py on it with uvicorn, next to the stub Elasticsearch or the cluster at --es-url,
+then times each stage through the app's own functions: the FastAPI fetch, sync_transactions, combining
+clients, the Elasticsearch upload (full, then incremental), matching (everything, then only what is new)
+and Permissive search. The stub's scores are made up, so match precision/recall only mean something with
+--matcher local or a real cluster.
+
+    python -m benchmarks e2e --clients 10000 --transactions 50000 --output e2e.json
+    python -m benchmarks e2e --clients 10000 --transactions 50000 --compare e2e.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import REPO_ROOT
+from benchmarks.bench_remote_bank import SERVER_DIR, free_port, wait_until_up
+from benchmarks.stub_es import start_stub_server
+from benchmarks.synthetic import synthetic_bank, synthetic_clients
+
+BANK_COLUMNS = ['id', 'date', 'type', 'sender', 'description', 'amount', 'bank_synced', 'bank_sync_date', 'erp_synced', 'erp_sync_date']
+# Stages slower than the compared run by less than this are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def synthetic_dataset(clients, transactions, seed=0, days=365):
+    """Returns the 'client', 'student' and 'bank_remote' frames; bank_remote keeps the paying 'client id'."""
+    frames = list(synthetic_clients(clients, seed=seed))
+    df_client = pd.concat([client for client, _ in frames], ignore_index=True)
+    df_student = pd.concat([student for _, student in frames], ignore_index=True)
+    df_bank_remote = synthetic_bank(df_client, df_student, transactions, seed=seed, days=days)
+    return df_client, df_student, df_bank_remote
+
+
+def write_dataset(directory, df_client, df_student, df_bank_remote, synced_share):
+    """Writes databases/streamlit.db and databases/remote_bank.db under directory; returns the remote database path."""
+    os.makedirs(os.path.join(directory, 'databases'))
+    remote_path = os.path.join(directory, 'databases', 'remote_bank.db')
+    with sqlite3.connect(remote_path) as conn:
+        conn.execute(
+            "CREATE TABLE bank_remote (id INTEGER PRIMARY KEY, date DATE, type VARCHAR, sender VARCHAR, "
+            "description VARCHAR, amount FLOAT)"
+        )
+        remote = df_bank_remote.drop(columns='client id')
+        conn.executemany("INSERT INTO bank_remote VALUES (?, ?, ?, ?, ?, ?)", remote.astype(object).where(remote.notna(), None).itertuples(index=False, name=None))
+
+    synced = df_bank_remote.head(int(len(df_bank_remote) * synced_share)).drop(columns='client id')
+    synced = synced.assign(bank_synced=None, bank_sync_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), erp_synced=None, erp_sync_date=None)
+    with sqlite3.connect(os.path.join(directory, 'databases', 'streamlit.db')) as conn:
+        df_client.to_sql('client', conn, index=False)
+        df_student.to_sql('student', conn, index=False)
+        synced[BANK_COLUMNS].to_sql('bank', conn, index=False)
+        if not synced.empty:
+            last = synced.iloc[-1]
+            watermark = {'start': df_bank_remote['date'].iloc[0], 'date': last['date'], 'id': int(last['id'])}
+            conn.execute("CREATE TABLE app_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("INSERT INTO app_meta VALUES ('bank_watermark', ?)", (json.dumps(watermark),))
+    return remote_path
+
+
+def search_queries(df_client, df_student, count, seed=0):
+    """Returns what people type into Permissive search: name prefixes, full names, handles, students and grades."""
+    rng = random.Random(seed)
+    clients = df_client.sample(n=count, replace=True, random_state=seed).to_dict(orient='records')
+    students = df_student.groupby('associated client id')
+    queries = []
+    for client in clients:
+        student = students.get_group(client['client id']).iloc[0]
+        queries.append(rng.choice([
+            client['name'][:3],
+            f"{client['name']} {client['last name'] or ''}".strip(),
+            (client['handle'] or client['name']).lower(),
+            f"{student['student name']} {student['grade']}",
+        ]))
+    return queries
+
+
+def run_info(args):
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip())
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit + ('-dirty' if dirty else ''),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'tolerance')},
+    }
+
+
+class Stages:
+    """Times stages in order and keeps {name: {'seconds', 'rows', 'rows_per_second', ...}}."""
+
+    def __init__(self):
+        self.results = {}
+
+    def run(self, name, func, rows=None):
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+        count = rows(value) if callable(rows) else rows
+        self.results[name] = {'seconds': round(seconds, 4), 'rows': count}
+        if count:
+            self.results[name]['rows_per_second'] = round(count / seconds, 1)
+        print(f"{name:>16} {seconds:>9.3f} {count if count is not None else '':>9}", flush=True)
+        return value
+
+
+def match_accuracy(db_path, df_bank_remote):
+    """Precision over the matched transactions and recall over the paid ones, against the true payers.
+
+    Also the share of transactions resolved on exact keys, and the precision of those.
+    """
+    with sqlite3.connect(db_path) as conn:
+        stored = pd.read_sql("SELECT id, client_id, method FROM bank_match", conn).set_index('id')
+    truth = df_bank_remote.set_index('id')['client id']
+    matched = stored['client_id'].reindex(truth.index)
+    exact = (stored['method'].reindex(truth.index) == 'exact') & matched.notna()
+    correct = (matched == truth) & truth.notna()
+    return {
+        'matched': int(matched.notna().sum()),
+        'precision': round(int(correct.sum()) / max(int(matched.notna().sum()), 1), 4),
+        'recall': round(int(correct.sum()) / max(int(truth.notna().sum()), 1), 4),
+        'exact_share': round(float(exact.mean()), 4),
+        'exact_precision': round(int((correct & exact).sum()) / max(int(exact.sum()), 1), 4),
+    }
+
+
+def run(args, directory):
+    """Runs every stage inside directory (the app resolves databases/streamlit.db against the working directory)."""
+    df_client, df_student, df_bank_remote = synthetic_dataset(args.clients, args.transactions, seed=args.seed, days=args.days)
+    remote_path = write_dataset(directory, df_client, df_student, df_bank_remote, args.synced_share)
+    queries = search_queries(df_client, df_student, args.queries, seed=args.seed)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'remote_bank:app', '--app-dir', SERVER_DIR, '--port', str(port), '--log-level', 'warning'],
+        env={**os.environ, 'REMOTE_BANK_DATABASE_URL': f'sqlite:///{remote_path}',
+             'ERP_DATABASE_URL': f"sqlite:///{os.path.join(directory, 'databases', 'erp.db')}"}
+    )
+    stub = None
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        wait_until_up(base_url)
+        if args.es_url:
+            es_url = args.es_url
+        else:
+            stub, es_url = start_stub_server(latency=args.latency)
+        # config reads these once, when the app modules are first imported
+        os.environ.update(BANK_API_URL=base_url, ELASTIC_URL=es_url, MATCHER_BACKEND=args.matcher)
+        os.chdir(directory)
+        import streamlit as st
+        import utils
+        from instrumentation import log_buffer, metrics
+
+        st.session_state.logs = log_buffer()
+        metrics.reset()
+        stages = Stages()
+        print(f"{'stage':>16} {'seconds':>9} {'rows':>9}")
+        first_day = date.today() - timedelta(days=args.days - 1)
+        fetched = stages.run('fetch', lambda: utils.found_transactions(first_day, date.today()), rows=len)
+        stages.run('sync', lambda: utils.sync_transactions(fetched), rows=len(fetched))
+        utils.invalidate_shared_data('client_combined')
+        stages.run('combine', utils.shared_client_combined, rows=len)
+        stages.run('index', lambda: utils.upload_data_to_elasticsearch(full_rebuild=True), rows=lambda report: report['updated'])
+        stages.run('index_incremental', utils.upload_data_to_elasticsearch, rows=lambda report: report['updated'] + report['deleted'])
+        stages.run('match', lambda: utils._stage_match({}), rows=len(df_bank_remote))
+        stages.results['match'].update(match_accuracy(utils.db_path, df_bank_remote))
+        # Nothing changed since, so this only finds out that every transaction has a current result
+        stages.run('match_incremental', lambda: utils._stage_match({}))
+        searcher = stages.run('search_build', lambda: utils.client_search(utils.shared_client_combined()), rows=lambda searcher: len(searcher.frame))
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            searcher.search(query)
+            latencies.append(time.perf_counter() - start)
+        stages.results['search'] = {
+            'seconds': round(sum(latencies), 4),
+            'rows': len(queries),
+            'rows_per_second': round(len(queries) / sum(latencies), 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 3),
+        }
+        print(f"{'search':>16} {sum(latencies):>9.3f} {len(queries):>9}")
+        return {'stages': stages.results, 'metrics': metrics.snapshot()}
+    finally:
+        os.chdir(REPO_ROOT)
+        server.terminate()
+        server.wait()
+        if stub:
+            stub.shutdown()
+
+
+def compare(previous, current, tolerance):
+    """Prints stage times against a previous run and returns the stages that got slower by more than tolerance."""
+    if previous['run']['params'] != current['run']['params']:
+        print(f"warning: the compared run used different parameters: {previous['run']['params']}")
+    print(f"\n{'stage':>16} {'before s':>9} {'after s':>9} {'change':>8}   (before: {previous['run']['commit']})")
+    regressions = []
+    for name, stage in current['stages'].items():
+        before = previous['stages'].get(name, {}).get('seconds')
+        if before is None:
+            continue
+        after = stage['seconds']
+        change = (after - before) / before if before else 0.0
+        slower = change > tolerance and after - before > MIN_REGRESSION_SECONDS
+        if slower:
+            regressions.append(name)
+        print(f"{name:>16} {before:>9.3f} {after:>9.3f} {change:>+8.1%}{'   slower' if slower else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--transactions', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=365, help='days the transactions are spread over')
+    parser.add_argument('--synced-share', type=float, default=0.5, help='share of the transactions already in streamlit.db')
+    parser.add_argument('--queries', type=int, default=500, help='Permissive search queries')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--matcher', choices=['elasticsearch', 'local'], default='elasticsearch')
+    parser.add_argument('--es-url', help='run against this cluster instead of the stub')
+    parser.add_argument('--latency', type=float, default=0.0, help="stub's simulated round trip per request (s)")
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='JSON', help='compare against the results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown per stage that counts as a regression')
+    args = parser.parse_args(argv)
+
+    info = run_info(args)
+    with tempfile.TemporaryDirectory() as directory:
+        results = {'run': info, **run(args, directory)}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous:
+            regressions = compare(json.load(previous), results, args.tolerance)
+        if regressions:
+            raise SystemExit(f"Slower than the compared run by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
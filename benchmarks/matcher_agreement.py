@@ -0,0 +1,129 @@
+"""Agreement between the Elasticsearch and local ClientID matchers, and the time each one takes.
+
+Matches the bank search terms from databases/streamlit.db (or --synthetic N generated clients and terms)
+with both backends and reports how often they pick the same client, or agree that a term is ambiguous or
+has no match. Runs against the cluster from config, indexing into a throwaway alias; the database is copied
+first, so the app's data is not touched.
+
+    python -m benchmarks.matcher_agreement
+    python -m benchmarks.matcher_agreement --synthetic 50000 --terms 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+import pandas as pd
+
+from benchmarks import REPO_ROOT
+from benchmarks.synthetic import synthetic_clients
+from es_client import get_client
+from es_index import ensure_index_template, store_client_combined, sync_client_index
+from local_matcher import LocalMatcher
+from match_cache import normalize_search_terms
+from utils import _msearch_clientids, build_client_combined
+
+SAMPLE_DB = os.path.join(REPO_ROOT, 'databases', 'streamlit.db')
+ALIAS = 'bench_matcher_agreement'
+BATCH_SIZE = 200
+
+
+def sample_data(db_path):
+    """Returns the combined clients and bank search terms of the sample database."""
+    with sqlite3.connect(db_path) as conn:
+        df_client = pd.read_sql('SELECT * FROM client', conn)
+        df_student = pd.read_sql('SELECT * FROM student', conn)
+        df_bank = pd.read_sql('SELECT sender, description FROM bank', conn)
+    terms = df_bank['sender'].fillna('') + ' ' + df_bank['description'].fillna('')
+    return build_client_combined(df_client, df_student), terms
+
+
+def synthetic_data(clients, terms, seed=0):
+    """Returns combined synthetic clients and bank-style terms naming a client, their students and grades."""
+    frames = list(synthetic_clients(clients, seed=seed))
+    df_client = pd.concat([client for client, _ in frames], ignore_index=True)
+    df_student = pd.concat([student for _, student in frames], ignore_index=True)
+    rng = random.Random(seed)
+    by_client = df_student.groupby('associated client id')
+    texts = []
+    for client in df_client.sample(n=terms, replace=True, random_state=seed).itertuples(index=False):
+        students = by_client.get_group(client[0])
+        student = students.iloc[rng.randrange(len(students))]
+        texts.append(rng.choice([
+            f"{client.name} {student['student name']} {student['grade']}",
+            f"{student['student name']} {student['student last name']}",
+            f"{client.email1.split('@')[0]} {student['grade']}",
+        ]))
+    return build_client_combined(df_client, df_student), pd.Series(texts)
+
+
+def outcome(result):
+    client_id, _, margin = result
+    if client_id is not None:
+        return 'match'
+    return 'none' if margin is None else 'ambiguous'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, metavar='CLIENTS', help='use this many synthetic clients instead of the sample data')
+    parser.add_argument('--terms', type=int, default=5000, help='synthetic search terms')
+    parser.add_argument('--min-score-difference', type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        df_combined, terms = synthetic_data(args.synthetic, args.terms)
+    else:
+        df_combined, terms = sample_data(SAMPLE_DB)
+    keys = [key for key in normalize_search_terms(terms).unique() if key]
+
+    es = get_client()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'streamlit.db')
+        if not args.synthetic:
+            shutil.copy(SAMPLE_DB, db_path)
+        store_client_combined(df_combined, db_path)
+        index_name = None
+        try:
+            ensure_index_template(es, ALIAS)
+            index_name = sync_client_index(es, db_path, alias=ALIAS, full_rebuild=True)['index']
+
+            start = time.perf_counter()
+            es_results = []
+            for i in range(0, len(keys), BATCH_SIZE):
+                es_results.extend(_msearch_clientids(es, ALIAS, keys[i:i + BATCH_SIZE], args.min_score_difference))
+            es_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            matcher = LocalMatcher(df_combined)
+            build_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            local_results = matcher.match(keys, args.min_score_difference)
+            local_seconds = time.perf_counter() - start
+        finally:
+            if index_name:
+                es.indices.delete(index=index_name, ignore_unavailable=True)
+            es.options(ignore_status=404).indices.delete_index_template(name=f'{ALIAS}_template')
+
+    pairs = Counter((outcome(a), outcome(b)) for a, b in zip(es_results, local_results))
+    same_client = sum(1 for a, b in zip(es_results, local_results) if a[0] is not None and a[0] == b[0])
+    agree = same_client + pairs[('ambiguous', 'ambiguous')] + pairs[('none', 'none')]
+
+    print(f"{len(df_combined)} clients, {len(keys)} unique search terms")
+    print(f"agreement: {agree / len(keys):.1%} ({same_client} same client, "
+          f"{pairs[('ambiguous', 'ambiguous')]} both ambiguous, {pairs[('none', 'none')]} both without matches)")
+    print(f"{'elasticsearch':>14} {'local':>10} {'terms':>7}")
+    for (es_outcome, local_outcome), count in sorted(pairs.items()):
+        print(f"{es_outcome:>14} {local_outcome:>10} {count:>7}")
+    different = pairs[('match', 'match')] - same_client
+    if different:
+        print(f"{'match':>14} {'match':>10} {different:>7}  (different clients)")
+    print(f"elasticsearch: {es_seconds:.2f} s, local: {local_seconds:.2f} s (+ {build_seconds:.2f} s to build)")
+
+
+if __name__ == '__main__':
+    main()
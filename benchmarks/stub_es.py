@@ -0,0 +1,233 @@
+"""A minimal in-process Elasticsearch stand-in for benchmarks that only need the HTTP round trip, not real scoring.
+
+Searches return deterministic fake hits; index, alias, template, settings and _bulk calls are kept in memory.
+"""
+import argparse
+import fnmatch
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_hits(text):
+    """Returns deterministic hits for a search term: none, a clear winner, or two close scores."""
+    checksum = zlib.crc32(text.strip().lower().encode('utf-8'))
+    kind = checksum % 4
+    client_id = str(33000 + checksum % 1000)
+    runner_up = str(33000 + (checksum // 1000) % 1000)
+    score = 2.0 + (checksum % 700) / 100
+    if kind == 0:
+        return []
+    if kind == 1:
+        return [{'_index': 'stub', '_id': client_id, '_score': score, '_source': {}}]
+    gap = 2.5 if kind == 2 else 0.4
+    return [
+        {'_index': 'stub', '_id': client_id, '_score': score, '_source': {}},
+        {'_index': 'stub', '_id': runner_up, '_score': score - gap, '_source': {}},
+    ]
+
+
+def _query_text(query):
+    """Returns the text of a multi_match or single-field match query."""
+    if 'multi_match' in query:
+        return query['multi_match'].get('query', '')
+    if 'match' in query:
+        spec = next(iter(query['match'].values()))
+        return spec.get('query', '') if isinstance(spec, dict) else spec
+    return ''
+
+
+def _search_response(body):
+    text = _query_text(body.get('query', {}))
+    hits = fake_hits(text)[:body.get('size', 10)]
+    return {
+        'took': 1,
+        'timed_out': False,
+        '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+        'hits': {
+            'total': {'value': len(hits), 'relation': 'eq'},
+            'max_score': hits[0]['_score'] if hits else None,
+            'hits': hits,
+        },
+    }
+
+
+class StubCluster:
+    """In-memory indices, aliases and settings shared by all handler threads."""
+
+    def __init__(self, keep_sources=True):
+        self.keep_sources = keep_sources
+        self.lock = threading.Lock()
+        self.indices = {}
+        self.settings = {}
+        self.mappings = {}
+        self.templates = {}
+        self.aliases = {}
+
+    def create_index(self, name, body):
+        """Creates an index, taking settings and mappings from the first matching template and then the body."""
+        template = next((t['template'] for t in self.templates.values()
+                         if any(fnmatch.fnmatch(name, pattern) for pattern in t['index_patterns'])), {})
+        with self.lock:
+            self.indices[name] = {}
+            self.settings[name] = {**template.get('settings', {}), **body.get('settings', {})}
+            self.mappings[name] = body.get('mappings', template.get('mappings', {}))
+
+    def resolve(self, name):
+        return sorted(self.aliases.get(name, set())) or ([name] if name in self.indices else [])
+
+    def bulk(self, raw, default_index=None):
+        lines = [json.loads(line) for line in raw.decode('utf-8').splitlines() if line.strip()]
+        items = []
+        with self.lock:
+            i = 0
+            while i < len(lines):
+                op_type, meta = next(iter(lines[i].items()))
+                source = lines[i + 1] if op_type != 'delete' else None
+                i += 1 if op_type == 'delete' else 2
+                targets = self.resolve(meta.get('_index', default_index))
+                docs = self.indices.setdefault(targets[0] if targets else meta.get('_index', default_index), {})
+                if op_type == 'delete':
+                    status = 200 if docs.pop(meta['_id'], None) is not None else 404
+                else:
+                    status = 200 if meta['_id'] in docs else 201
+                    docs[meta['_id']] = source if self.keep_sources else True
+                items.append({op_type: {'_index': meta.get('_index'), '_id': meta['_id'], 'status': status}})
+        return {'took': 1, 'errors': False, 'items': items}
+
+    def update_aliases(self, actions):
+        with self.lock:
+            for action in actions:
+                kind, spec = next(iter(action.items()))
+                if kind == 'add':
+                    self.aliases.setdefault(spec['alias'], set()).add(spec['index'])
+                elif kind == 'remove':
+                    self.aliases.get(spec['alias'], set()).discard(spec['index'])
+                elif kind == 'remove_index':
+                    self.indices.pop(spec['index'], None)
+            self.aliases = {alias: indices for alias, indices in self.aliases.items() if indices}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+    latency = 0.0
+    request_count = 0
+    cluster = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, payload, status=200):
+        data = json.dumps(payload).encode('utf-8') if self.command != 'HEAD' else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        raw = self._read_body()
+        type(self).request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        cluster = self.cluster
+
+        if parts and parts[-1] == '_msearch':
+            lines = [json.loads(line) for line in raw.decode('utf-8').splitlines() if line.strip()]
+            return self._reply({'took': 1, 'responses': [dict(_search_response(body), status=200) for body in lines[1::2]]})
+        if parts and parts[-1] == '_search':
+            return self._reply(_search_response(json.loads(raw) if raw else {}))
+        if parts and parts[-1] == '_bulk':
+            return self._reply(cluster.bulk(raw, parts[0] if len(parts) > 1 else None))
+        if parts == ['_aliases']:
+            cluster.update_aliases(json.loads(raw)['actions'])
+            return self._reply({'acknowledged': True})
+        if parts and parts[0] == '_alias':
+            found = {index: {'aliases': {parts[1]: {}}} for index in cluster.aliases.get(parts[1], set())}
+            return self._reply(found or {'error': 'alias missing', 'status': 404}, 200 if found else 404)
+        if len(parts) == 2 and parts[1] in ('_refresh', '_flush', '_forcemerge'):
+            return self._reply({'_shards': {'total': 1, 'successful': 1, 'failed': 0}})
+        if parts == ['_cluster', 'health']:
+            return self._reply({'cluster_name': 'stub', 'status': 'green', 'number_of_nodes': 1})
+        if len(parts) == 2 and parts[0] == '_index_template':
+            if self.command == 'DELETE':
+                cluster.templates.pop(parts[1], None)
+            else:
+                cluster.templates[parts[1]] = json.loads(raw)
+            return self._reply({'acknowledged': True})
+        if len(parts) == 2 and parts[1] == '_mapping':
+            return self._reply({index: {'mappings': cluster.mappings.get(index, {})} for index in cluster.resolve(parts[0])})
+        if len(parts) == 2 and parts[1] == '_stats':
+            return self._reply({'indices': {
+                index: {'primaries': {
+                    'docs': {'count': len(cluster.indices.get(index, {}))},
+                    'store': {'size_in_bytes': len(json.dumps(cluster.indices.get(index, {})))},
+                }}
+                for index in cluster.resolve(parts[0])
+            }})
+        if len(parts) == 2 and parts[1] == '_count':
+            return self._reply({'count': sum(len(cluster.indices.get(index, {})) for index in cluster.resolve(parts[0]))})
+        if len(parts) == 2 and parts[1] == '_settings':
+            if self.command == 'PUT':
+                cluster.settings.setdefault(parts[0], {}).update(json.loads(raw).get('index', json.loads(raw)))
+                return self._reply({'acknowledged': True})
+            return self._reply({index: {'settings': {'index': cluster.settings.get(index, {})}} for index in cluster.resolve(parts[0])})
+        if len(parts) == 1:
+            name = parts[0]
+            if self.command == 'HEAD':
+                return self._reply({}, 200 if cluster.resolve(name) else 404)
+            if self.command == 'PUT':
+                cluster.create_index(name, json.loads(raw) if raw else {})
+                return self._reply({'acknowledged': True, 'index': name})
+            if self.command == 'DELETE':
+                with cluster.lock:
+                    for index in name.split(','):
+                        cluster.indices.pop(index, None)
+                return self._reply({'acknowledged': True})
+        return self._reply({
+            'name': 'stub',
+            'cluster_name': 'stub',
+            'version': {'number': '8.11.3', 'build_flavor': 'default'},
+            'tagline': 'You Know, for Search',
+        })
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_DELETE = _handle
+    do_HEAD = _handle
+
+
+def start_stub_server(latency=0.0, keep_sources=True):
+    """Starts the stub on a free local port in a daemon thread and returns (server, url).
+
+    The in-memory cluster is available as server.cluster.
+    """
+    cluster = StubCluster(keep_sources=keep_sources)
+    handler = type('Handler', (StubHandler,), {'latency': latency, 'request_count': 0, 'cluster': cluster})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.cluster = cluster
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+if __name__ == '__main__':
+    # Standalone mode, so benchmarks can keep the stub's memory out of the process they measure
+    parser = argparse.ArgumentParser(description='Run the stub Elasticsearch server until interrupted.')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--discard-sources', action='store_true', help='count indexed documents without keeping them')
+    args = parser.parse_args()
+    server, url = start_stub_server(latency=args.latency, keep_sources=not args.discard_sources)
+    print(url, flush=True)
+    threading.Event().wait()
@@ -0,0 +1,251 @@
+"""Seeded synthetic clients, students and bank transactions, using the same generators as notebooks/generate_random_dataset.ipynb."""
+import datetime
+import os
+import random
+
+import pandas as pd
+
+from benchmarks import REPO_ROOT
+
+NAMES_CSV = os.path.join(REPO_ROOT, 'notebooks', 'csv', '05-random_names.csv')
+DOMAINS = ['gmail.xyz', 'yahoo.123', 'gmx.bbb', 'hotmail.abc', 'outlook.456', '523344123.net']
+ACCENTED_VOWELS = {'a': ['á', 'à'], 'e': ['é', 'è'], 'i': ['í', 'ì'], 'o': ['ó', 'ò'], 'u': ['ú', 'ù']}
+
+# Transaction types of the sample bank table and how often each shows up; fees and expenses carry no payer
+BANK_TYPES = {'transfer received': 0.4, 'direct debit received': 0.35, 'rejected direct debit': 0.05, 'Bank fee': 0.1, 'Expense payment': 0.1}
+PAYER_TYPES = ('transfer received', 'direct debit received', 'rejected direct debit')
+# Companies paying on a client's behalf, as in the sample data's sender column
+SENDERS = ['Acme Inc.', 'Globex Corporation', 'Initech', 'Witch Foods']
+
+
+def load_name_pools():
+    """Returns (first names, last names) taken from the random names CSV."""
+    names = pd.read_csv(NAMES_CSV, encoding='utf-8-sig')['name'].dropna().str.split()
+    first_names = sorted({parts[0] for parts in names if len(parts) > 1})
+    last_names = sorted({parts[-1] for parts in names if len(parts) > 1})
+    return first_names, last_names
+
+
+def generate_random_email(rng, name):
+    parts = name.lower().split()
+    if len(parts) == 1:
+        return parts[0] + '@' + rng.choice(DOMAINS)
+    first, last = parts[0], parts[-1]
+    local = rng.choice([
+        f"{first[0]}{last}",
+        f"{first}{last}{rng.randint(10, 99)}",
+        f"{first[0:3]}_{last[0:3]}",
+    ])
+    return local + '@' + rng.choice(DOMAINS)
+
+
+def generate_legal(rng):
+    if rng.random() < 0.5:
+        return rng.choice(['Y', 'Z', 'X']) + ''.join(str(rng.randint(0, 9)) for _ in range(7))
+    return ''.join(str(rng.randint(0, 9)) for _ in range(10))
+
+
+def add_accents(rng, name):
+    """Accents one or two vowels, the way re-registered clients show up in the duplicates dataset."""
+    name_list = list(name)
+    vowel_positions = [i for i, char in enumerate(name_list) if char in ACCENTED_VOWELS]
+    rng.shuffle(vowel_positions)
+    for pos in vowel_positions[:rng.randint(1, 2)]:
+        name_list[pos] = rng.choice(ACCENTED_VOWELS[name_list[pos]])
+    return ''.join(name_list)
+
+
+def synthetic_clients(rows, seed=0, chunk_rows=50000, start_id=100000, students_per_client=(1, 3)):
+    """Yields (df_client, df_student) chunks shaped like the 'client' and 'student' tables.
+
+    Every client has between students_per_client[0] and [1] students, and about 7% have no last name,
+    second email or handle, matching the gaps in the sample data.
+    """
+    rng = random.Random(seed)
+    first_names, last_names = load_name_pools()
+    student_id = start_id * 10
+    for offset in range(0, rows, chunk_rows):
+        clients, students = [], []
+        for client_id in range(start_id + offset, start_id + min(offset + chunk_rows, rows)):
+            first, last = rng.choice(first_names), rng.choice(last_names)
+            partial = rng.random() < 0.07
+            handle = f"{first[0]}{last}"
+            clients.append({
+                'client id': client_id,
+                'name': first,
+                'last name': None if partial else last,
+                'email1': generate_random_email(rng, f"{first} {last}"),
+                'email2': None if partial else generate_random_email(rng, f"{first} {last}"),
+                'handle': None if partial else handle,
+                'account number': 'ES' + ''.join(str(rng.randint(0, 9)) for _ in range(9)),
+            })
+            for _ in range(rng.randint(*students_per_client)):
+                students.append({
+                    'student id': student_id,
+                    'student name': rng.choice(first_names),
+                    'student last name': last,
+                    'grade': rng.randint(1, 12),
+                    'associated client id': client_id,
+                })
+                student_id += 1
+        yield pd.DataFrame(clients), pd.DataFrame(students)
+
+
+def generate_earlier_date(rng, date):
+    years = rng.randint(2, 5)
+    try:
+        return date.replace(year=date.year - years)
+    except ValueError:  # February 29
+        return date.replace(year=date.year - years, day=date.day - 1)
+
+
+def synthetic_duplicates(rows, seed=0, spouse_share=0.3, start_id=100000):
+    """Returns a frame shaped like notebooks/csv/clients_with_duplicates.csv, plus the 'entity' each row belongs to.
+
+    As in the notebook, spouse_share of the clients are paired up and the second spouse shares the first
+    one's email or legal id; every other client signs up again with accented names, an earlier date,
+    new emails and a new or hyphenated legal id. Rows of one entity are duplicates of each other.
+    Unlike the notebook, an address already used by another client gets digits appended: at 100k clients
+    and up the generator's short addresses would otherwise be shared by unrelated people, which no
+    mail provider does.
+    """
+    rng = random.Random(seed)
+    first_names, last_names = load_name_pools()
+    owners = {}
+
+    def email_for(name, entity):
+        email = generate_random_email(rng, name)
+        while owners.setdefault(email, entity) != entity:
+            local, domain = email.split('@')
+            email = f"{local}{rng.randint(0, 9)}@{domain}"
+        return email
+
+    people = -(-rows * 10 // (20 - round(spouse_share * 10)))
+    base_date = datetime.date(2019, 1, 1)
+    clients = []
+    for client_id in range(start_id, start_id + people):
+        name = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+        clients.append({
+            'id': client_id,
+            'name': name,
+            'date': base_date + datetime.timedelta(days=rng.randint(0, 5 * 365)),
+            'email1': email_for(name, client_id),
+            'email2': email_for(name, client_id),
+            'legal': generate_legal(rng),
+            'entity': client_id,
+        })
+
+    paired = rng.sample(range(people), int(people * spouse_share // 2 * 2))
+    for first, second in zip(paired[::2], paired[1::2]):
+        if rng.random() < 0.5:
+            clients[second]['email2'] = clients[first]['email1']
+        else:
+            clients[second]['legal'] = clients[first]['legal']
+        clients[second]['entity'] = clients[first]['entity']
+
+    paired = set(paired)
+    again = []
+    for offset, client in enumerate(clients):
+        if offset in paired:
+            continue
+        legal = client['legal']
+        if rng.random() < 0.5:
+            legal = generate_legal(rng)
+        elif legal[0].isalpha():
+            legal = legal[0] + '-' + legal[1:]
+        again.append({
+            'id': start_id + people + offset,
+            'name': add_accents(rng, client['name']),
+            'date': generate_earlier_date(rng, client['date']),
+            'email1': email_for(client['name'], client['entity']),
+            'email2': client['email1'] if rng.random() < 0.2 else '',
+            'legal': legal,
+            'entity': client['entity'],
+        })
+
+    df = pd.DataFrame(clients + again).sample(frac=1, random_state=seed).head(rows).reset_index(drop=True)
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%d/%m/%Y')
+    return df
+
+
+def _typo(rng, text):
+    """Swaps two neighbouring characters, the most common slip in hand-typed references."""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 2)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def bank_reference(rng, client, students):
+    """Returns a description naming a client the ways the sample bank table does, with casing, accent and typo noise.
+
+    Students' names and grades, the client's name either way round, a last name and grade, the handle, the client id,
+    an email, or the account number (sometimes in groups of four).
+    """
+    student = students[rng.randrange(len(students))]
+    last = client['last name'] or student['student last name']
+    text = rng.choice([
+        lambda: ' '.join([s['student name'] for s in students[:2]] + [str(s['grade']) for s in students[:2]]),
+        lambda: ' and '.join(s['student name'] for s in students[:2]),
+        lambda: f"{client['name']} {last}",
+        lambda: f"{last} {client['name']}",
+        lambda: f"{student['student name']} {student['student last name']}",
+        lambda: f"{last} {student['grade']}",
+        lambda: (client['handle'] or f"{client['name'][0]}{last}").lower(),
+        lambda: str(client['client id']),
+        lambda: f"{client['name']} {client['email1']}",
+        lambda: ' '.join(client['account number'][i:i + 4] for i in range(0, len(client['account number']), 4)) if rng.random() < 0.5 else client['account number'],
+    ])()
+    roll = rng.random()
+    if roll < 0.1:
+        text = text.upper()
+    elif roll < 0.2:
+        text = text.lower()
+    elif roll < 0.25:
+        text = add_accents(rng, text)
+    if rng.random() < 0.05:
+        text = _typo(rng, text)
+    return text
+
+
+def synthetic_bank(df_client, df_student, rows, seed=0, days=365, start_id=10000001, repeat_share=0.3):
+    """Returns bank transactions shaped like the 'bank_remote' table, plus the 'client id' that really paid (or NA).
+
+    Dates run over the days up to today with ids in date order. Payments name their client through
+    bank_reference, some with a company as sender; repeat_share of them are a client paying again with
+    the same reference, so the same search term shows up many times, as it does for monthly fees.
+    """
+    rng = random.Random(seed)
+    clients = df_client.to_dict(orient='records')
+    students_of = {}
+    for student in df_student.to_dict(orient='records'):
+        students_of.setdefault(student['associated client id'], []).append(student)
+    first_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+    types, weights = list(BANK_TYPES), list(BANK_TYPES.values())
+
+    transactions, references = [], []
+    for i in range(rows):
+        txn_type = rng.choices(types, weights)[0]
+        sender = description = payer = None
+        if txn_type in PAYER_TYPES:
+            if references and rng.random() < repeat_share:
+                payer, sender, description = rng.choice(references)
+            else:
+                client = clients[rng.randrange(len(clients))]
+                payer = client['client id']
+                sender = rng.choice(SENDERS) if rng.random() < 0.2 else None
+                description = bank_reference(rng, client, students_of[payer])
+                references.append((payer, sender, description))
+        amount = round(rng.uniform(5, 1500), 2)
+        transactions.append({
+            'id': start_id + i,
+            'date': (first_day + datetime.timedelta(days=i * days // rows)).isoformat(),
+            'type': txn_type,
+            'sender': sender,
+            'description': description,
+            'amount': -amount if txn_type in ('Bank fee', 'Expense payment', 'rejected direct debit') else amount,
+            'client id': payer,
+        })
+    df = pd.DataFrame(transactions)
+    df['client id'] = df['client id'].astype('Int64')
+    return df
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, FastAPI
+from sqlalchemy import create_engine, select, func, Column, Integer, Float, String, DateTime
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import declarative_base
+from pydantic import BaseModel
+from typing import List
+from typing import Optional
+from datetime import datetime
+import os
+import time
+
+# Stand-in for the ERP's incoming payments API, so the ERP sync can be run and benchmarked without SAP B1.
+# Served under /erp by remote_bank.py, or on its own: uvicorn erp_stand_in:app
+router = APIRouter()
+
+# Database setup
+DATABASE_URL = os.environ.get("ERP_DATABASE_URL", "sqlite:///./databases/erp.db")
+engine = create_engine(DATABASE_URL)
+Base = declarative_base()
+
+# Added to every request, to stand in for the round trip to a real ERP
+LATENCY_SECONDS = float(os.environ.get("ERP_LATENCY_SECONDS", 0))
+
+# Define model
+class ERPPayment(Base):
+    __tablename__ = 'erp_payment'
+    doc_entry = Column(Integer, primary_key=True, autoincrement=True)
+    payment_key = Column(String, unique=True, nullable=False)
+    customer_id = Column(Integer, nullable=False)
+    date = Column(String)
+    amount = Column(Float, nullable=False)
+    comments = Column(String)
+    created_at = Column(DateTime, default=datetime.now)
+
+# Pydantic models to validate data
+class Payment(BaseModel):
+    payment_key: str
+    customer_id: Optional[int] = None
+    date: Optional[str] = None
+    amount: Optional[float] = None
+    comments: Optional[str] = None
+
+class PaymentResult(BaseModel):
+    payment_key: str
+    status: str  # 'created', 'duplicate' or 'rejected'
+    erp_ref: Optional[str] = None
+    error: Optional[str] = None
+
+Base.metadata.create_all(bind=engine)
+
+
+def rejection(payment):
+    if payment.customer_id is None:
+        return 'Payment has no customer.'
+    if not payment.amount or payment.amount <= 0:
+        return 'Payment amount must be positive.'
+    return None
+
+
+# Adds a batch of incoming payments in one transaction; a payment key that was posted before is not added twice
+# POST http://localhost:8000/erp/payments
+@router.post("/payments", response_model=List[PaymentResult])
+def add_payments(payments: List[Payment]):
+    if LATENCY_SECONDS:
+        time.sleep(LATENCY_SECONDS)
+    rejected = {payment.payment_key: rejection(payment) for payment in payments if rejection(payment)}
+    accepted = [payment.model_dump() for payment in payments if payment.payment_key not in rejected]
+    with engine.begin() as conn:
+        keys = [payment['payment_key'] for payment in accepted]
+        existing = set(conn.scalars(select(ERPPayment.payment_key).where(ERPPayment.payment_key.in_(keys)))) if keys else set()
+        if accepted:
+            conn.execute(insert(ERPPayment).on_conflict_do_nothing(index_elements=['payment_key']), accepted)
+        refs = {key: ref for key, ref in conn.execute(select(ERPPayment.payment_key, ERPPayment.doc_entry).where(ERPPayment.payment_key.in_(keys)))}
+    results = []
+    for payment in payments:
+        key = payment.payment_key
+        if key in rejected:
+            results.append({'payment_key': key, 'status': 'rejected', 'error': rejected[key]})
+        else:
+            results.append({'payment_key': key, 'status': 'duplicate' if key in existing else 'created', 'erp_ref': str(refs[key])})
+    return results
+
+
+# Number of payments added so far
+# GET http://localhost:8000/erp/payments/count
+@router.get("/payments/count")
+def count_payments():
+    with engine.connect() as conn:
+        return {'count': conn.scalar(select(func.count()).select_from(ERPPayment))}
+
+
+app = FastAPI()
+app.include_router(router)
@@ -1,19 +1,42 @@
-from fastapi import FastAPI
-from sqlalchemy import create_engine, select, Column, Integer, Float, String, Date
-from sqlalchemy.orm import Session, declarative_base
-from sqlalchemy import func
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import create_engine, select, func, tuple_, Column, Integer, Float, String, Date, Index
+from sqlalchemy.orm import declarative_base
 from pydantic import BaseModel
 from typing import List
 from typing import Optional
-from datetime import date
+from collections import OrderedDict
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+import orjson
+import erp_stand_in
+
+# Responses of at least this many bytes are gzipped for clients that accept it
+GZIP_MINIMUM_SIZE = 1000
+GZIP_LEVEL = 6
+# Serialized JSON responses kept in memory, bounded by their total size
+RESPONSE_CACHE_BYTES = int(os.environ.get("REMOTE_BANK_RESPONSE_CACHE_BYTES", 64 * 2 ** 20))
 
 app = FastAPI()
+# Streams (NDJSON) are compressed on the fly; cached JSON responses carry their own gzipped body
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL)
+# Stand-in ERP the Sync ERP page posts payments to (see erp_stand_in.py)
+app.include_router(erp_stand_in.router, prefix="/erp")
 
 # Database setup
-DATABASE_URL = "sqlite:///./databases/remote_bank.db"
+DATABASE_URL = os.environ.get("REMOTE_BANK_DATABASE_URL", "sqlite:///./databases/remote_bank.db")
 engine = create_engine(DATABASE_URL)
 Base = declarative_base()
 
+# Rows fetched from the cursor at a time when streaming
+STREAM_BATCH_SIZE = 5000
+
 # Define model
 class RemoteBank(Base):
     __tablename__ = 'bank_remote'  # define the table name
@@ -24,6 +47,9 @@ class RemoteBank(Base):
     description = Column(String)
     amount = Column(Float)
 
+# Keyset pagination over date ranges walks (date, id) in order
+date_id_index = Index('ix_bank_remote_date_id', RemoteBank.date, RemoteBank.id)
+
 # Pydantic models to validate data
 class Transaction(BaseModel):
     id: int
@@ -33,33 +59,146 @@ class Transaction(BaseModel):
     description: Optional[str] = None
     amount: Optional[float] = None
 
-# Create the tables in db
+# Create the tables in db (the index separately, since create_all skips tables that already exist)
 Base.metadata.create_all(bind=engine)
+date_id_index.create(bind=engine, checkfirst=True)
+
+# Plain column tuples instead of ORM objects
+COLUMNS = (RemoteBank.id, RemoteBank.date, RemoteBank.type, RemoteBank.sender, RemoteBank.description, RemoteBank.amount)
+FIELDS = [column.key for column in COLUMNS]
+
+
+class ResponseCache:
+    """LRU of serialized JSON responses keyed on their ETag, bounded by the total size of the bodies.
+
+    ETags cover the request and the state of the table, so an insert gives every request a new key, and the
+    entries they replace age out.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None:
+                self._entries.move_to_end(etag)
+            return entry
+
+    def put(self, etag, entry):
+        size = len(entry['body']) + len(entry['gzipped'])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self.size -= len(old['body']) + len(old['gzipped'])
+            self._entries[etag] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted['body']) + len(evicted['gzipped'])
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES)
+
+
+# Latest id and date of the whole table; SQLite answers each subquery from the end of an index
+TABLE_STATE = select(select(func.max(RemoteBank.id)).scalar_subquery(), select(func.max(RemoteBank.date)).scalar_subquery())
 
-# Endpoint to get all transactions
+
+def validators(request):
+    """Returns the (ETag, Last-Modified) of a request, from the state of the table rather than its rows.
+
+    Bank transactions are only ever added, and a new one gets the highest id, so the highest id changes whenever
+    any page could have; hashed with the query string (which holds the page bounds) it makes a weak ETag that
+    costs two index lookups instead of the page query. Last-Modified is the latest transaction date.
+    """
+    with engine.connect() as conn:
+        max_id, max_date = conn.execute(TABLE_STATE).one()
+    state = json.dumps([request.url.path, sorted(request.query_params.multi_items()), max_id])
+    etag = f'W/"{hashlib.sha1(state.encode()).hexdigest()[:24]}"'
+    last_modified = format_datetime(datetime.combine(max_date, time(), timezone.utc), usegmt=True) if max_date else None
+    return etag, last_modified
+
+
+def ndjson_lines(stmt):
+    """Yields JSON lines in STREAM_BATCH_SIZE row chunks as they come off the database cursor.
+
+    Chunked because StreamingResponse moves to the threadpool for every item a sync generator yields.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE).execute(stmt)
+        for partition in result.partitions():
+            yield b''.join(orjson.dumps(dict(zip(FIELDS, row))) + b'\n' for row in partition)
+
+
+def paged_response(stmt, request, limit, fmt, next_cursor):
+    """Runs stmt as a JSON array or as an NDJSON stream, setting X-Next-Cursor when a full page was returned.
+
+    Responses carry an ETag, and a request whose If-None-Match holds the current one gets 304 without a body;
+    neither that nor a response_cache hit runs stmt. JSON bodies are serialized with orjson straight from the
+    selected rows, skipping response_model validation, and kept in response_cache together with their gzipped
+    form and next cursor.
+    """
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    etag, last_modified = validators(request)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+
+    if fmt == 'ndjson':
+        return StreamingResponse(ndjson_lines(stmt), media_type='application/x-ndjson', headers=headers)
+
+    entry = response_cache.get(etag)
+    if entry is None:
+        with engine.connect() as conn:
+            rows = [dict(zip(FIELDS, row)) for row in conn.execute(stmt)]
+        body = orjson.dumps(rows)
+        entry = {
+            'body': body,
+            'gzipped': gzip.compress(body, compresslevel=GZIP_LEVEL) if len(body) >= GZIP_MINIMUM_SIZE else b'',
+            'cursor': next_cursor(rows[-1]) if limit is not None and len(rows) == limit else None,
+        }
+        response_cache.put(etag, entry)
+    if entry['cursor']:
+        headers['X-Next-Cursor'] = entry['cursor']
+    if entry['gzipped'] and 'gzip' in request.headers.get('accept-encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        return Response(entry['gzipped'], media_type='application/json', headers=headers)
+    return Response(entry['body'], media_type='application/json', headers=headers)
+
+
+# Endpoint to get all transactions, optionally a page at a time (keyset on id)
+# GET http://localhost:8000/transactions/?limit=1000&cursor=10001000
+# GET http://localhost:8000/transactions/?format=ndjson
 @app.get("/transactions/", response_model=List[Transaction])
-# GET http://localhost:8000/transactions/
-def read_transactions():
-    with Session(engine) as session:
-        stmt = select(RemoteBank)
-        results = session.execute(stmt).scalars().all()
-        return results
-
-# Endpoint to get transactions within a date range
+def read_transactions(request: Request, limit: Optional[int] = Query(None, gt=0), cursor: Optional[int] = None,
+                      format: str = Query('json', pattern='^(json|ndjson)$')):
+    stmt = select(*COLUMNS).order_by(RemoteBank.id)
+    if cursor is not None:
+        stmt = stmt.where(RemoteBank.id > cursor)
+    return paged_response(stmt, request, limit, format, lambda row: str(row['id']))
+
+# Endpoint to get transactions within a date range, optionally a page at a time (keyset on date, id)
 # GET http://localhost:8000/transactions/date_range/?start_date=2022-01-01&end_date=2022-12-31 # yyyy-mm-dd
+# GET http://localhost:8000/transactions/date_range/?start_date=2022-01-01&end_date=2022-12-31&limit=1000&cursor=2022-03-04,10004242
 @app.get("/transactions/date_range/", response_model=List[Transaction])
-def read_transactions_by_date(start_date: date, end_date: date):
-    with Session(engine) as session:
-        # Ensure start_date is the nearest available date after the given start_date if not found
-        adjusted_start = session.query(func.min(RemoteBank.date)).filter(RemoteBank.date >= start_date).scalar()
-        # Ensure end_date is the nearest available date before the given end_date if not found
-        adjusted_end = session.query(func.max(RemoteBank.date)).filter(RemoteBank.date <= end_date).scalar()
-
-        # If no transactions are found in the range, return an empty list
-        if not adjusted_start or not adjusted_end:
-            return []
-
-        # Query for transactions within the adjusted date range
-        stmt = select(RemoteBank).where(RemoteBank.date.between(adjusted_start, adjusted_end))
-        results = session.execute(stmt).scalars().all()
-        return results
\ No newline at end of file
+def read_transactions_by_date(start_date: date, end_date: date, request: Request, limit: Optional[int] = Query(None, gt=0),
+                              cursor: Optional[str] = None, format: str = Query('json', pattern='^(json|ndjson)$')):
+    # Snapping start_date/end_date to the nearest available dates inside the range selects exactly
+    # the rows between them, so a single query replaces the separate min/max lookups
+    stmt = select(*COLUMNS).where(RemoteBank.date.between(start_date, end_date)).order_by(RemoteBank.date, RemoteBank.id)
+    if cursor is not None:
+        try:
+            cursor_date, cursor_id = cursor.split(',')
+            stmt = stmt.where(tuple_(RemoteBank.date, RemoteBank.id) > tuple_(date.fromisoformat(cursor_date), int(cursor_id)))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="cursor must look like 'yyyy-mm-dd,id'")
+    return paged_response(stmt, request, limit, format, lambda row: f"{row['date'].isoformat()},{row['id']}")
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-from utils import found_transactions, ensure_data, load_data_from_sql, sync_transactions
+from utils import ensure_data, bank_date_range, fetch_transactions_job, job_progress
+from tables import paged_table, synced_today, format_dates
 from datetime import datetime, timedelta
 
 # Set the Streamlit page configuration with a custom icon
@@ -37,42 +38,22 @@ def page1():
         end_date = st.date_input("End Date", value=st.session_state.get('end_date', pd.Timestamp.today()), key="end_date", format="MM/DD/YYYY")
     with c3:
         if st.button("Fetch Transactions"):
-            transactions = found_transactions(start_date, end_date)
-            sync_transactions(transactions)
-            df_bank = load_data_from_sql('bank')
-            st.session_state['df_bank'] = df_bank  # Update the cached dataframe
+            fetch_transactions_job(start_date, end_date)
 
-    df_bank = st.session_state['df_bank']
-    df_bank.fillna(value="", inplace=True)  # Handling NaN values
+    # Fetching and syncing run in the background; the table below refreshes when they finish
+    job_progress()
 
-    # Convert dates to datetime if not already
-    df_bank['date'] = pd.to_datetime(df_bank['date']).dt.strftime('%m/%d/%Y')
-    df_bank['bank_sync_date'] = pd.to_datetime(df_bank['bank_sync_date']).dt.strftime('%m/%d/%Y')
+    # Date range filtered by SQLite; after a sync only the newly synced rows are appended
+    df_bank_filtered = bank_date_range(start_date, end_date)
 
-    # Filter DataFrame by date range
-    df_bank_filtered = df_bank[
-        (pd.to_datetime(df_bank['date'], format='%m/%d/%Y') >= pd.to_datetime(start_date)) &
-        (pd.to_datetime(df_bank['date'], format='%m/%d/%Y') <= pd.to_datetime(end_date))
-    ]
-
-    # Define columns to display and sort by date
+    # Newest first, a page at a time; newly synced bank entries are highlighted
     columns = ['id', 'date', 'type', 'sender', 'description', 'amount', 'bank_sync_date']
-    df_bank_filtered = df_bank_filtered[columns].sort_values(by='date', ascending=False)
-
-    # Highlight newly synced bank entries
-    def highlight_rows(s):
-        # Format today's date as a string to match the format in 'bank_sync_date'
-        today_str = datetime.now().strftime('%m/%d/%Y')
-        # Check if 'bank_sync_date' is not empty and matches today's date
-        if s['bank_sync_date'] and s['bank_sync_date'] == today_str:
-            return ['background-color: #d2f4ea'] * len(s)
-        # Return no styling if the date is not today or 'bank_sync_date' is empty
-        return [''] * len(s)
-
-    df_bank_styled = df_bank_filtered.style.apply(highlight_rows, axis=1)
-
-    # Display styled DataFrame
-    st.dataframe(df_bank_styled, width=900, hide_index=True, column_config={"id": st.column_config.NumberColumn(format="%f")})
+    paged_table(
+        df_bank_filtered, 'bank', columns=columns, sort_by='date', ascending=False,
+        highlight=lambda page: synced_today(page['bank_sync_date']),
+        formatters={'date': format_dates, 'bank_sync_date': format_dates}, fill_value='',
+        width=900, column_config={"id": st.column_config.NumberColumn(format="%f")}
+    )
 
     # Display logs
     if 'logs' in st.session_state:
@@ -0,0 +1,99 @@
+import json
+from contextlib import contextmanager
+
+import storage
+
+_ready = set()
+
+
+def _ensure(db_path):
+    if db_path not in _ready:
+        with storage.transaction(db_path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value TEXT)")
+        _ready.add(db_path)
+
+
+@contextmanager
+def _reading(db_path):
+    _ensure(db_path)
+    with storage.reading(db_path) as conn:
+        yield conn
+
+
+@contextmanager
+def _writing(db_path):
+    _ensure(db_path)
+    with storage.transaction(db_path) as conn:
+        yield conn
+
+
+def get_counter(db_path, key):
+    with _reading(db_path) as conn:
+        row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (key,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def bump_counter(db_path, key):
+    """Advances a counter stored in app_meta and returns the new value."""
+    with _writing(db_path) as conn:
+        conn.execute(
+            "INSERT INTO app_meta (key, value) VALUES (?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (key,)
+        )
+        row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (key,)).fetchone()
+    return int(row[0])
+
+
+def get_index_generation(db_path):
+    """Returns the generation of es_client_combined, bumped whenever its contents change."""
+    return get_counter(db_path, 'index_generation')
+
+
+def bump_index_generation(db_path):
+    return bump_counter(db_path, 'index_generation')
+
+
+def get_local_generation(db_path):
+    """Returns the generation of the local matcher's clients, bumped whenever the stored combined clients change."""
+    return get_counter(db_path, 'local_generation')
+
+
+def bump_local_generation(db_path):
+    return bump_counter(db_path, 'local_generation')
+
+
+def get_table_version(db_path, table_name):
+    """Returns the version of a table's contents, bumped by the app whenever it writes to that table."""
+    return get_counter(db_path, f'table_version:{table_name}')
+
+
+def bump_table_version(db_path, table_name):
+    return bump_counter(db_path, f'table_version:{table_name}')
+
+
+def get_value(db_path, key, default=None):
+    with _reading(db_path) as conn:
+        row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_value(db_path, key, value):
+    with _writing(db_path) as conn:
+        conn.execute(
+            "INSERT INTO app_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+
+def get_bank_watermark(db_path):
+    """Returns the bank sync high-water mark as {'start', 'date', 'id'}, or None before the first sync.
+
+    Every remote transaction from 'start' up to and including (date, id) has been synced.
+    """
+    value = get_value(db_path, 'bank_watermark')
+    return json.loads(value) if value else None
+
+
+def set_bank_watermark(db_path, watermark):
+    set_value(db_path, 'bank_watermark', json.dumps(watermark))
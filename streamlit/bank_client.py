@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import httpx
+import orjson
+
+DEFAULT_BASE_URL = 'http://fastapi:8000'
+DATE_RANGE_PATH = '/transactions/date_range/'
+
+PAGE_SIZE = 5000
+SHARDS = 4
+MAX_RETRIES = 3
+INITIAL_BACKOFF = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class BankAPIError(Exception):
+    """Raised when the remote bank still fails after every retry."""
+
+
+def plan_ranges(from_date, to_date, watermark=None):
+    """Returns the (start, end, cursor) ranges to fetch so a sync skips what the watermark already covers.
+
+    The watermark covers every transaction from its 'start' up to (date, id). Only the part of the window
+    before 'start', and the keys after (date, id), are requested. The first range runs up to 'start' even
+    when to_date is earlier, and the second begins at the watermark even when from_date is later, so the
+    covered span stays contiguous.
+    """
+    if watermark is None:
+        return [(from_date, to_date, None)]
+    covered_from = date.fromisoformat(watermark['start'])
+    high_date = date.fromisoformat(watermark['date'])
+    ranges = []
+    if from_date < covered_from:
+        ranges.append((from_date, covered_from - timedelta(days=1), None))
+    if to_date >= high_date:
+        ranges.append((high_date, to_date, f"{watermark['date']},{watermark['id']}"))
+    return ranges
+
+
+def shard_range(start, end, cursor, shards):
+    """Splits a date range into up to `shards` consecutive sub-ranges; only the first keeps the cursor."""
+    days = (end - start).days + 1
+    count = max(1, min(shards, days))
+    bounds = [start + timedelta(days=days * i // count) for i in range(count + 1)]
+    return [
+        (bounds[i], bounds[i + 1] - timedelta(days=1), cursor if i == 0 else None)
+        for i in range(count)
+    ]
+
+
+def advance_watermark(watermark, from_date, rows):
+    """Returns the watermark after rows (fetched for a window starting at from_date) have been synced."""
+    start = from_date.isoformat() if watermark is None else min(watermark['start'], from_date.isoformat())
+    keys = [(row['date'], row['id']) for row in rows]
+    if watermark is not None:
+        keys.append((watermark['date'], watermark['id']))
+    if not keys:
+        return None
+    high_date, high_id = max(keys)
+    return {'start': start, 'date': high_date, 'id': high_id}
+
+
+class BankClient:
+    """Pooled async client for the remote bank API, usable from synchronous code.
+
+    Requests run on a private event loop thread, so one httpx connection pool is reused across calls.
+    Each sync fans out over date shards concurrently and follows X-Next-Cursor pages within a shard.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=30.0, page_size=PAGE_SIZE, shards=SHARDS,
+                 max_retries=MAX_RETRIES, initial_backoff=INITIAL_BACKOFF):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.shards = shards
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='bank-client', daemon=True).start()
+        self._client = self._run(self._open(timeout))
+
+    async def _open(self, timeout):
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.shards, max_keepalive_connections=self.shards),
+        )
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _get(self, params):
+        """GETs one page as (rows, next cursor), retrying transport errors and retryable statuses with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._client.get(DATE_RANGE_PATH, params=params)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return orjson.loads(response.content), response.headers.get('X-Next-Cursor')
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = repr(e)
+            except httpx.HTTPStatusError as e:
+                raise BankAPIError(str(e)) from e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.initial_backoff * 2 ** attempt)
+        raise BankAPIError(f"{self.base_url}{DATE_RANGE_PATH} failed after {self.max_retries + 1} attempts: {error}")
+
+    async def _fetch_shard(self, start, end, cursor):
+        rows = []
+        while True:
+            params = {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'limit': self.page_size}
+            if cursor:
+                params['cursor'] = cursor
+            page, cursor = await self._get(params)
+            rows.extend(page)
+            if not cursor:
+                return rows
+
+    async def _fetch(self, ranges):
+        shards = [shard for r in ranges for shard in shard_range(*r, self.shards)]
+        pages = await asyncio.gather(*(self._fetch_shard(*shard) for shard in shards))
+        return [row for page in pages for row in page]
+
+    def fetch(self, from_date, to_date, watermark=None):
+        """Returns (rows, new watermark) for the transactions in [from_date, to_date] not yet covered by watermark."""
+        ranges = plan_ranges(from_date, to_date, watermark)
+        rows = self._run(self._fetch(ranges)) if ranges else []
+        return rows, advance_watermark(watermark, from_date, rows)
+
+    def close(self):
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import storage
+
+COLUMNS = ['id', 'term', 'client_id', 'score', 'margin', 'method', 'backend', 'generation', 'matched_at']
+
+
+class BankMatchStore:
+    """Match results of bank transactions persisted in streamlit.db, one row per transaction id.
+
+    Each row remembers the normalized search term it was matched on, and the backend and generation
+    (index generation for Elasticsearch, local generation for the local matcher) it was matched against,
+    so a transaction only needs matching again once its term or the current generation changes. method
+    is 'exact' for transactions resolved on an exact key and the backend otherwise.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Yields the shared streamlit.db connection inside one write transaction."""
+        with storage.transaction(self.db_path) as conn:
+            if not self._ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS bank_match ("
+                    "id INTEGER PRIMARY KEY, "
+                    "term TEXT NOT NULL, "
+                    "client_id INTEGER, "
+                    "score REAL, "
+                    "margin REAL, "
+                    "method TEXT, "
+                    "backend TEXT NOT NULL, "
+                    "generation INTEGER NOT NULL, "
+                    "matched_at TEXT NOT NULL)"
+                )
+                self._ready = True
+            yield conn
+
+    @contextmanager
+    def _reading(self):
+        """Yields this thread's read connection to streamlit.db, once the table exists."""
+        if not self._ready:
+            with self._connect():
+                pass
+        with storage.reading(self.db_path) as conn:
+            yield conn
+
+    def load(self):
+        """Returns every stored result as a DataFrame with the table's columns."""
+        with self._reading() as conn:
+            rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM bank_match").fetchall()
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def store(self, ids, terms, results, backend, generation):
+        """Stores (client id, score, margin, method) results for transaction ids and their search terms, replacing older ones."""
+        matched_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = (
+            (int(txn_id), term, int(client_id) if client_id is not None else None, score, margin, method, backend, generation, matched_at)
+            for txn_id, term, (client_id, score, margin, method) in zip(ids, terms, results)
+        )
+        with self._connect() as conn:
+            return storage.executemany_batched(
+                conn, f"INSERT OR REPLACE INTO bank_match ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+
+
+def pending_mask(df_bank_terms, keys, df_matches, backend, generation):
+    """Returns a boolean Series over df_bank_terms marking transactions without a current result.
+
+    keys are the normalized search terms of df_bank_terms; a stored result is current when it was matched
+    on the same term, with the same backend and generation.
+    """
+    current = df_matches[(df_matches['backend'] == backend) & (df_matches['generation'] == generation)]
+    stored_terms = df_bank_terms['id'].map(current.set_index('id')['term'])
+    return stored_terms != keys
@@ -0,0 +1,48 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+_COMBINING_MARKS = r'[\u0300-\u036f]'
+
+
+def fold(texts):
+    """Lowercases a Series of strings and strips their accents."""
+    return texts.str.normalize('NFKD').str.replace(_COMBINING_MARKS, '', regex=True).str.lower()
+
+
+def fold_query(query):
+    decomposed = unicodedata.normalize('NFKD', query)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower().strip()
+
+
+def build_search_text(df):
+    """Returns one folded line per row of df, holding its non-empty values separated by spaces."""
+    parts = []
+    for column in df.columns:
+        values = df[column]
+        # Grades and ids come back as floats after the combine; search them as written, e.g. 5 not 5.0
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.astype('Int64')
+        parts.append(values.astype('string').fillna(''))
+    text = parts[0].str.cat(parts[1:], sep=' ').str.replace(r'\s+', ' ', regex=True).str.strip()
+    return fold(text)
+
+
+class ClientSearch:
+    """Substring search over the combined clients, built once per combine.
+
+    A row matches when every whitespace-separated query term appears in it, ignoring case and accents.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        self.text = build_search_text(df).to_numpy(dtype=object)
+
+    def search(self, query, within=None):
+        """Returns the positions of matching rows, checking only the positions in `within` when given."""
+        positions = np.arange(len(self.text)) if within is None else within
+        for term in fold_query(query).split():
+            candidates = self.text[positions]
+            positions = positions[np.fromiter((term in text for text in candidates), dtype=bool, count=len(candidates))]
+        return positions
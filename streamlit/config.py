@@ -0,0 +1,64 @@
+import os
+
+# Environment variables win over the .env file, which wins over the defaults below
+ENV_FILE = os.environ.get('ENV_FILE', '.env')
+
+
+def _load_env_file(path):
+    """Adds KEY=value lines from path to os.environ, without overriding variables already set."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as env_file:
+        for line in env_file:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            os.environ.setdefault(key.strip(), value.strip().strip('"\''))
+
+
+def _flag(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+_load_env_file(ENV_FILE)
+
+# Elasticsearch
+ELASTIC_URL = os.environ.get('ELASTIC_URL', 'https://elastic:9200')
+ELASTIC_USER = os.environ.get('ELASTIC_USER', 'elastic')
+ELASTIC_PASSWORD = os.environ.get('ELASTIC_PASSWORD', 'password')
+ELASTIC_VERIFY_CERTS = _flag('ELASTIC_VERIFY_CERTS', False)
+ELASTIC_CA_CERTS = os.environ.get('ELASTIC_CA_CERTS') or None
+ELASTIC_REQUEST_TIMEOUT = float(os.environ.get('ELASTIC_REQUEST_TIMEOUT', 30))
+ELASTIC_MAX_RETRIES = int(os.environ.get('ELASTIC_MAX_RETRIES', 3))
+ELASTIC_CONNECTIONS = int(os.environ.get('ELASTIC_CONNECTIONS', 10))
+
+# FastAPI/dummy-bank endpoint
+BANK_API_URL = os.environ.get('BANK_API_URL', 'http://fastapi:8000')
+
+# ClientID matching: 'elasticsearch', 'local' (in-process BM25, see local_matcher.py), or 'auto' for
+# Elasticsearch while its health probe passes and the local matcher otherwise
+MATCHER_BACKEND = os.environ.get('MATCHER_BACKEND', 'elasticsearch').strip().lower()
+
+# Write the shared bank, combined client and bank search term frames to Arrow snapshots in
+# databases/snapshots and memory-map them on startup instead of rebuilding them from SQLite
+SNAPSHOTS = _flag('SNAPSHOTS', True)
+
+# Port serving /metrics (Prometheus text) and /metrics.json from the Streamlit process; 0 turns it off
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+
+# ERP the Sync ERP page posts matched payments to: 'http' (ERP_URL, the stand-in ERP in fastapi/erp_stand_in.py
+# by default) or 'file' (payments appended to ERP_FILE as NDJSON)
+ERP_CONNECTOR = os.environ.get('ERP_CONNECTOR', 'http').strip().lower()
+ERP_URL = os.environ.get('ERP_URL', 'http://fastapi:8000/erp')
+ERP_FILE = os.environ.get('ERP_FILE', 'databases/erp_payments.ndjson')
+# Payments per ERP request, and ERP requests in flight at once
+ERP_BATCH_SIZE = int(os.environ.get('ERP_BATCH_SIZE', 100))
+ERP_WORKERS = int(os.environ.get('ERP_WORKERS', 4))
+
+# Resolve bank transactions carrying a client's exact account number, email or handle before fuzzy matching
+# (see exact_match.py); only the rest go to MATCHER_BACKEND
+EXACT_PREMATCH = _flag('EXACT_PREMATCH', True)
+
+# Where warmup.py records the progress of the warm-up it runs when the container starts, read by its --check
+WARMUP_STATUS_FILE = os.environ.get('WARMUP_STATUS_FILE', '/tmp/streamlit_warmup.json')
@@ -0,0 +1,270 @@
+"""Fuzzy duplicate-client detection.
+
+Rows are grouped into blocks that share a cheap key (folded name, phonetic code of the name, normalized
+legal id, or an email), only pairs within a block are scored, and every pair at or above the threshold
+is merged into a cluster with union-find. Pairs are scored in batches over a process pool.
+
+    python dedupe.py ../notebooks/csv/clients_with_duplicates.csv -o duplicates.csv
+    python dedupe.py --db ../databases/streamlit.db --workers 4
+"""
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz
+from rapidfuzz.process import cpdist
+
+logger = logging.getLogger(__name__)
+
+# Pairs scoring at least this much (0-1) are treated as the same client
+DEFAULT_THRESHOLD = 0.9
+# Without a shared email or legal id, a pair's score weighs name and legal id similarity like this;
+# identical folded names alone still score 1.0
+NAME_WEIGHT = 0.6
+LEGAL_WEIGHT = 0.4
+# Larger blocks are skipped: a key shared by that many rows is a placeholder, not a client
+MAX_BLOCK_SIZE = 1000
+# Candidate pairs are sent to the workers in batches of this many
+BATCH_PAIRS = 200_000
+
+BLOCK_KEYS = ('name', 'phonetic', 'legal', 'email')
+
+_COMBINING_MARKS = re.compile(r'[\u0300-\u036f]')
+_NAME_SEPARATORS = re.compile(r'[^\w\s]')
+_LEGAL_SEPARATORS = re.compile(r'[\W_]')
+_SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r']) for letter in letters}
+
+
+@lru_cache(maxsize=100_000)
+def soundex(word):
+    """American Soundex of a folded word, e.g. 'robert' -> 'r163'; '' for words without letters."""
+    letters = [char for char in word if char in _SOUNDEX_CODES]
+    if not letters:
+        return ''
+    code, previous = letters[0], _SOUNDEX_CODES[letters[0]]
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES[char]
+        if digit != '0' and digit != previous:
+            code += digit
+        # h and w do not separate letters with the same code, vowels do
+        if char not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def _name_fields(name):
+    """Returns (folded name, phonetic code of its first and last word) for one raw name."""
+    words = _NAME_SEPARATORS.sub(' ', _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', name)).lower()).split()
+    if not words:
+        return '', ''
+    return ' '.join(words), f"{soundex(words[0])} {soundex(words[-1])}"
+
+
+def normalize_clients(df):
+    """Returns the comparison fields of df: folded name, phonetic code, legal id and both emails.
+
+    df needs an 'id' and 'name' column; 'email1', 'email2' and 'legal' are used when present.
+    """
+    def text(column):
+        return df[column].astype('string').fillna('') if column in df.columns else pd.Series('', index=df.index, dtype='string')
+
+    # Client names repeat a lot, so each distinct one is folded once
+    name_codes, unique_names = pd.factorize(text('name').to_numpy(dtype=object))
+    fields = [_name_fields(name) for name in unique_names]
+    names = np.array([name for name, _ in fields], dtype=object)
+    phonetic = np.array([code for _, code in fields], dtype=object)
+    return pd.DataFrame({
+        'id': df['id'].to_numpy(),
+        'name': names[name_codes],
+        'phonetic': phonetic[name_codes],
+        # 'X-8503459' and 'x8503459 ' are the same legal id
+        'legal': np.array([_LEGAL_SEPARATORS.sub('', legal).lower() for legal in text('legal').to_numpy(dtype=object)], dtype=object),
+        'email1': text('email1').str.strip().str.lower().to_numpy(dtype=object),
+        'email2': text('email2').str.strip().str.lower().to_numpy(dtype=object),
+    })
+
+
+def candidate_pairs(clients, keys=BLOCK_KEYS, max_block_size=MAX_BLOCK_SIZE, stats=None):
+    """Returns (left, right) row positions of every pair sharing a non-empty blocking key, left < right.
+
+    Each pair is returned once however many keys it shares. Block and skipped block counts go into stats.
+    """
+    columns = {key: [key] for key in keys if key != 'email'}
+    if 'email' in keys:
+        columns['email'] = ['email1', 'email2']
+    size = len(clients)
+    pair_keys, blocks, skipped = [], 0, 0
+    for key_columns in columns.values():
+        values = np.concatenate([clients[column].to_numpy() for column in key_columns])
+        codes = pd.factorize(values)[0]
+        rows = np.tile(np.arange(size), len(key_columns))
+        present = values != ''
+        # One entry per (key, row), sorted by key then row; a row with the same email twice counts once
+        entries = np.unique(codes[present].astype(np.int64) * size + rows[present])
+        codes, rows = entries // size, entries % size
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        block_sizes = np.diff(np.r_[starts, len(rows)])
+        skipped += int((block_sizes > max_block_size).sum())
+        keep = (block_sizes > 1) & (block_sizes <= max_block_size)
+        blocks += int(keep.sum())
+        rows = rows[np.repeat(keep, block_sizes)]
+        block_sizes = block_sizes[keep]
+        starts = np.cumsum(block_sizes) - block_sizes
+
+        # Pair every row with the rows after it in its block
+        position = np.arange(len(rows)) - np.repeat(starts, block_sizes)
+        partners = np.repeat(block_sizes, block_sizes) - position - 1
+        first_partner = np.repeat(np.arange(len(rows)) + 1, partners)
+        offsets = np.arange(partners.sum()) - np.repeat(np.cumsum(partners) - partners, partners)
+        pair_keys.append(np.repeat(rows, partners) * size + rows[first_partner + offsets])
+    if stats is not None:
+        stats.update(blocks=blocks, skipped_blocks=skipped)
+    pairs = np.unique(np.concatenate(pair_keys)) if pair_keys else np.empty(0, np.int64)
+    return pairs // size, pairs % size
+
+
+_fields = {}
+
+
+def _init_worker(names, legals, email1, email2):
+    _fields.update(names=names, legals=legals, email1=email1, email2=email2)
+
+
+def score_pairs(left, right):
+    """Returns a 0-1 score for every pair of rows.
+
+    A shared email or legal id, or identical folded names, score 1.0; otherwise name similarity (token order
+    ignored) and legal id similarity are weighted by NAME_WEIGHT and LEGAL_WEIGHT.
+    """
+    names, legals, email1, email2 = (_fields[field] for field in ('names', 'legals', 'email1', 'email2'))
+    name_score = cpdist(names[left], names[right], scorer=fuzz.token_sort_ratio, dtype=np.uint8).astype(np.float32) / 100
+    has_legal = (legals[left] != '') & (legals[right] != '')
+    legal_score = cpdist(legals[left], legals[right], scorer=fuzz.ratio, dtype=np.uint8).astype(np.float32) / 100 * has_legal
+    score = NAME_WEIGHT * name_score + LEGAL_WEIGHT * legal_score
+    exact = (name_score == 1) | (legal_score == 1)
+    for emails_a in (email1[left], email2[left]):
+        for emails_b in (email1[right], email2[right]):
+            exact |= (emails_a == emails_b) & (emails_a != '')
+    score[exact] = 1.0
+    return score
+
+
+def score_candidates(clients, left, right, workers=None):
+    """Scores the candidate pairs, in a process pool unless workers is 1."""
+    fields = tuple(clients[column].to_numpy() for column in ('name', 'legal', 'email1', 'email2'))
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(left) <= BATCH_PAIRS:
+        _init_worker(*fields)
+        return score_pairs(left, right)
+    batches = range(0, len(left), BATCH_PAIRS)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=fields) as pool:
+        scores = pool.map(score_pairs, (left[i:i + BATCH_PAIRS] for i in batches), (right[i:i + BATCH_PAIRS] for i in batches))
+        return np.concatenate(list(scores))
+
+
+class UnionFind:
+    """Disjoint sets over 0..size-1, with path halving and union by size."""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def roots(self):
+        return np.fromiter((self.find(item) for item in range(len(self.parent))), dtype=np.int64, count=len(self.parent))
+
+
+def cluster_pairs(size, left, right):
+    """Returns the cluster root of every row, given the matching pairs."""
+    sets = UnionFind(size)
+    for a, b in zip(left.tolist(), right.tolist()):
+        sets.union(a, b)
+    return sets.roots()
+
+
+def find_duplicates(df, threshold=DEFAULT_THRESHOLD, workers=None, max_block_size=MAX_BLOCK_SIZE, stats=None):
+    """Returns the rows of df that have potential duplicates, with a 'matched_set' number per cluster.
+
+    Sets are numbered in order of their first row in df. Timings and counts go into stats when a dict is given.
+    """
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    clients = normalize_clients(df)
+    left, right = candidate_pairs(clients, max_block_size=max_block_size, stats=stats)
+    stats.update(rows=len(df), compared_pairs=len(left), blocking_seconds=time.perf_counter() - start)
+
+    start = time.perf_counter()
+    matched = score_candidates(clients, left, right, workers=workers) >= threshold
+    stats.update(matched_pairs=int(matched.sum()), scoring_seconds=time.perf_counter() - start)
+
+    start = time.perf_counter()
+    roots = pd.Series(cluster_pairs(len(df), left[matched], right[matched]))
+    in_set = roots.duplicated(keep=False).to_numpy()
+    result = df[in_set].copy()
+    result['matched_set'] = pd.factorize(roots[in_set])[0] + 1
+    result = result.sort_values('matched_set', kind='stable')
+    stats.update(clusters=int(result['matched_set'].max()) if len(result) else 0, duplicate_rows=len(result),
+                 clustering_seconds=time.perf_counter() - start)
+    return result
+
+
+def load_clients(path=None, db_path=None):
+    """Reads clients from a CSV shaped like clients_with_duplicates.csv, or from the client table of a database."""
+    if path:
+        return pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    with sqlite3.connect(db_path) as conn:
+        df = pd.read_sql('SELECT * FROM client', conn)
+    name = df['name'].fillna('') + ' ' + df['last name'].fillna('')
+    return df.rename(columns={'client id': 'id'}).assign(name=name.str.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('csv', nargs='?', help='clients CSV with id, name, email1, email2 and legal columns')
+    source.add_argument('--db', help='read the client table of this SQLite database instead')
+    parser.add_argument('-o', '--output', help='write the duplicate clusters to this CSV instead of printing them')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--workers', type=int, default=None, help='scoring processes (default: one per CPU)')
+    parser.add_argument('--max-block-size', type=int, default=MAX_BLOCK_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    df = load_clients(args.csv, args.db)
+    stats = {}
+    duplicates = find_duplicates(df, threshold=args.threshold, workers=args.workers, max_block_size=args.max_block_size, stats=stats)
+    logger.info(f"Analyzed {stats['rows']} client profiles: {stats['compared_pairs']} pairs compared in {stats['blocks']} blocks "
+                f"({stats['skipped_blocks']} oversized blocks skipped).")
+    logger.info(f"Found {stats['duplicate_rows']} clients in {stats['clusters']} sets of potential duplicates in "
+                f"{stats['blocking_seconds'] + stats['scoring_seconds'] + stats['clustering_seconds']:.2f} seconds.")
+    if args.output:
+        duplicates.to_csv(args.output, index=False, encoding='utf-8-sig')
+    else:
+        print(duplicates.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
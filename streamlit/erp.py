@@ -0,0 +1,323 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+
+import httpx
+import pandas as pd
+
+import storage
+from instrumentation import metrics, span
+
+# Payments posted per ERP request, and requests in flight at once
+BATCH_SIZE = 100
+WORKERS = 4
+# Claimed payments whose batch never reported back (a crash) are claimed again after this many seconds
+LEASE_SECONDS = 300
+# A batch that failed as a whole waits RETRY_SECONDS * 2 ** (attempts - 1) before it is posted again,
+# and its payments are given up on after MAX_ATTEMPTS
+RETRY_SECONDS = 30
+MAX_ATTEMPTS = 5
+
+# Retries of one HTTP request before the batch counts as failed
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+OUTBOX_COLUMNS = ['payment_key', 'bank_id', 'customer_id', 'status', 'attempts', 'erp_ref', 'error', 'updated_at']
+
+
+class ERPError(Exception):
+    """Raised by a connector when a whole batch failed and may be posted again later."""
+
+
+def payment_key(bank_id):
+    """The idempotency key of the payment for a bank transaction; the ERP keeps one payment per key."""
+    return f'bank-{int(bank_id)}'
+
+
+class ERPConnector:
+    """Posts batches of incoming payments to an ERP.
+
+    A payment is a dict with 'payment_key', 'customer_id', 'date', 'amount' and 'comments'. post_payments
+    returns one {'payment_key', 'status', 'erp_ref', 'error'} per payment, status being 'created',
+    'duplicate' (the key was posted before, erp_ref is the existing document) or 'rejected'. It raises
+    ERPError when the batch as a whole failed. Connectors are called from several worker threads at once.
+    """
+
+    def post_payments(self, payments):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _validate(payment):
+    if payment.get('customer_id') is None:
+        return 'Payment has no customer.'
+    if not payment.get('amount') or payment['amount'] <= 0:
+        return 'Payment amount must be positive.'
+    return None
+
+
+class FileConnector(ERPConnector):
+    """Stand-in ERP appending payments to an NDJSON file, one line per payment key."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._refs = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for number, line in enumerate(file, 1):
+                    self._refs[json.loads(line)['payment_key']] = str(number)
+
+    def post_payments(self, payments):
+        results, lines = [], []
+        with self._lock:
+            for payment in payments:
+                key = payment['payment_key']
+                error = _validate(payment)
+                if error:
+                    results.append({'payment_key': key, 'status': 'rejected', 'erp_ref': None, 'error': error})
+                elif key in self._refs:
+                    results.append({'payment_key': key, 'status': 'duplicate', 'erp_ref': self._refs[key], 'error': None})
+                else:
+                    self._refs[key] = str(len(self._refs) + 1)
+                    lines.append(json.dumps(payment) + '\n')
+                    results.append({'payment_key': key, 'status': 'created', 'erp_ref': self._refs[key], 'error': None})
+            if lines:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.writelines(lines)
+                    file.flush()
+                    os.fsync(file.fileno())
+        return results
+
+
+class HttpConnector(ERPConnector):
+    """Posts batches as a JSON array to {base_url}/payments, over one pooled connection per worker.
+
+    The stand-in ERP in fastapi/erp_stand_in.py implements this protocol.
+    """
+
+    def __init__(self, base_url, workers=WORKERS, timeout=30.0, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.backoff = backoff
+        self._client = httpx.Client(
+            base_url=self.base_url, timeout=timeout,
+            limits=httpx.Limits(max_connections=workers, max_keepalive_connections=workers),
+        )
+
+    def post_payments(self, payments):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._client.post('/payments', json=payments)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = repr(e)
+            except httpx.HTTPStatusError as e:
+                raise ERPError(str(e)) from e
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise ERPError(f"{self.base_url}/payments failed after {self.retries + 1} attempts: {error}")
+
+    def close(self):
+        self._client.close()
+
+
+def make_connector(kind, target, workers=WORKERS):
+    """Returns the connector for a kind ('http' or 'file') and its target (base URL or file path)."""
+    if kind == 'http':
+        return HttpConnector(target, workers=workers)
+    if kind == 'file':
+        return FileConnector(target)
+    raise ValueError(f"Unknown ERP connector '{kind}', expected 'http' or 'file'.")
+
+
+class ERPOutbox:
+    """Payments waiting for, or done with, their ERP post, persisted in streamlit.db one row per payment key.
+
+    Payments are claimed a batch at a time under a lease before they are posted, and settled from the ERP's
+    answer afterwards. A crash between the two leaves them claimed until the lease runs out, and posting them
+    again is safe because the ERP deduplicates on the payment key.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Yields the shared streamlit.db connection inside one write transaction."""
+        with storage.transaction(self.db_path) as conn:
+            if not self._ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS erp_outbox ("
+                    "payment_key TEXT PRIMARY KEY, "
+                    "bank_id INTEGER NOT NULL, "
+                    "customer_id INTEGER, "
+                    "payload TEXT NOT NULL, "
+                    "status TEXT NOT NULL, "
+                    "attempts INTEGER NOT NULL DEFAULT 0, "
+                    "available_at REAL NOT NULL DEFAULT 0, "
+                    "erp_ref TEXT, "
+                    "error TEXT, "
+                    "updated_at TEXT NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_erp_outbox_status ON erp_outbox (status, available_at)")
+                self._ready = True
+            yield conn
+
+    @contextmanager
+    def _reading(self):
+        """Yields this thread's read connection to streamlit.db, once the outbox table exists."""
+        if not self._ready:
+            with self._connect():
+                pass
+        with storage.reading(self.db_path) as conn:
+            yield conn
+
+    def load(self):
+        """Returns every payment in the outbox (without its payload) as a DataFrame."""
+        with self._reading() as conn:
+            rows = conn.execute(f"SELECT {', '.join(OUTBOX_COLUMNS)} FROM erp_outbox").fetchall()
+        return pd.DataFrame(rows, columns=OUTBOX_COLUMNS)
+
+    def counts(self):
+        """Returns {status: payments} for 'pending', 'sent' and 'failed'."""
+        with self._reading() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM erp_outbox GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ('pending', 'sent', 'failed')}
+
+    def enqueue(self, payments):
+        """Adds payments to the outbox and returns how many were added or changed.
+
+        A payment already in the outbox is left alone once sent; otherwise a new customer replaces its
+        payload and gives it a fresh set of attempts, so a corrected match is posted again.
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = (
+            (payment['payment_key'], payment['bank_id'], payment['customer_id'], json.dumps(payment), now)
+            for payment in payments
+        )
+        with self._connect() as conn:
+            return storage.executemany_batched(
+                conn,
+                "INSERT INTO erp_outbox (payment_key, bank_id, customer_id, payload, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?) "
+                "ON CONFLICT (payment_key) DO UPDATE SET customer_id = excluded.customer_id, payload = excluded.payload, "
+                "status = 'pending', attempts = 0, available_at = 0, error = NULL, updated_at = excluded.updated_at "
+                "WHERE erp_outbox.status != 'sent' AND erp_outbox.customer_id IS NOT excluded.customer_id",
+                rows
+            )
+
+    def claim(self, limit):
+        """Claims up to limit pending payments that are due, under a lease of LEASE_SECONDS; returns their payloads."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payment_key, payload FROM erp_outbox WHERE status = 'pending' AND available_at <= ? "
+                "ORDER BY bank_id LIMIT ?", (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE erp_outbox SET attempts = attempts + 1, available_at = ? WHERE payment_key = ?",
+                ((now + LEASE_SECONDS, key) for key, _ in rows)
+            )
+        return [json.loads(payload) for _, payload in rows]
+
+    def settle(self, results):
+        """Records the ERP's per-payment results: created and duplicate payments are sent, rejected ones failed."""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE erp_outbox SET status = ?, erp_ref = ?, error = ?, updated_at = ? WHERE payment_key = ?",
+                (
+                    ('failed' if result['status'] == 'rejected' else 'sent', result.get('erp_ref'), result.get('error'), now, result['payment_key'])
+                    for result in results
+                )
+            )
+
+    def release(self, keys, error):
+        """Puts payments whose batch failed back for a later retry with backoff, or fails them after MAX_ATTEMPTS."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE erp_outbox SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "available_at = ? + ? * (1 << (attempts - 1)), error = ?, updated_at = ? WHERE payment_key = ?",
+                ((MAX_ATTEMPTS, now, RETRY_SECONDS, error, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), key) for key in keys)
+            )
+
+
+def build_payments(df_bank_matched, df_outbox):
+    """Returns the payments of matched incoming transactions (a customer and a positive amount) to add to the outbox.
+
+    Transactions the outbox (as loaded by ERPOutbox.load) already holds for the same customer, or has sent, are left out.
+    """
+    customer = df_bank_matched['matched client id'].astype('float64')
+    known = df_bank_matched['id'].map(df_outbox.set_index('bank_id')['customer_id'].astype('float64'))
+    sent = df_bank_matched['id'].map(df_outbox.set_index('bank_id')['status']).eq('sent')
+    df = df_bank_matched[customer.notna() & (df_bank_matched['amount'] > 0) & customer.ne(known) & ~sent]
+    comments = (df['sender'].fillna('') + ' ' + df['description'].fillna('')).str.strip()
+    return [
+        {'payment_key': payment_key(bank_id), 'bank_id': int(bank_id), 'customer_id': int(customer_id),
+         'date': str(date), 'amount': float(amount), 'comments': comment}
+        for bank_id, customer_id, date, amount, comment
+        in zip(df['id'], df['matched client id'], df['date'], df['amount'], comments)
+    ]
+
+
+def export_payments(outbox, connector, batch_size=BATCH_SIZE, workers=WORKERS, progress=None):
+    """Posts every due payment in the outbox in batches through a pool of workers, until none are left.
+
+    At most 2 * workers batches are claimed ahead of the ERP. progress(done, total) is called after each
+    batch. Returns {'sent', 'duplicates', 'rejected', 'failed', 'batches', 'seconds', 'payments_per_second'},
+    'failed' counting the payments of batches that failed as a whole.
+    """
+    report = {'sent': 0, 'duplicates': 0, 'rejected': 0, 'failed': 0, 'batches': 0}
+    total = outbox.counts()['pending']
+    start = time.perf_counter()
+
+    def post(batch):
+        keys = [payment['payment_key'] for payment in batch]
+        try:
+            with span('erp_post_batch'):
+                results = connector.post_payments(batch)
+        except ERPError as e:
+            outbox.release(keys, str(e))
+            return {'failed': len(batch)}
+        outbox.settle(results)
+        statuses = [result['status'] for result in results]
+        return {'sent': statuses.count('created'), 'duplicates': statuses.count('duplicate'), 'rejected': statuses.count('rejected')}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='erp') as pool:
+        running, exhausted = set(), False
+        while True:
+            while not exhausted and len(running) < 2 * workers:
+                batch = outbox.claim(batch_size)
+                if not batch:
+                    exhausted = True
+                    break
+                running.add(pool.submit(post, batch))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                for name, count in future.result().items():
+                    report[name] += count
+                    metrics.inc('erp_payments_total', count, result=name)
+                report['batches'] += 1
+            if progress is not None:
+                progress(report['sent'] + report['duplicates'] + report['rejected'] + report['failed'], total)
+
+    report['seconds'] = time.perf_counter() - start
+    posted = report['sent'] + report['duplicates'] + report['rejected']
+    report['payments_per_second'] = posted / report['seconds'] if report['seconds'] else 0.0
+    return report
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from elasticsearch import Elasticsearch
+from elastic_transport import Transport
+
+import config
+from instrumentation import metrics
+
+# Statuses worth retrying on another attempt (rejected, gateway errors, unavailable)
+RETRY_ON_STATUS = (429, 502, 503, 504)
+# How long a health probe result is reused
+HEALTH_TTL = 5.0
+
+_client = None
+_client_lock = threading.Lock()
+_health = {'checked': 0.0, 'result': None}
+
+
+def _endpoint(method, target):
+    """Groups requests by their API, so '/es_client_combined_17/_msearch' becomes 'POST _msearch'."""
+    parts = [part for part in target.split('?')[0].split('/') if part]
+    api = next((part for part in reversed(parts) if part.startswith('_')), 'index' if parts else 'root')
+    return f"{method} {api}"
+
+
+class TimedTransport(Transport):
+    """Transport that records the latency of every request, retries included, in the 'es_request_seconds'
+    histogram and failed ones in 'es_request_errors_total', both labelled with the endpoint."""
+
+    def perform_request(self, method, target, **kwargs):
+        start = time.perf_counter()
+        error = True
+        try:
+            response = super().perform_request(method, target, **kwargs)
+            error = False
+            return response
+        finally:
+            endpoint = _endpoint(method, target)
+            metrics.observe('es_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+            if error:
+                metrics.inc('es_request_errors_total', endpoint=endpoint)
+
+
+def get_client():
+    """Returns the process-wide Elasticsearch client, created on first use from config.
+
+    Its connection pool keeps connections alive across calls and Streamlit sessions, so requests skip the
+    TLS handshake; timeouts and retries of 429/5xx responses apply to every request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Elasticsearch(
+                    config.ELASTIC_URL,
+                    basic_auth=(config.ELASTIC_USER, config.ELASTIC_PASSWORD),
+                    verify_certs=config.ELASTIC_VERIFY_CERTS,
+                    ca_certs=config.ELASTIC_CA_CERTS,
+                    ssl_show_warn=False,
+                    connections_per_node=config.ELASTIC_CONNECTIONS,
+                    request_timeout=config.ELASTIC_REQUEST_TIMEOUT,
+                    max_retries=config.ELASTIC_MAX_RETRIES,
+                    retry_on_status=RETRY_ON_STATUS,
+                    retry_on_timeout=True,
+                    transport_class=TimedTransport,
+                )
+    return _client
+
+
+def health(force=False):
+    """Probes the cluster and returns {'ok', 'status', 'latency_ms', 'error'}, reusing a result for HEALTH_TTL seconds."""
+    now = time.monotonic()
+    if not force and _health['result'] is not None and now - _health['checked'] < HEALTH_TTL:
+        return _health['result']
+    start = time.perf_counter()
+    try:
+        status = get_client().options(request_timeout=5, max_retries=0).cluster.health()['status']
+        result = {'ok': status in ('green', 'yellow'), 'status': status, 'error': None}
+    except Exception as e:
+        result = {'ok': False, 'status': None, 'error': str(e)}
+    result['latency_ms'] = (time.perf_counter() - start) * 1000
+    _health.update(checked=now, result=result)
+    return result
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,317 @@
+import hashlib
+import itertools
+import json
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import storage
+
+INDEX_ALIAS = 'es_client_combined'
+COMBINED_TABLE = 'client_combined'
+
+# Indexing pipeline defaults: rows read from SQLite per fetch, documents per bulk request,
+# request size cap, concurrent bulk requests, and retries for rejected (429) documents
+READ_CHUNK_ROWS = 5000
+BULK_CHUNK_SIZE = 1000
+BULK_MAX_CHUNK_BYTES = 10 * 1024 * 1024
+BULK_THREAD_COUNT = 4
+BULK_MAX_RETRIES = 3
+BULK_INITIAL_BACKOFF = 2
+
+# Every column is copied into this one folded field, and queries only search it (or its edge n-grams)
+SEARCH_FIELD = 'search_all'
+# Bump when index_template() changes, so the next sync rebuilds instead of updating an index with the old mapping
+MAPPING_VERSION = 2
+
+
+def index_template(alias=INDEX_ALIAS):
+    """Returns the index template applied to the versioned indices behind the alias.
+
+    The source columns are stored but not indexed; their values are copied into SEARCH_FIELD, analyzed
+    with the lowercase/asciifolding chain from fuzzy_duplicate_detection.ipynb, plus an edge n-gram
+    sub-field for search-as-you-type. One shard and no replicas suit an index of this size.
+    """
+    return {
+        'index_patterns': [f'{alias}_*'],
+        'template': {
+            'settings': {
+                'number_of_shards': 1,
+                'number_of_replicas': 0,
+                'analysis': {
+                    'filter': {
+                        'autocomplete_filter': {'type': 'edge_ngram', 'min_gram': 2, 'max_gram': 15},
+                    },
+                    'analyzer': {
+                        'folding_analyzer': {
+                            'type': 'custom',
+                            'tokenizer': 'standard',
+                            'filter': ['lowercase', 'asciifolding'],
+                        },
+                        'autocomplete_analyzer': {
+                            'type': 'custom',
+                            'tokenizer': 'standard',
+                            'filter': ['lowercase', 'asciifolding', 'autocomplete_filter'],
+                        },
+                    },
+                },
+            },
+            'mappings': {
+                '_meta': {'mapping_version': MAPPING_VERSION},
+                'dynamic_templates': [
+                    {'grades': {
+                        'match': 'grade *',
+                        'mapping': {'type': 'short', 'index': False, 'copy_to': SEARCH_FIELD},
+                    }},
+                    {'strings': {
+                        'match_mapping_type': 'string',
+                        'mapping': {'type': 'keyword', 'index': False, 'doc_values': False, 'copy_to': SEARCH_FIELD},
+                    }},
+                ],
+                'properties': {
+                    # Copied too, so a bank description quoting only the client id still matches
+                    'client id': {'type': 'long', 'index': False, 'copy_to': SEARCH_FIELD},
+                    SEARCH_FIELD: {
+                        'type': 'text',
+                        'analyzer': 'folding_analyzer',
+                        'fields': {
+                            'prefix': {'type': 'text', 'analyzer': 'autocomplete_analyzer', 'search_analyzer': 'folding_analyzer'},
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+def ensure_index_template(es, alias=INDEX_ALIAS):
+    es.indices.put_index_template(name=f'{alias}_template', **index_template(alias))
+
+
+def _mapping_version(es, index_name):
+    mappings = es.indices.get_mapping(index=index_name)[index_name]['mappings']
+    return mappings.get('_meta', {}).get('mapping_version')
+
+
+class BulkSyncError(Exception):
+    """Raised when documents still fail after the retries, so stored hashes are left untouched."""
+
+
+def document_hash(source):
+    return hashlib.sha1(json.dumps(source, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def store_client_combined(df_client_combined, db_path):
+    """Writes the combined clients, with a hash of each document, to the table the indexer streams from.
+
+    Returns a hash over all the document hashes, which only changes with the contents.
+    """
+    records = df_client_combined.to_dict(orient='records')
+    hashes = [document_hash({key: value for key, value in record.items() if not pd.isna(value)}) for record in records]
+    frame = df_client_combined.assign(doc_hash=hashes)
+    columns = ', '.join(f'"{column}"' for column in frame.columns)
+    placeholders = ', '.join('?' * len(frame.columns))
+    # Written by hand rather than with to_sql, which would commit the shared connection's transaction halfway
+    with storage.transaction(db_path) as conn:
+        conn.execute(f'DROP TABLE IF EXISTS {COMBINED_TABLE}')
+        conn.execute(pd.io.sql.get_schema(frame, COMBINED_TABLE, con=conn))
+        storage.executemany_batched(
+            conn, f'INSERT INTO {COMBINED_TABLE} ({columns}) VALUES ({placeholders})',
+            frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        )
+        conn.execute(f'CREATE UNIQUE INDEX idx_{COMBINED_TABLE}_client_id ON {COMBINED_TABLE} ("client id")')
+    return hashlib.sha1(''.join(hashes).encode('utf-8')).hexdigest()
+
+
+# Databases whose es_doc_hash table this process has already created
+_hash_tables = set()
+
+
+@contextmanager
+def _connect(db_path):
+    """Yields the shared streamlit.db connection inside one write transaction."""
+    with storage.transaction(db_path) as conn:
+        if db_path not in _hash_tables:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS es_doc_hash ("
+                "doc_id TEXT PRIMARY KEY, "
+                "hash TEXT NOT NULL, "
+                "index_name TEXT NOT NULL)"
+            )
+            _hash_tables.add(db_path)
+        yield conn
+
+
+@contextmanager
+def _reading(db_path):
+    """Yields this thread's read connection to streamlit.db, once es_doc_hash exists."""
+    if db_path not in _hash_tables:
+        with _connect(db_path):
+            pass
+    with storage.reading(db_path) as conn:
+        yield conn
+
+
+def iter_index_actions(db_path, index_name, changed_only=False, doc_ids=None, chunk_rows=READ_CHUNK_ROWS):
+    """Lazily yields bulk index actions read from the combined clients table in chunks.
+
+    changed_only limits the rows to those whose hash differs from the one stored for index_name,
+    and doc_ids to an explicit list of client ids (used to retry rejected documents).
+    The read connection is taken inside the generator, since parallel_bulk consumes it from its own thread.
+    """
+    query = f'SELECT c.* FROM {COMBINED_TABLE} c'
+    params = []
+    if changed_only:
+        query += ' LEFT JOIN es_doc_hash h ON h.doc_id = CAST(c."client id" AS TEXT) AND h.index_name = ? WHERE h.hash IS NOT c.doc_hash'
+        params.append(index_name)
+    elif doc_ids is not None:
+        query += f' WHERE CAST(c."client id" AS TEXT) IN ({",".join("?" * len(doc_ids))})'
+        params.extend(doc_ids)
+
+    with _reading(db_path) as conn:
+        cursor = conn.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        while rows := cursor.fetchmany(chunk_rows):
+            for row in rows:
+                # Grades are stored as REAL; whole numbers go out as ints so they are searchable as written
+                source = {
+                    column: int(value) if isinstance(value, float) and value.is_integer() else value
+                    for column, value in zip(columns, row) if value is not None and column != 'doc_hash'
+                }
+                yield {"_op_type": "index", "_index": index_name, "_id": str(source['client id']), "_source": source}
+
+
+def _removed_doc_ids(conn, index_name):
+    return [doc_id for (doc_id,) in conn.execute(
+        f'SELECT doc_id FROM es_doc_hash WHERE index_name = ? '
+        f'AND doc_id NOT IN (SELECT CAST("client id" AS TEXT) FROM {COMBINED_TABLE})',
+        (index_name,)
+    )]
+
+
+def _bulk_pass(es, actions, thread_count, chunk_size, max_chunk_bytes):
+    """Runs one parallel_bulk pass and returns (docs written, rejected (op, id) pairs, other failures)."""
+    # Imported here so storing the combined clients doesn't load the Elasticsearch client
+    from elasticsearch import helpers
+
+    written, rejected, failed = 0, [], []
+    for ok, item in helpers.parallel_bulk(
+        es, actions,
+        thread_count=thread_count,
+        chunk_size=chunk_size,
+        max_chunk_bytes=max_chunk_bytes,
+        queue_size=thread_count,  # bounds the chunks buffered ahead of the workers
+        raise_on_error=False,
+        raise_on_exception=False,
+    ):
+        op_type, info = next(iter(item.items()))
+        if ok or (op_type == 'delete' and info.get('status') == 404):
+            written += 1
+        elif info.get('status') == 429:
+            rejected.append((op_type, info['_id']))
+        else:
+            failed.append(item)
+    return written, rejected, failed
+
+
+def bulk_load(es, db_path, index_name, actions, thread_count=BULK_THREAD_COUNT, chunk_size=BULK_CHUNK_SIZE,
+              max_chunk_bytes=BULK_MAX_CHUNK_BYTES, max_retries=BULK_MAX_RETRIES, initial_backoff=BULK_INITIAL_BACKOFF):
+    """Streams actions into index_name with refresh paused, retrying rejected documents with exponential backoff."""
+    previous = es.indices.get_settings(index=index_name)[index_name]['settings']['index'].get('refresh_interval')
+    es.indices.put_settings(index=index_name, settings={'index': {'refresh_interval': '-1'}})
+    try:
+        written, rejected, failed = _bulk_pass(es, actions, thread_count, chunk_size, max_chunk_bytes)
+        for attempt in range(max_retries):
+            if not rejected or failed:
+                break
+            time.sleep(initial_backoff * 2 ** attempt)
+            deletes = [doc_id for op_type, doc_id in rejected if op_type == 'delete']
+            indexes = [doc_id for op_type, doc_id in rejected if op_type != 'delete']
+            retry = [{"_op_type": "delete", "_index": index_name, "_id": doc_id} for doc_id in deletes]
+            if indexes:
+                retry = itertools.chain(retry, iter_index_actions(db_path, index_name, doc_ids=indexes))
+            retried, rejected, failed = _bulk_pass(es, retry, thread_count, chunk_size, max_chunk_bytes)
+            written += retried
+    finally:
+        es.indices.put_settings(index=index_name, settings={'index': {'refresh_interval': previous}})
+    es.indices.refresh(index=index_name)
+
+    if rejected or failed:
+        raise BulkSyncError(f"{len(rejected) + len(failed)} document(s) failed to index into '{index_name}': {failed[:3]}")
+    return written
+
+
+def _alias_indices(es, alias):
+    """Returns the concrete indices behind the alias, or [] if the alias does not exist."""
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias).keys())
+
+
+def _swap_alias(es, alias, index_name):
+    """Atomically points the alias at index_name and drops the indices it used to point at."""
+    previous = _alias_indices(es, alias)
+    actions = [{"remove": {"index": old, "alias": alias}} for old in previous]
+    if not previous and es.indices.exists(index=alias):
+        # Replaces a concrete index created before aliases were used, in the same atomic step
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": index_name, "alias": alias}})
+    es.indices.update_aliases(actions=actions)
+    for old in previous:
+        es.indices.delete(index=old, ignore_unavailable=True)
+
+
+def sync_client_index(es, db_path, alias=INDEX_ALIAS, full_rebuild=False, **bulk_options):
+    """Brings the alias in line with the combined clients table, sending only changed or removed documents.
+
+    Falls back to a full rebuild into a new versioned index when forced, when the alias does not exist yet,
+    when no hashes are stored for the index currently behind it, or when that index predates MAPPING_VERSION.
+    Returns a report with the mode, the concrete index, docs skipped/updated/deleted and the elapsed seconds.
+    """
+    start_time = time.time()
+    indices = _alias_indices(es, alias)
+    with _reading(db_path) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM {COMBINED_TABLE}").fetchone()[0]
+        stored = 0
+        if len(indices) == 1:
+            stored = conn.execute("SELECT COUNT(*) FROM es_doc_hash WHERE index_name = ?", (indices[0],)).fetchone()[0]
+
+    if full_rebuild or not stored or _mapping_version(es, indices[0]) != MAPPING_VERSION:
+        mode = 'rebuild'
+        index_name = f"{alias}_{int(time.time() * 1000)}"
+        ensure_index_template(es, alias)
+        es.indices.create(index=index_name)
+        updated = bulk_load(es, db_path, index_name, iter_index_actions(db_path, index_name), **bulk_options)
+        deleted = 0
+        _swap_alias(es, alias, index_name)
+    else:
+        mode = 'incremental'
+        index_name = indices[0]
+        with _reading(db_path) as conn:
+            removed = _removed_doc_ids(conn, index_name)
+        deletes = [{"_op_type": "delete", "_index": index_name, "_id": doc_id} for doc_id in removed]
+        actions = itertools.chain(deletes, iter_index_actions(db_path, index_name, changed_only=True))
+        written = bulk_load(es, db_path, index_name, actions, **bulk_options)
+        updated, deleted = written - len(removed), len(removed)
+
+    with _connect(db_path) as conn:
+        if mode == 'rebuild':
+            conn.execute("DELETE FROM es_doc_hash")
+        else:
+            conn.execute("DELETE FROM es_doc_hash WHERE index_name != ?", (index_name,))
+            conn.executemany("DELETE FROM es_doc_hash WHERE doc_id = ?", [(doc_id,) for doc_id in removed])
+        conn.execute(
+            f'INSERT OR REPLACE INTO es_doc_hash (doc_id, hash, index_name) '
+            f'SELECT CAST("client id" AS TEXT), doc_hash, ? FROM {COMBINED_TABLE}',
+            (index_name,)
+        )
+
+    return {
+        'mode': mode,
+        'index': index_name,
+        'skipped': total - updated,
+        'updated': updated,
+        'deleted': deleted,
+        'seconds': time.time() - start_time,
+    }
@@ -0,0 +1,68 @@
+import pandas as pd
+
+from client_search import fold
+
+# Candidate keys in normalized (lowercased, single-spaced) search terms: account numbers (two letters, two check
+# digits and the digits after them, maybe grouped with spaces or dashes), emails, and words that could be handles
+ACCOUNT_PATTERN = r'\b[a-z]{2}\d{2}(?:[ -]?\d){5,30}\b'
+EMAIL_PATTERN = r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'
+WORD_PATTERN = r'\w+(?:[.-]\w+)*'
+KEY_PATTERN = f'{EMAIL_PATTERN}|{ACCOUNT_PATTERN}|{WORD_PATTERN}'
+# Columns of df_client_combined holding names; a handle spelled like one of their words is not a key
+NAME_COLUMN_PREFIXES = ('name', 'last name', 'student name', 'student last name')
+
+
+def _account_keys(values):
+    return values.str.lower().str.replace(r'[\s-]', '', regex=True)
+
+
+def _lower_keys(values):
+    return values.str.strip().str.lower()
+
+
+# Client columns indexed as exact keys, and how their values are normalized
+KEY_COLUMNS = {'account number': _account_keys, 'email1': _lower_keys, 'email2': _lower_keys, 'handle': _lower_keys}
+
+
+class ExactMatcher:
+    """Hash indexes from the normalized account numbers, emails and handles of df_client_combined to client ids.
+
+    A key shared by several clients is left out, and so is a handle that is also a word of some client's or
+    student's name, since a description naming that person would otherwise resolve to the handle's owner.
+    """
+
+    def __init__(self, df_client_combined):
+        frames = [
+            pd.DataFrame({'key': normalize(df_client_combined[column].astype('string')), 'client id': df_client_combined['client id'], 'column': column})
+            for column, normalize in KEY_COLUMNS.items() if column in df_client_combined
+        ]
+        keys = pd.concat(frames, ignore_index=True).dropna(subset=['key'])
+        keys = keys[keys['key'] != '']
+
+        name_columns = [column for column in df_client_combined.columns if column.rstrip(' 0123456789') in NAME_COLUMN_PREFIXES]
+        name_words = set(fold(df_client_combined[name_columns].stack().astype(str)).str.findall(WORD_PATTERN).explode().dropna())
+        keys = keys[(keys['column'] != 'handle') | ~keys['key'].isin(name_words)]
+
+        owners = keys.groupby('key')['client id'].nunique()
+        keys = keys[keys['key'].isin(owners.index[owners == 1])].drop_duplicates('key')
+        self.index = keys.set_index('key')['client id']
+
+    def __len__(self):
+        return len(self.index)
+
+    def match(self, terms):
+        """Returns the client id each normalized search term in a Series resolves to, as an Int64 Series (NA when none).
+
+        A term resolves when every key found in it belongs to the same client.
+        """
+        terms = terms.reset_index(drop=True)
+        # One pass over the terms; an email or account number is tried before the words inside it
+        tokens = terms.str.findall(KEY_PATTERN).explode().dropna()
+        unique_tokens = pd.Series(tokens.unique())
+        keys = unique_tokens.where(~unique_tokens.str.fullmatch(ACCOUNT_PATTERN), _account_keys(unique_tokens))
+        owner = pd.Series(keys.map(self.index).to_numpy(), index=unique_tokens)
+
+        hits = tokens.map(owner).dropna()
+        bounds = hits.groupby(level=0).agg(['min', 'max'])
+        resolved = bounds.loc[bounds['min'] == bounds['max'], 'min']
+        return resolved.reindex(terms.index).astype('Int64').rename(None)
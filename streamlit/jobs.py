@@ -0,0 +1,259 @@
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import storage
+from instrumentation import log_buffer, span
+
+# Jobs running at once, and stages running at once across them
+JOB_WORKERS = 2
+STAGE_WORKERS = 4
+# Finished jobs kept in the job table
+KEEP_JOBS = 200
+
+ACTIVE = ('queued', 'running')
+
+_current = threading.local()
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def current_job():
+    """Returns the Job whose stage is running on this thread, or None outside background jobs."""
+    return getattr(_current, 'job', None)
+
+
+def job_log(message):
+    """Appends a line to the running job's log; returns False when not called from a job."""
+    job = current_job()
+    if job is None:
+        return False
+    job.log(message)
+    return True
+
+
+def report_progress(fraction):
+    """Sets the running stage's progress (0-1); a no-op outside background jobs."""
+    job = current_job()
+    if job is not None:
+        job.set_progress(_current.stage, fraction)
+
+
+class Job:
+    """One run of a pipeline: its stages, their status, progress and timing, and the stage outputs."""
+
+    def __init__(self, job_id, stages, params, created_at=None):
+        self.id = job_id
+        self.params = params
+        self.status = 'queued'
+        self.error = None
+        self.created_at = created_at or _now()
+        self.started_at = self.finished_at = None
+        self.stages = {name: {'status': 'pending', 'progress': 0.0, 'seconds': None} for name in stages}
+        self.logs = log_buffer()
+        self.outputs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def progress(self):
+        return sum(stage['progress'] for stage in self.stages.values()) / max(len(self.stages), 1)
+
+    def log(self, line):
+        with self._lock:
+            self.logs.append(line)
+
+    def set_progress(self, stage, fraction):
+        self.update_stage(stage, progress=min(max(float(fraction), 0.0), 1.0))
+
+    def update_stage(self, stage, **fields):
+        with self._lock:
+            self.stages[stage].update(fields)
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def snapshot(self):
+        """Returns the job as a plain dict, the same shape JobRunner.job() reads back from the table."""
+        with self._lock:
+            return {
+                'id': self.id, 'status': self.status, 'progress': self.progress, 'params': dict(self.params),
+                'stages': {name: dict(stage) for name, stage in self.stages.items()}, 'logs': list(self.logs),
+                'error': self.error, 'created_at': self.created_at, 'started_at': self.started_at, 'finished_at': self.finished_at,
+            }
+
+
+class JobRunner:
+    """Runs pipelines of stages in the background and records every job in the 'job' table.
+
+    stages maps a stage name to (function, stages it needs, stages it runs after), listed in a valid run order.
+    Needed stages are added to every job running the stage, while the stages it runs after only order it
+    when the job includes them. A stage function is called as function(inputs, **params), with inputs
+    holding the outputs of the stages it needs; stages whose inputs are ready run concurrently.
+    Submitting a pipeline that an active job already covers with the same params returns that job
+    instead of starting another one.
+    """
+
+    def __init__(self, db_path, stages, workers=JOB_WORKERS, stage_workers=STAGE_WORKERS):
+        self.db_path = db_path
+        self.stage_specs = stages
+        self._jobs = {}
+        self._latest = {}
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._job_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._stage_pool = ThreadPoolExecutor(max_workers=stage_workers, thread_name_prefix='job-stage')
+        with storage.transaction(db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job (id INTEGER PRIMARY KEY AUTOINCREMENT, targets TEXT, params TEXT, "
+                "status TEXT, progress REAL, stages TEXT, log TEXT, error TEXT, created_at TEXT, started_at TEXT, finished_at TEXT)"
+            )
+            # Jobs left active by a previous process will never finish
+            conn.execute(
+                "UPDATE job SET status = 'failed', error = 'Interrupted by a restart', finished_at = ? WHERE status IN ('queued', 'running')",
+                (_now(),)
+            )
+
+    def plan(self, targets):
+        """Returns the target stages and everything they need, in run order."""
+        needed, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stage_specs:
+                raise ValueError(f"Unknown stage '{name}'.")
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stage_specs[name][1])
+        return [name for name in self.stage_specs if name in needed]
+
+    def submit(self, targets, **params):
+        """Queues a job running the target stages, or returns the id of an active job that already covers them."""
+        stages = self.plan(targets)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in ACTIVE and job.params == params and set(stages) <= set(job.stages):
+                    return job.id
+            with storage.transaction(self.db_path) as conn:
+                cursor = conn.execute(
+                    "INSERT INTO job (targets, params, status, progress, created_at) VALUES (?, ?, 'queued', 0, ?)",
+                    (','.join(targets), json.dumps(params), _now())
+                )
+                job = Job(cursor.lastrowid, stages, params)
+                conn.execute(
+                    "DELETE FROM job WHERE id <= ? AND status NOT IN ('queued', 'running')", (job.id - KEEP_JOBS,)
+                )
+            self._jobs[job.id] = job
+        self._save(job)
+        self._job_pool.submit(self._run, job)
+        return job.id
+
+    def job(self, job_id):
+        """Returns a job as a dict, from memory while this process holds it and from the table otherwise."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        with storage.reading(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id, status, progress, params, stages, log, error, created_at, started_at, finished_at FROM job WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('id', 'status', 'progress', 'params', 'stages', 'logs', 'error', 'created_at', 'started_at', 'finished_at')
+        snapshot = dict(zip(keys, row))
+        for key in ('params', 'stages', 'logs'):
+            snapshot[key] = json.loads(snapshot[key]) if snapshot[key] else ({} if key != 'logs' else [])
+        return snapshot
+
+    def active_jobs(self):
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values() if job.status in ACTIVE]
+
+    def latest(self, stage):
+        """Returns {'job', 'finished_at', 'output'} for the last successful run of a stage, or None."""
+        with self._lock:
+            return self._latest.get(stage)
+
+    def seconds_since_failure(self, stage):
+        """Returns how long ago the last run of a stage failed or was skipped, or None when it succeeded."""
+        with self._lock:
+            failed = self._failed.get(stage)
+        return None if failed is None else time.monotonic() - failed
+
+    def _save(self, job):
+        snapshot = job.snapshot()
+        with storage.transaction(self.db_path) as conn:
+            conn.execute(
+                "UPDATE job SET status = ?, progress = ?, stages = ?, log = ?, error = ?, started_at = ?, finished_at = ? WHERE id = ?",
+                (snapshot['status'], snapshot['progress'], json.dumps(snapshot['stages']), json.dumps(snapshot['logs']),
+                 snapshot['error'], snapshot['started_at'], snapshot['finished_at'], job.id)
+            )
+
+    def _record_failure(self, stage):
+        with self._lock:
+            self._failed[stage] = time.monotonic()
+
+    def _run_stage(self, job, name, inputs):
+        _current.job, _current.stage = job, name
+        try:
+            with span('job_stage', stage=name):
+                return self.stage_specs[name][0](inputs, **job.params)
+        finally:
+            _current.job = _current.stage = None
+
+    def _run(self, job):
+        try:
+            self._run_stages(job)
+        except Exception as e:
+            job.update(status='failed', error=f"{type(e).__name__}: {e}", finished_at=_now())
+            self._save(job)
+        finally:
+            with self._lock:
+                # Outputs live on in _latest; finished jobs are read back from the table
+                self._jobs.pop(job.id, None)
+
+    def _run_stages(self, job):
+        job.update(status='running', started_at=_now())
+        self._save(job)
+        running, started = {}, {}
+        while True:
+            for name, stage in job.snapshot()['stages'].items():
+                _, needs, after = self.stage_specs[name]
+                waits_for = [other for other in needs + after if other in job.stages]
+                if stage['status'] != 'pending':
+                    continue
+                if any(job.stages[other]['status'] in ('failed', 'skipped') for other in waits_for):
+                    job.update_stage(name, status='skipped')
+                    self._record_failure(name)
+                elif all(job.stages[other]['status'] == 'succeeded' for other in waits_for):
+                    job.update_stage(name, status='running', started_at=_now())
+                    started[name] = time.perf_counter()
+                    inputs = {need: job.outputs[need] for need in needs}
+                    running[self._stage_pool.submit(self._run_stage, job, name, inputs)] = name
+            if not running:
+                break
+            self._save(job)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                seconds = round(time.perf_counter() - started[name], 3)
+                try:
+                    job.outputs[name] = future.result()
+                    job.update_stage(name, status='succeeded', progress=1.0, seconds=seconds)
+                    with self._lock:
+                        self._latest[name] = {'job': job.id, 'finished_at': _now(), 'output': job.outputs[name]}
+                        self._failed.pop(name, None)
+                except Exception as e:
+                    job.update_stage(name, status='failed', seconds=seconds, error=f"{type(e).__name__}: {e}")
+                    self._record_failure(name)
+                    job.log(f"{datetime.now().strftime('%d-%m-%Y - %H:%M')}     {name}\t\tStage failed with {type(e).__name__}: {e}")
+
+        failed = [name for name, stage in job.snapshot()['stages'].items() if stage['status'] == 'failed']
+        job.update(status='failed' if failed else 'succeeded', error=f"Stage {', '.join(failed)} failed." if failed else None, finished_at=_now())
+        self._save(job)
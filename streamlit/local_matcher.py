@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from client_search import build_search_text, fold
+
+# Close to the standard tokenizer: word characters, kept together across inner dots and apostrophes
+TOKEN_PATTERN = r"\w+(?:[.'’]\w+)*"
+
+# Lucene's BM25 defaults, as used by Elasticsearch
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Search terms scored per sparse product, bounding the size of the score matrix
+QUERY_CHUNK = 1000
+
+
+def tokenize(texts):
+    """Returns the folded tokens of every string in a Series."""
+    return fold(texts.fillna('').astype(str)).str.findall(TOKEN_PATTERN)
+
+
+class LocalMatcher:
+    """In-process stand-in for a match query on the search field of es_client_combined.
+
+    Clients are indexed the way the index template does it (every column, the id included, folded, in one field)
+    into a BM25-weighted sparse matrix, so a batch of search terms is scored with a single sparse product
+    and scores land close to the ones Elasticsearch returns.
+    """
+
+    def __init__(self, df_client_combined, k1=BM25_K1, b=BM25_B):
+        self.client_ids = df_client_combined['client id'].to_numpy()
+        doc_tokens = build_search_text(df_client_combined).str.findall(TOKEN_PATTERN)
+
+        self.vocabulary = {}
+        rows, cols = [], []
+        for doc, tokens in enumerate(doc_tokens):
+            for token in tokens:
+                rows.append(doc)
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+        shape = (len(doc_tokens), len(self.vocabulary))
+        tf = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        tf.sum_duplicates()
+
+        # Lucene's BM25: idf * tf / (tf + k1 * (1 - b + b * length / average length)), no (k1 + 1) factor
+        lengths = doc_tokens.str.len().to_numpy(dtype=np.float32)
+        doc_freq = np.bincount(tf.indices, minlength=shape[1])
+        idf = np.log1p((shape[0] - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        length_norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+        row_of_entry = np.repeat(np.arange(shape[0]), np.diff(tf.indptr))
+        tf.data = idf[tf.indices] * tf.data / (tf.data + length_norm[row_of_entry])
+        self.weights_t = tf.T.tocsr()
+
+    def _query_matrix(self, terms):
+        rows, cols = [], []
+        for i, tokens in enumerate(tokenize(pd.Series(terms, dtype=object))):
+            for token in tokens:
+                col = self.vocabulary.get(token)
+                if col is not None:
+                    rows.append(i)
+                    cols.append(col)
+        return csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(terms), len(self.vocabulary)))
+
+    def match(self, terms, min_score_difference=1.0):
+        """Returns (client id, top score, score margin) per search term, with the same ambiguity rule as the _msearch path.
+
+        No hits gives (None, None, None), a single hit its score as margin, and otherwise the top id with the
+        top-1 minus top-2 margin, or None as id when that margin is below min_score_difference.
+        """
+        results = []
+        for start in range(0, len(terms), QUERY_CHUNK):
+            scores = (self._query_matrix(terms[start:start + QUERY_CHUNK]) @ self.weights_t).tocsr()
+            top_doc, top, second = _top_two(scores)
+            for doc, first, runner_up in zip(top_doc, top, second):
+                if doc < 0:
+                    results.append((None, None, None))
+                elif runner_up == -np.inf:
+                    results.append((int(self.client_ids[doc]), float(first), float(first)))
+                else:
+                    margin = float(first - runner_up)
+                    results.append((int(self.client_ids[doc]) if margin >= min_score_difference else None, float(first), margin))
+        return results
+
+
+def _top_two(scores):
+    """Returns per row of a CSR score matrix the top column (-1 for empty rows), its score and the runner-up score.
+
+    Ties go to the lowest column, i.e. the earlier indexed client; missing scores are -inf.
+    """
+    counts = np.diff(scores.indptr)
+    rows = np.repeat(np.arange(scores.shape[0]), counts)
+    nonempty = counts > 0
+    starts = scores.indptr[:-1][nonempty]
+    top_doc = np.full(scores.shape[0], -1, dtype=np.int64)
+    top = np.full(scores.shape[0], -np.inf, dtype=np.float32)
+    second = np.full(scores.shape[0], -np.inf, dtype=np.float32)
+    if not len(starts):
+        return top_doc, top, second
+
+    # Segments of reduceat run from one non-empty row's start to the next, i.e. exactly over that row
+    top[nonempty] = np.maximum.reduceat(scores.data, starts)
+    is_top = scores.data == top[rows]
+    top_doc[nonempty] = np.minimum.reduceat(np.where(is_top, scores.indices, scores.shape[1]), starts)
+    chosen = is_top & (scores.indices == top_doc[rows])
+    second[nonempty] = np.maximum.reduceat(np.where(chosen, -np.inf, scores.data), starts)
+    return top_doc, top, second
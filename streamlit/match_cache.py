@@ -0,0 +1,113 @@
+import time
+from contextlib import contextmanager
+
+import storage
+
+# Bounded so a long history of one-off payers can't grow streamlit.db forever
+DEFAULT_MAX_ENTRIES = 100000
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def normalize_search_terms(terms):
+    """Normalizes a Series of bank search terms into cache keys (lowercased, trimmed, single-spaced).
+
+    Lowercasing is safe because es_client_combined's search field is analyzed with a lowercase filter.
+    """
+    return terms.fillna('').str.replace(r'\s+', ' ', regex=True).str.strip().str.lower()
+
+
+class MatchCache:
+    """Match results persisted in streamlit.db, keyed on (normalized search term, index generation).
+
+    Entries remember when they were last read, and the least recently used ones are evicted once the
+    table grows past max_entries. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Yields the shared streamlit.db connection inside one write transaction."""
+        with storage.transaction(self.db_path) as conn:
+            if not self._ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS match_cache ("
+                    "term TEXT NOT NULL, "
+                    "generation INTEGER NOT NULL, "
+                    "client_id INTEGER, "
+                    "score REAL, "
+                    "margin REAL, "
+                    "last_used REAL NOT NULL, "
+                    "PRIMARY KEY (term, generation))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_match_cache_last_used ON match_cache (last_used)")
+                self._ready = True
+            yield conn
+
+    def get_many(self, terms, generation):
+        """Returns {term: (client id, score, margin)} for the cached terms and counts hits and misses."""
+        found = {}
+        now = time.time()
+        with self._connect() as conn:
+            for i in range(0, len(terms), _LOOKUP_CHUNK):
+                chunk = terms[i:i + _LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT term, client_id, score, margin FROM match_cache WHERE generation = ? AND term IN ({placeholders})",
+                    [generation, *chunk]
+                ).fetchall()
+                for term, client_id, score, margin in rows:
+                    found[term] = (client_id, score, margin)
+            conn.executemany(
+                "UPDATE match_cache SET last_used = ? WHERE term = ? AND generation = ?",
+                [(now, term, generation) for term in found]
+            )
+        self.hits += len(found)
+        self.misses += len(terms) - len(found)
+        return found
+
+    def put_many(self, results, generation):
+        """Stores {term: (client id, score, margin)} for a generation, then evicts down to max_entries."""
+        if not results:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO match_cache (term, generation, client_id, score, margin, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (term, generation, int(client_id) if client_id is not None else None, score, margin, now)
+                    for term, (client_id, score, margin) in results.items()
+                ]
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM match_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM match_cache WHERE rowid IN (SELECT rowid FROM match_cache ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+
+    def invalidate(self, keep_generation=None):
+        """Drops cached results from every generation except keep_generation (all of them if None)."""
+        with self._connect() as conn:
+            if keep_generation is None:
+                conn.execute("DELETE FROM match_cache")
+            else:
+                conn.execute("DELETE FROM match_cache WHERE generation != ?", (keep_generation,))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -2,7 +2,8 @@ import streamlit as st
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
-from utils import load_data_from_sql, log, ensure_data
+from utils import log, ensure_data, invalidate_shared_data
+from tables import paged_table
 
 # Set the Streamlit page configuration with a custom icon
 st.set_page_config(
@@ -20,21 +21,18 @@ with st.sidebar:
 
 def page2():
     st.title("Client and Student Data")
-    if 'logs' not in st.session_state:
-        st.session_state.logs = []
-    if 'df_client' not in st.session_state or 'df_student' not in st.session_state:
-        st.session_state.df_client = load_data_from_sql('client')
-        st.session_state.df_student = load_data_from_sql('student')
+    ensure_data('page2')
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Client Data")
-        st.dataframe(st.session_state.df_client,hide_index=True,column_config={"client id": st.column_config.NumberColumn(format="%f")})
+        paged_table(st.session_state.df_client, 'client', column_config={"client id": st.column_config.NumberColumn(format="%f")})
     with col2:
         st.subheader("Student Data")
-        st.dataframe(st.session_state.df_student,hide_index=True,column_config={"student id": st.column_config.NumberColumn(format="%f")})
+        paged_table(st.session_state.df_student, 'student', column_config={"student id": st.column_config.NumberColumn(format="%f")})
     st.text_area("Logs", value="\n".join(reversed(st.session_state['logs'])), height=200)
     if st.button("Refresh Data"):
-        st.session_state.df_client = load_data_from_sql('client')
-        st.session_state.df_student = load_data_from_sql('student')
+        invalidate_shared_data('client')
+        invalidate_shared_data('student')
+        st.rerun()
 
 page2()
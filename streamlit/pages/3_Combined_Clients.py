@@ -2,7 +2,8 @@ import streamlit as st
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
-from utils import ensure_data, log, combine_clients
+from utils import ensure_data, log, combine_clients, job_progress
+from tables import paged_table
 
 # Set the Streamlit page configuration with a custom icon
 st.set_page_config(
@@ -20,12 +21,18 @@ with st.sidebar:
 
 def page3():
     st.title("Combined Client Data")
-    if 'logs' not in st.session_state:
-        st.session_state.logs = []
     ensure_data('page3')
-    st.dataframe(st.session_state.df_client_combined,hide_index=True,column_config={"client id": st.column_config.NumberColumn(format="%f")})
-    st.text_area("Logs", value="\n".join(reversed(st.session_state['logs'])), height=200)
     if st.button("Update and Upload Data"):
         combine_clients()
+    if st.button("Rebuild Index"):
+        combine_clients(full_rebuild=True)
+    job_progress()
+    if 'df_client_combined' in st.session_state:
+        paged_table(st.session_state.df_client_combined, 'client_combined', column_config={"client id": st.column_config.NumberColumn(format="%f")})
+    elif st.session_state.jobs:
+        st.info("Combining clients and students in the background...")
+    else:
+        st.warning("No results yet, the last run failed. See the logs for details.")
+    st.text_area("Logs", value="\n".join(reversed(st.session_state['logs'])), height=200)
 
 page3()
\ No newline at end of file
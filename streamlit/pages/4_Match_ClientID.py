@@ -2,7 +2,8 @@ import streamlit as st
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
-from utils import ensure_data, log, get_highest_relevance_clientid
+from utils import ensure_data, log, match_job, job_progress
+from tables import paged_table
 
 # Set the Streamlit page configuration
 st.set_page_config(
@@ -20,14 +21,17 @@ with st.sidebar:
 
 def page4():
     st.title("Bank Client ID Matching")
-    if 'logs' not in st.session_state:
-        st.session_state.logs = []
     ensure_data('page4')
-    st.session_state.df_bank_matched = get_highest_relevance_clientid(st.session_state.df_bank_terms, 'es_client_combined')
+    if st.button("Match Client IDs"):
+        match_job()
+    job_progress()
+    pending = st.session_state.df_bank_matched.attrs['pending']
+    if pending and st.session_state.jobs:
+        st.info(f"Matching {pending} new or changed bank transactions to client IDs in the background...")
+    elif pending:
+        st.warning(f"{pending} transactions are not matched yet, the last run failed. See the logs for details.")
     columns = ['id', 'date', 'type', 'sender', 'description', 'amount', 'matched client id']
-    st.dataframe(st.session_state.df_bank_matched[columns], hide_index=True, column_config={"id": st.column_config.NumberColumn(format="%f"), "matched client id": st.column_config.NumberColumn(format="%f")}, width=750)
+    paged_table(st.session_state.df_bank_matched, 'bank_matched', columns=columns, column_config={"id": st.column_config.NumberColumn(format="%f"), "matched client id": st.column_config.NumberColumn(format="%f")}, width=750)
     st.text_area("Logs", value="\n".join(reversed(st.session_state['logs'])), height=200)
-    if st.button("Match Client IDs"):
-        st.session_state.df_bank_matched = get_highest_relevance_clientid(st.session_state.df_bank_terms, 'es_client_combined')
 
 page4()
@@ -2,7 +2,8 @@ import streamlit as st
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
-from utils import ensure_data, log, get_highest_relevance_clientid
+from utils import ensure_data, log, job_progress, erp_sync_job, erp_status
+from tables import paged_table
 
 # Set the Streamlit page configuration with a custom icon
 st.set_page_config(
@@ -20,13 +21,33 @@ with st.sidebar:
 
 def page4():
     st.title("Sync ERP")
-    if 'logs' not in st.session_state:
-        st.session_state.logs = []
-    ensure_data('page4')
-    st.session_state.df_bank_matched = get_highest_relevance_clientid(st.session_state.df_bank_terms, 'es_client_combined')
-    st.dataframe(st.session_state.df_bank_matched,hide_index=True)
-
-    st.text("Pending implementation (rough draft):")
+    ensure_data('page5')
+    job_progress()
+    pending = st.session_state.df_bank_matched.attrs['pending']
+    if pending and st.session_state.jobs:
+        st.info(f"Matching {pending} new or changed bank transactions to client IDs in the background...")
+    elif pending:
+        st.warning(f"{pending} transactions are not matched yet, the last matching run failed. Its logs are on the Match ClientID page.")
+
+    if st.button("Post matched payments to the ERP"):
+        erp_sync_job()
+        st.rerun()
+    counts, report, df_failed = erp_status()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Payments in the ERP", counts['sent'])
+    col2.metric("Waiting in the outbox", counts['pending'])
+    col3.metric("Failed", counts['failed'])
+    if report is not None:
+        st.caption(
+            f"Last sync: {report['sent']} payments posted ({report['duplicates']} already in the ERP) in {report['batches']} batches, "
+            f"{report['payments_per_second']:.0f} payments/s; {report['rejected'] + report['failed']} failed."
+        )
+    if len(df_failed):
+        paged_table(df_failed, 'erp_failed')
+
+    paged_table(st.session_state.df_bank_matched, 'erp_bank_matched')
+
+    st.text("SAP Business One connector (rough draft, to be ported to an erp.ERPConnector):")
 
     code = '''
     import streamlit as st
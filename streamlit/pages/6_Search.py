@@ -2,7 +2,7 @@ import streamlit as st
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
-from utils import search_index, ensure_data
+from utils import search_index, ensure_data, job_progress
 
 # Set the Streamlit page configuration with a custom icon
 st.set_page_config(
@@ -21,6 +21,7 @@ with st.sidebar:
 def page6():
     st.title('Search')
     ensure_data('page6')
+    job_progress()
     search_index()  # All logic is encapsulated in this function
 
 page6()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+from app_meta import get_value, set_value
+
+# Bumped whenever the frames written here change shape, so older snapshots are ignored
+SNAPSHOT_FORMAT = 1
+
+# Arrow-backed strings with NaN for missing values and plain bool comparisons, as object columns behave
+ARROW_STRING = pd.StringDtype('pyarrow_numpy')
+
+
+def _types_mapper(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return ARROW_STRING
+    return None
+
+
+class SnapshotStore:
+    """Frames written as uncompressed Arrow IPC files, stamped with the versions of the tables they were built from.
+
+    Loading memory-maps the file, so numeric columns and the Arrow string buffers are read from the page cache
+    rather than copied, and processes loading the same snapshot share those pages. Table versions are counters
+    kept in db_path, so stamps also carry an id stored there: a replaced database never matches old snapshots.
+    """
+
+    def __init__(self, directory, db_path):
+        self.directory = directory
+        self.db_path = db_path
+        self._database_id = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.arrow')
+
+    def _stamp(self, version):
+        if self._database_id is None:
+            self._database_id = get_value(self.db_path, 'database_id')
+            if self._database_id is None:
+                self._database_id = uuid.uuid4().hex
+                set_value(self.db_path, 'database_id', self._database_id)
+        return json.dumps({'format': SNAPSHOT_FORMAT, 'database': self._database_id, 'version': version})
+
+    def load(self, name, version):
+        """Returns the snapshot of a frame if one exists for exactly this version, and None otherwise."""
+        try:
+            with pa.memory_map(self._path(name)) as source:
+                reader = pa.ipc.open_file(source)
+                metadata = reader.schema.metadata or {}
+                if metadata.get(b'snapshot') != self._stamp(version).encode('utf-8'):
+                    return None
+                table = reader.read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        return table.to_pandas(split_blocks=True, types_mapper=_types_mapper)
+
+    def save(self, name, frame, version):
+        """Writes a frame's snapshot for a version and returns it loaded back, with Arrow-backed strings.
+
+        Each call writes its own temporary file and replaces the snapshot with it atomically, so concurrent saves
+        never mix their writes and concurrent loads see the old snapshot or the new one. Frames Arrow can't convert
+        (mixed-type object columns), and frames whose snapshot a concurrent save for another version replaced
+        before it was loaded back, are returned as they are.
+        """
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return frame
+        table = table.replace_schema_metadata({'snapshot': self._stamp(version)})
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name)
+        # One temporary file per call, so threads saving at once never write into each other's file
+        handle, temp_path = tempfile.mkstemp(prefix=f'{name}.', suffix='.tmp', dir=self.directory)
+        os.close(handle)
+        try:
+            with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        loaded = self.load(name, version)
+        if loaded is None:
+            return frame
+        loaded.attrs.update(frame.attrs)
+        return loaded
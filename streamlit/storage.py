@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+# WAL lets page loads read while a sync writes; NORMAL is durable across app crashes in WAL mode
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # KiB
+}
+BUSY_TIMEOUT = 30  # seconds
+
+# Rows handed to one executemany call
+BATCH_ROWS = 10000
+
+_connections = {}
+_connections_lock = threading.Lock()
+# Each thread reads through its own connections, so reads neither wait for the shared one nor start write transactions
+_readers = threading.local()
+
+
+class _Shared:
+    def __init__(self, db_path):
+        # Streamlit runs every session on its own thread; self.lock serializes them on this connection
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        for pragma, value in PRAGMAS.items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+        self.lock = threading.RLock()
+
+
+def _shared(db_path):
+    with _connections_lock:
+        if db_path not in _connections:
+            _connections[db_path] = _Shared(db_path)
+        return _connections[db_path]
+
+
+@contextmanager
+def reading(db_path):
+    """Yields this thread's read-only connection to db_path; every statement reads the latest committed data.
+
+    In WAL mode it reads alongside the writer, without taking the shared connection's lock.
+    """
+    connections = _readers.__dict__.setdefault('connections', {})
+    conn = connections.get(db_path)
+    if conn is None:
+        # The shared connection sets up WAL before the first reader opens
+        _shared(db_path)
+        conn = connections[db_path] = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA query_only = ON")
+    yield conn
+
+
+@contextmanager
+def transaction(db_path):
+    """Yields the process-wide connection inside one write transaction, committed on success.
+
+    BEGIN IMMEDIATE takes the write lock up front, so writers from other processes wait for busy_timeout
+    instead of failing with 'database is locked' halfway through.
+    """
+    shared = _shared(db_path)
+    with shared.lock:
+        if shared.conn.in_transaction:
+            # Nested use from the same thread joins the outer transaction
+            yield shared.conn
+            return
+        shared.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield shared.conn
+        except BaseException:
+            shared.conn.rollback()
+            raise
+        shared.conn.commit()
+
+
+def executemany_batched(conn, sql, rows, batch_rows=BATCH_ROWS):
+    """Runs sql for every row in batches of batch_rows and returns the number of rows changed."""
+    changes_before = conn.total_changes
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_rows)):
+        conn.executemany(sql, batch)
+    return conn.total_changes - changes_before
+
+
+def upsert(db_path, table_name, frame, key, update_columns=(), stamp_columns=()):
+    """Inserts the rows of frame into table_name in one transaction and returns (inserted, updated).
+
+    A row whose key already exists only has update_columns overwritten, and only when one of them differs,
+    so upserting the same rows again changes nothing. stamp_columns (a sync timestamp, say) are overwritten
+    along with an update but don't count as a difference. key needs a unique index.
+    """
+    if frame.empty:
+        return 0, 0
+    columns = ', '.join(f'"{column}"' for column in frame.columns)
+    placeholders = ', '.join('?' * len(frame.columns))
+    if update_columns:
+        assignments = ', '.join(f'"{column}" = excluded."{column}"' for column in [*update_columns, *stamp_columns])
+        changed = ' OR '.join(f'{table_name}."{column}" IS NOT excluded."{column}"' for column in update_columns)
+        conflict = f'DO UPDATE SET {assignments} WHERE {changed}'
+    else:
+        conflict = 'DO NOTHING'
+    sql = f'INSERT INTO {table_name} ({columns}) VALUES ({placeholders}) ON CONFLICT("{key}") {conflict}'
+
+    # Keys of a batch already in the table, looked up through the unique index, tell inserts from updates
+    existing_sql = f'SELECT COUNT(*) FROM {table_name} WHERE "{key}" IN (SELECT value FROM json_each(?))'
+    key_position = list(frame.columns).index(key)
+    inserted = changes = 0
+    rows = frame.itertuples(index=False, name=None)
+    with transaction(db_path) as conn:
+        while batch := list(islice(rows, BATCH_ROWS)):
+            keys = {row[key_position] for row in batch}
+            inserted += len(keys) - conn.execute(existing_sql, (json.dumps(list(keys)),)).fetchone()[0]
+            changes_before = conn.total_changes
+            conn.executemany(sql, batch)
+            changes += conn.total_changes - changes_before
+    return inserted, changes - inserted
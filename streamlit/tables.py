@@ -0,0 +1,102 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Rows sent to the browser per page
+PAGE_ROWS = 100
+# Background of highlighted rows
+HIGHLIGHT_COLOR = '#d2f4ea'
+
+
+def synced_today(values):
+    """Marks the dates (or datetime strings) in a Series that fall on today, in one vectorized comparison."""
+    return pd.to_datetime(values, errors='coerce').dt.normalize().eq(pd.Timestamp.today().normalize()).to_numpy()
+
+
+def format_dates(values, date_format='%m/%d/%Y'):
+    """Formats the dates (or datetime strings) in a Series, leaving missing ones empty."""
+    return pd.to_datetime(values, errors='coerce').dt.strftime(date_format).fillna('')
+
+
+def filter_positions(df, text, columns):
+    """Returns the positions of the rows where any of columns contains text, ignoring case."""
+    if not text:
+        return np.arange(len(df))
+    mask = np.zeros(len(df), dtype=bool)
+    for column in columns:
+        mask |= df[column].astype(str).str.contains(text, case=False, regex=False, na=False).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def sort_positions(df, positions, sort_by, ascending):
+    """Returns positions reordered by a column of df, stable and with missing values last."""
+    if sort_by is None:
+        return positions
+    values = df[sort_by].iloc[positions].reset_index(drop=True)
+    order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return positions[order]
+
+
+def _row_order(df, key, columns, sort_by, ascending, text):
+    """Returns the filtered and sorted row positions of df, kept in the session until the frame or the query changes."""
+    memo = st.session_state.setdefault('_tables', {}).get(key)
+    query = (tuple(columns), sort_by, ascending, text)
+    if memo is not None and memo['frame'] is df and memo['query'] == query:
+        return memo['positions'], False
+    positions = sort_positions(df, filter_positions(df, text, columns), sort_by, ascending)
+    st.session_state['_tables'][key] = {'frame': df, 'query': query, 'positions': positions}
+    return positions, memo is None or memo['query'] != query
+
+
+def page_view(df, positions, columns, highlight=None, formatters=None, fill_value=None):
+    """Returns the rows of df at positions, formatted for display and styled by highlight (a Styler then).
+
+    Missing values are shown as fill_value when it is given.
+    """
+    page = df.iloc[positions]
+    # The mask is taken from the raw values, before formatting
+    highlighted = highlight(page) if highlight is not None else None
+    for column, formatter in (formatters or {}).items():
+        page = page.assign(**{column: formatter(page[column])})
+    page = page[columns]
+    if fill_value is not None:
+        page = page.fillna(fill_value)
+    if highlighted is not None:
+        styles = np.where(highlighted, f'background-color: {HIGHLIGHT_COLOR}', '')
+        page = page.style.apply(lambda frame: pd.DataFrame(np.repeat(styles[:, None], frame.shape[1], axis=1), index=frame.index, columns=frame.columns), axis=None)
+    return page
+
+
+def paged_table(df, key, columns=None, sort_by=None, ascending=True, highlight=None, formatters=None, fill_value=None, page_rows=PAGE_ROWS, **dataframe_kwargs):
+    """Renders columns (default: all) of df a page at a time, so only the visible page is styled, formatted and sent to the browser.
+
+    Filtering and sorting run on the server over the whole frame and are remembered per key until df (a new
+    object whenever the shared data changes, so pass the shared frame rather than a selection of it) or the
+    query changes. highlight(page) returns a boolean mask over the rows of a page, and formatters maps columns
+    to functions applied to the page's values for display; missing values on the page are shown as fill_value
+    when it is given. The remaining keyword arguments go to st.dataframe.
+    """
+    columns = list(columns if columns is not None else df.columns)
+    c1, c2, c3 = st.columns([4, 2, 1], vertical_alignment='bottom')
+    text = c1.text_input("Filter", key=f'{key}_filter', placeholder="Text in any column")
+    sort_by = c2.selectbox("Sort by", columns, index=columns.index(sort_by) if sort_by in columns else None, key=f'{key}_sort')
+    ascending = c3.toggle("Ascending", value=ascending, key=f'{key}_ascending')
+
+    positions, query_changed = _row_order(df, key, columns, sort_by, ascending, text.strip())
+    pages = max(math.ceil(len(positions) / page_rows), 1)
+    page_key = f'{key}_page'
+    if query_changed or st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = 1
+
+    page_number = st.session_state.get(page_key, 1)
+    start = (page_number - 1) * page_rows
+    page = page_view(df, positions[start:start + page_rows], columns, highlight, formatters, fill_value)
+    st.dataframe(page, hide_index=True, **dataframe_kwargs)
+
+    c1, c2 = st.columns([1, 4], vertical_alignment='center')
+    if pages > 1:
+        c1.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key, label_visibility='collapsed')
+    shown = min(start + page_rows, len(positions))
+    c2.caption(f"Rows {start + 1 if len(positions) else 0}-{shown} of {len(positions)}" + (f" (filtered from {len(df)})" if len(positions) != len(df) else '') + f", page {page_number} of {pages}")
@@ -4,29 +4,125 @@ import sqlite3
 from sqlite3 import OperationalError
 from datetime import datetime
 import time
-import inspect
-import requests
-from elasticsearch import Elasticsearch, helpers
-from elasticsearch_dsl import Search, Q
-from st_keyup import st_keyup
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from match_cache import MatchCache, normalize_search_terms
+from bank_match import BankMatchStore, pending_mask
+from client_search import ClientSearch
+from app_meta import get_index_generation, bump_index_generation, get_local_generation, bump_local_generation, get_table_version, bump_table_version, get_bank_watermark, set_bank_watermark, get_value, set_value
+from bank_client import BankClient, BankAPIError
+import storage
+from es_index import INDEX_ALIAS, SEARCH_FIELD, BulkSyncError, store_client_combined, sync_client_index
+from config import BANK_API_URL, MATCHER_BACKEND, EXACT_PREMATCH, METRICS_PORT, SNAPSHOTS, ERP_CONNECTOR, ERP_URL, ERP_FILE, ERP_BATCH_SIZE, ERP_WORKERS
+from exact_match import ExactMatcher
+from jobs import JobRunner, job_log, report_progress
+from instrumentation import log_buffer, metrics, serve_metrics, timed
+from snapshots import SnapshotStore
+from erp import ERPOutbox, build_payments, export_payments, make_connector
+
+# The Elasticsearch client and DSL, st_keyup and the local matcher (scipy) are imported where they are used,
+# so a page that doesn't search or match doesn't wait for them on the first render in a process
 
 db_path = 'databases/streamlit.db'
 
-def log(message):
-    """Helper function to log messages with a timestamp and the name of the function that called it."""
-    # Using inspect to get the name of the caller function
-    func_name = inspect.currentframe().f_back.f_code.co_name
-    prefix = f"{datetime.now().strftime('%d-%m-%Y - %H:%M')}     {func_name}"
-    st.session_state.logs.append(f"{prefix}\t\t{message}")
+# Students beyond this many per client are left out of the combined row (None keeps all of them)
+MAX_STUDENTS_PER_CLIENT = None
+
+# Indexes for date-range filtering and picking up newly synced rows; ids get a unique index
+BANK_INDEXES = {'idx_bank_date': 'date', 'idx_bank_sync_date': 'bank_sync_date'}
+BANK_ID_INDEX = 'idx_bank_id'
+# Columns owned by the remote bank; the local sync and ERP columns survive a re-sync
+BANK_REMOTE_COLUMNS = ['date', 'type', 'sender', 'description', 'amount']
+_bank_indexes_ready = False
+
+# Fetched transactions logged one by one; the rest are summed up in one line
+LOG_SAMPLE_ROWS = 10
+
+# Permissive search waits this long after the last keystroke, and shows at most this many rows
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_RESULT_LIMIT = 500
 
+# Pages poll running background jobs this often
+JOB_POLL_SECONDS = 1.0
+# A stage that failed is queued again on page loads no sooner than this
+JOB_RETRY_SECONDS = 30
 
-def load_data_from_sql(table_name):
-    """Loads all data from the specified SQL table and logs the process."""
+# Transactions matched and stored per step of the match stage, so an interrupted run keeps what it finished
+MATCH_CHUNK_ROWS = 5000
+
+match_cache = MatchCache(db_path)
+bank_matches = BankMatchStore(db_path)
+snapshot_store = SnapshotStore('databases/snapshots', db_path)
+erp_outbox = ERPOutbox(db_path)
+
+def log(message):
+    """Helper function to log messages with a timestamp and the name of the function that called it.
+
+    Lines go to a ring buffer holding the session's last LOG_LINES (see instrumentation.py); timings and
+    counts belong in instrumentation.metrics rather than in log lines.
+    """
+    # Name of the calling function
+    func_name = sys._getframe(1).f_code.co_name
+    line = f"{datetime.now().strftime('%d-%m-%Y - %H:%M')}     {func_name}\t\t{message}"
+    # Background jobs have no session; their lines reach the sessions following the job once it finishes
+    if not job_log(line):
+        st.session_state.logs.append(line)
+
+
+def ensure_bank_indexes():
+    """Creates the indexes used by date-range and incremental loads of the bank table."""
+    global _bank_indexes_ready
+    if _bank_indexes_ready:
+        return
+    with storage.transaction(db_path) as conn:
+        for index_name, column in BANK_INDEXES.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON bank ("{column}")')
+        # Transaction ids are unique, so sync_transactions can leave deduplication to SQLite
+        removed = 0
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (BANK_ID_INDEX,)).fetchone():
+            # Earlier append-only syncs could store an id twice; keep its first copy
+            removed = conn.execute('DELETE FROM bank WHERE rowid NOT IN (SELECT MIN(rowid) FROM bank GROUP BY id)').rowcount
+            conn.execute(f'CREATE UNIQUE INDEX {BANK_ID_INDEX} ON bank (id)')
+        if removed:
+            invalidate_shared_data('bank')
+    _bank_indexes_ready = True
+
+
+@timed()
+def load_data_from_sql(table_name, columns=None, start_date=None, end_date=None, since=None):
+    """Loads data from the specified SQL table and logs the process.
+
+    columns limits the selected columns, start_date/end_date (inclusive) filter on 'date',
+    and since keeps only rows with a 'bank_sync_date' at or after that timestamp.
+    """
     start_time = time.time()
+    if table_name == 'bank':
+        ensure_bank_indexes()
+
+    selected = ', '.join(f'"{column}"' for column in columns) if columns else '*'
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append('date >= ?')
+        params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+    if end_date is not None:
+        # Dates are ISO strings, so the end day is included by comparing against the following day
+        conditions.append('date < ?')
+        params.append((pd.Timestamp(end_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+    if since is not None:
+        conditions.append('bank_sync_date >= ?')
+        params.append(str(since))
+    query = f"SELECT {selected} FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
     with sqlite3.connect(db_path) as conn:
-        df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-    log(f"Connected to database to retrieve entire table: '{table_name}'")
-    log(f"Retrieved {len(df)} rows from table: '{table_name}'")
+        df = pd.read_sql(query, conn, params=params)
+    if conditions:
+        filters = ' and '.join(condition.replace('?', repr(param)) for condition, param in zip(conditions, params))
+        log(f"Retrieved {len(df)} rows from table: '{table_name}' where {filters}")
+    else:
+        log(f"Retrieved {len(df)} rows from entire table: '{table_name}'")
     log(f"Total time to load data: {time.time() - start_time:.2f} seconds.")
     return df
 
@@ -43,45 +139,63 @@ def load_data_from_sql(table_name):
 #     return df
 
 
+@st.cache_resource(show_spinner=False)
+def erp_connector():
+    """One ERP connector per process, configured by ERP_CONNECTOR (see erp.py)."""
+    return make_connector(ERP_CONNECTOR, ERP_URL if ERP_CONNECTOR == 'http' else ERP_FILE, workers=ERP_WORKERS)
+
+
+@st.cache_resource(show_spinner=False)
+def metrics_server():
+    """Starts the metrics endpoint once per process when METRICS_PORT is set (see instrumentation.serve_metrics)."""
+    if not METRICS_PORT:
+        return None
+    try:
+        return serve_metrics(METRICS_PORT)
+    except OSError as e:
+        log(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def bank_client():
+    """One pooled remote bank client per process."""
+    return BankClient(BANK_API_URL)
+
+
+@timed()
 def found_transactions(from_date, to_date):
-    """Fetches remote bank transactions within a date range and compares them to existing ones."""
+    """Fetches the remote bank transactions within a date range that the sync watermark hasn't covered yet."""
     start_time = time.time()  # Start timing the process
 
-    formatted_from_date = from_date.strftime('%Y-%m-%d')
-    formatted_to_date = to_date.strftime('%Y-%m-%d')
-
-    # FasAPI/dummy-bank endpoint
-    api_url = f'http://fastapi:8000/transactions/date_range/?start_date={formatted_from_date}&end_date={formatted_to_date}'
+    # st.session_state may hold datetimes rather than dates
+    from_date, to_date = pd.Timestamp(from_date).date(), pd.Timestamp(to_date).date()
+    watermark = get_bank_watermark(db_path)
 
     # Fetch transactions from the API
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        api_transactions = pd.DataFrame(response.json())
-        if api_transactions.empty:
-            log("No transactions found in specified date range.")
-            return api_transactions
-        log(f"Connected to remote bank at: {api_url}")
-    except requests.RequestException as e:
+        rows, new_watermark = bank_client().fetch(from_date, to_date, watermark)
+    except BankAPIError as e:
         log(f"API request error: {e}")
         return pd.DataFrame()
 
-    # Retrieve existing transaction IDs from the database
-    try:
-        with sqlite3.connect(db_path) as conn:
-            current_bank_transactions = pd.read_sql('SELECT id FROM bank', conn)
-    except sqlite3.Error as e:
-        log(f"Database error: {e}")
-        return pd.DataFrame()
+    new_transactions = pd.DataFrame(rows)
+    # Saved by sync_transactions once the rows are stored
+    new_transactions.attrs['watermark'] = new_watermark
+    if watermark:
+        log(f"Connected to remote bank at: {BANK_API_URL} (synced up to {watermark['date']}, id {watermark['id']})")
+    else:
+        log(f"Connected to remote bank at: {BANK_API_URL}")
 
-    # Filter out current ids
-    new_transactions = api_transactions[~api_transactions['id'].isin(current_bank_transactions['id'])]
     if not new_transactions.empty:
         # Add sync date to the new transactions
         new_transactions['bank_sync_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S') # '%Y-%m-%d %H:%M:%S'
+        metrics.inc('bank_transactions_fetched_total', len(new_transactions))
         log(f"Found {len(new_transactions)} new transactions:")
-        for _, txn in new_transactions.iterrows():
-            log(f"{txn['date']} | {txn['type']} | {txn['sender']} | {txn['description']} | {txn['amount']}")
+        for txn in new_transactions.head(LOG_SAMPLE_ROWS).itertuples(index=False):
+            log(f"{txn.date} | {txn.type} | {txn.sender} | {txn.description} | {txn.amount}")
+        if len(new_transactions) > LOG_SAMPLE_ROWS:
+            log(f"... and {len(new_transactions) - LOG_SAMPLE_ROWS} more.")
 
         log(f"Total time to load data: {time.time() - start_time:.2f} seconds.")
     else:
@@ -89,166 +203,523 @@ def found_transactions(from_date, to_date):
     return new_transactions
 
 
+@timed()
 def sync_transactions(transactions):
-    """Writes new transactions to the 'bank' table in the database."""
+    """Upserts transactions into the 'bank' table on id, together with the sync watermark, in one transaction."""
+    watermark = transactions.attrs.get('watermark')
     if not transactions.empty:
         with sqlite3.connect(db_path) as conn:
-            transactions.to_sql('bank', conn, if_exists='append', index=False)
-        log(f"{len(transactions)} Transactions successfully synchronized to the automation database.")
+            # Creates the table on a fresh database, no-op otherwise
+            transactions.head(0).to_sql('bank', conn, if_exists='append', index=False)
+        ensure_bank_indexes()
+        update_columns = [column for column in BANK_REMOTE_COLUMNS if column in transactions.columns]
+        # An updated row gets the new sync date, so the incremental refreshes of the loaded frames pick it up
+        stamp_columns = ['bank_sync_date'] if 'bank_sync_date' in transactions.columns else []
+        with storage.transaction(db_path):
+            inserted, updated = storage.upsert(db_path, 'bank', transactions, key='id', update_columns=update_columns, stamp_columns=stamp_columns)
+            metrics.inc('bank_transactions_synced_total', inserted, result='inserted')
+            metrics.inc('bank_transactions_synced_total', updated, result='updated')
+            if inserted or updated:
+                invalidate_shared_data('bank')
+            # Only advance the watermark together with its rows
+            if watermark:
+                set_bank_watermark(db_path, watermark)
+        log(f"{inserted} Transactions successfully synchronized to the automation database.")
+        if updated:
+            log(f"{updated} transactions changed remotely and were updated.")
+        if inserted + updated < len(transactions):
+            log(f"{len(transactions) - inserted - updated} transactions were already in the automation database.")
+    elif watermark:
+        set_bank_watermark(db_path, watermark)
+
+
+def load_snapshot(name, version):
+    """Returns the columnar snapshot of a shared frame for exactly this version, or None (see snapshots.py)."""
+    if not SNAPSHOTS:
+        return None
+    frame = snapshot_store.load(name, version)
+    if frame is not None:
+        log(f"Loaded {len(frame)} rows of '{name}' from its snapshot.")
+    return frame
+
+
+def save_snapshot(name, frame, version):
+    """Writes a rebuilt shared frame's snapshot and returns the memory-mapped copy to share in its place."""
+    return snapshot_store.save(name, frame, version) if SNAPSHOTS else frame
+
+
+def invalidate_shared_data(table_name):
+    """Marks a table as changed, so every session picks up a rebuilt shared frame on its next rerun."""
+    bump_table_version(db_path, table_name)
+
+
+@st.cache_resource(show_spinner=False, max_entries=6)
+def _shared_table(table_name, version):
+    return load_data_from_sql(table_name)
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_bank_state():
+    return {'lock': threading.Lock(), 'version': None, 'frame': None}
+
+
+def _refresh_rows(df_bank, new_rows):
+    """Returns a new bank frame where new_rows replace the rows with the same id, and the rest are appended.
+
+    A new frame rather than an in-place change, since sessions may still be reading the old one.
+    """
+    return pd.concat([df_bank[~df_bank['id'].isin(new_rows['id'])], new_rows], ignore_index=True)
+
+
+def _shared_bank(version):
+    """Keeps one bank frame per process, reloading only rows synced (added or updated) since it was last loaded."""
+    state = _shared_bank_state()
+    with state['lock']:
+        if state['frame'] is None:
+            state['frame'] = load_snapshot('bank', version)
+            if state['frame'] is None:
+                state['frame'] = save_snapshot('bank', load_data_from_sql('bank'), version)
+        elif state['version'] != version:
+            df_bank = state['frame']
+            since = df_bank['bank_sync_date'].max() if df_bank['bank_sync_date'].notna().any() else None
+            new_rows = load_data_from_sql('bank', since=since)
+            if not new_rows.empty:
+                added = int((~new_rows['id'].isin(df_bank['id'])).sum())
+                df_bank = _refresh_rows(df_bank, new_rows)
+                log(f"Refreshed the shared bank data with {len(new_rows)} recently synced rows ({added} new).")
+            state['frame'] = save_snapshot('bank', df_bank, version)
+        state['version'] = version
+        return state['frame']
+
+
+def shared_table(table_name):
+    """Returns the process-wide frame for a table, reloaded only when its version changes. Treat it as read-only."""
+    version = get_table_version(db_path, table_name)
+    if table_name == 'bank':
+        return _shared_bank(version)
+    return _shared_table(table_name, version)
+
+
+def bank_date_range(start_date, end_date):
+    """Returns this session's bank rows dated within the range, loaded through the date index.
+
+    When the bank table changes, only rows synced (added or updated) since the last load are fetched; they
+    replace their old copies, and the ones whose date moved out of the range are dropped.
+    """
+    key = (str(start_date), str(end_date))
+    version = get_table_version(db_path, 'bank')
+    cached = st.session_state.get('bank_date_range')
+    if cached and cached['key'] == key and cached['version'] == version:
+        return cached['frame']
+
+    if cached and cached['key'] == key:
+        df_bank = cached['frame']
+        since = df_bank['bank_sync_date'].max() if df_bank['bank_sync_date'].notna().any() else None
+        new_rows = load_data_from_sql('bank', since=since)
+        if not new_rows.empty:
+            # The same bounds load_data_from_sql puts on 'date'
+            first_day = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+            after_last_day = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            df_bank = _refresh_rows(df_bank, new_rows)
+            df_bank = df_bank[(df_bank['date'] >= first_day) & (df_bank['date'] < after_last_day)].reset_index(drop=True)
+    else:
+        df_bank = load_data_from_sql('bank', start_date=start_date, end_date=end_date)
 
-def ensure_data(page):
-    """Ensure that the necessary data is loaded for each page, loading it if necessary."""
-    if 'logs' not in st.session_state:
-        st.session_state.logs = []
+    st.session_state.bank_date_range = {'key': key, 'version': version, 'frame': df_bank}
+    return df_bank
 
-    if page == 'page1':
-        if 'initialized' not in st.session_state:
 
-            # Fetch and sync transactions on initial load
-            transactions = found_transactions(st.session_state['start_date'], st.session_state['end_date'])
-            sync_transactions(transactions)
-            df_bank = load_data_from_sql('bank')
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _shared_client_combined(versions):
+    df_client_combined = load_snapshot('client_combined', versions)
+    if df_client_combined is not None:
+        df_client_combined.attrs['versions'] = versions
+        return df_client_combined
+    start_time = time.time()
+    df_client_combined = build_client_combined(shared_table('client'), shared_table('student'), max_students=MAX_STUDENTS_PER_CLIENT)
+    log(f"{len(df_client_combined)} clients combined with their students in {time.time() - start_time:.2f} seconds.")
+    contents_hash = store_client_combined(df_client_combined, db_path)
+    if get_value(db_path, 'client_combined_hash') != contents_hash:
+        # Stored local match results were scored against the previous clients
+        set_value(db_path, 'client_combined_hash', contents_hash)
+        bump_local_generation(db_path)
+    # The versions it was combined from, which the stage outputs and the searcher built over it are keyed on
+    df_client_combined.attrs['versions'] = versions
+    return save_snapshot('client_combined', df_client_combined, versions)
 
-            # Cache the initial fetched and synchronized data
-            st.session_state['df_bank'] = df_bank
-            st.session_state['initialized'] = True  # Mark as initialized to prevent re-fetching on reloads
 
-    if page in ['page3', 'page4']:
-        # Load data from SQL if not already loaded for these pages
-        if 'df_bank' not in st.session_state:
-            st.session_state.df_bank = load_data_from_sql('bank')
-        if 'df_client' not in st.session_state and 'df_student' not in st.session_state:
-            st.session_state.df_client = load_data_from_sql('client')
-            st.session_state.df_student = load_data_from_sql('student')
-
-    if 'df_client_combined' not in st.session_state and page in ['page3', 'page4', 'page5', 'page6']:
-        combine_clients()
-
-    if 'df_bank_terms' not in st.session_state and page == 'page4':
-        prepare_bank_terms()
-
-def prepare_bank_terms():
-    """Prepares bank search terms for matching by correctly copying df_bank first before adding new column."""
-    df_bank_terms = st.session_state.df_bank.copy()  # Correctly copy df_bank to df_bank_terms first.
-    df_bank_terms['bank search terms'] = df_bank_terms['sender'].fillna('') + ' ' + df_bank_terms['description'].fillna('')
-    st.session_state.df_bank_terms = df_bank_terms
-    log("Bank search terms prepared.")
+def combined_versions():
+    return tuple(get_table_version(db_path, table_name) for table_name in ('client', 'student', 'client_combined'))
 
 
-def combine_clients():
-    """Combines client and student dataframes and uploads to Elasticsearch."""
+def shared_client_combined():
+    """Returns the process-wide combined clients, combined and stored once per data change."""
+    return _shared_client_combined(combined_versions())
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _shared_index_sync(versions, _full_rebuild=False):
+    return upload_data_to_elasticsearch(full_rebuild=_full_rebuild)
+
+
+def sync_shared_index(full_rebuild=False):
+    """Syncs the stored combined clients to Elasticsearch once per data change.
+
+    A failed sync raises out of the cache, so it is tried again on the next call rather than remembered.
+    """
+    from elasticsearch import ApiError, TransportError
+
+    try:
+        return _shared_index_sync(combined_versions(), _full_rebuild=full_rebuild)
+    except (TransportError, ApiError, BulkSyncError) as e:
+        # Matching can go on without Elasticsearch; the stored hashes make the next sync send what was missed
+        if MATCHER_BACKEND == 'elasticsearch':
+            raise
+        log(f"Elasticsearch unavailable, index not synced: {e}")
+        return None
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _shared_client_search(versions, _df_client_combined):
     start_time = time.time()
-    df_client_combined = pd.merge(st.session_state.df_client, st.session_state.df_student, left_on='client id', right_on='associated client id')
-    df_client_combined = df_client_combined.pivot_table(
-        index=['client id', 'name', 'last name', 'email1', 'email2', 'handle', 'account number'],
-        columns=df_client_combined.groupby("client id").cumcount() + 1,
-        values=['student name', 'student last name', 'grade'],
-        aggfunc='first'
-    ).reset_index()
-    df_client_combined.columns = df_client_combined.columns.to_series().apply(
-        lambda x: ' '.join(str(y) for y in x if y).strip()
-    )
-    st.session_state.df_client_combined = df_client_combined
-    log(f"Client and student data combined in {time.time() - start_time:.2f} seconds.")
-    upload_data_to_elasticsearch(df_client_combined)
+    searcher = ClientSearch(_df_client_combined)
+    log(f"Search index over {len(searcher.frame)} combined clients built in {time.time() - start_time:.2f} seconds.")
+    return searcher
+
+
+def client_search(df_client_combined):
+    """Returns the process-wide Permissive search index over a combined clients frame, built once per combine.
+
+    It is keyed on the versions the frame was combined from rather than the current ones, so a page searching
+    the frame it displays never waits on a combine running in the background; the combine stage builds it.
+    """
+    return _shared_client_search(df_client_combined.attrs['versions'], df_client_combined)
 
 
-def upload_data_to_elasticsearch(df_client_combined):
-    """Uploads data to Elasticsearch."""
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _shared_local_matcher(versions):
+    from local_matcher import LocalMatcher
+
     start_time = time.time()
-    es = Elasticsearch(
-        'https://elastic:9200',
-        basic_auth=('elastic', 'password'),
-        verify_certs=False,
-        ssl_show_warn=False
-    )
-    index_name = "es_client_combined"
-    log("Checking if index exists.")
-    if es.indices.exists(index=index_name):
-        es.indices.delete(index=index_name)
-        log("Index exists. Deleting...")
-    es.indices.create(index=index_name)
-    log("Creating new index.")
-    actions = [
-        {
-            "_index": index_name,
-            "_id": str(record['client id']),
-            "_source": record,
-        }
-        for record in df_client_combined.to_dict(orient='records')
-    ]
-    helpers.bulk(es, actions)
-    es.indices.refresh(index=index_name)
-    log(f"Data uploaded to Elasticsearch in {time.time() - start_time:.2f} seconds.")
-
-
-def get_highest_relevance_clientid(dataframe, index_name, min_score_difference=1.0):
-    """Finds the highest relevance client ID for each bank search term."""
+    matcher = LocalMatcher(shared_client_combined())
+    log(f"Local matcher built over {len(matcher.client_ids)} combined clients in {time.time() - start_time:.2f} seconds.")
+    return matcher
+
+
+def local_matcher():
+    """Returns the process-wide local matcher, rebuilt once per combine."""
+    return _shared_local_matcher(combined_versions())
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _shared_exact_matcher(versions):
     start_time = time.time()
-    es = Elasticsearch(
-        'https://elastic:9200',
-        basic_auth=('elastic', 'password'),
-        verify_certs=False,
-        ssl_show_warn=False
-    )
-    def get_clientid(text):
-        if not text.strip():
-            log(f"Skipped searching due to empty search terms.")
-            return None
-
-        query = Q('multi_match', query=text.strip(), fields=['*'], type='best_fields', minimum_should_match="1") # asciifolding, lowercase, ngram, tie_breaker, ^importance
-        s = Search(using=es, index=index_name).query(query).extra(size=2)
-        response = s.execute()
-        log(f"Searching for: {text.strip()}")
-
-        if len(response.hits) > 0:
-            top_hit = response.hits[0]
-            log(f"Match found: ID {top_hit.meta.id} with score {top_hit.meta.score:.2f}")
-            if len(response.hits) == 1:
-                return top_hit.meta.id
-            elif (top_hit.meta.score - response.hits[1].meta.score >= 1.0):
-                return top_hit.meta.id
-            else:
-                log(f"Ambiguity detected. Close scores between top matches.")
-        else:
-            log(f"No matches found.")
-        return None
+    matcher = ExactMatcher(shared_client_combined())
+    log(f"Exact key indexes built with {len(matcher)} account numbers, emails and handles in {time.time() - start_time:.2f} seconds.")
+    return matcher
+
+
+def exact_matcher():
+    """Returns the process-wide exact key matcher, rebuilt once per combine."""
+    return _shared_exact_matcher(combined_versions())
+
+
+def matcher_backend(backend=None):
+    """Resolves a matcher backend name, turning 'auto' into 'elasticsearch' while the cluster is healthy and 'local' otherwise."""
+    backend = backend or MATCHER_BACKEND
+    if backend == 'auto':
+        from es_client import health as es_health
+        backend = 'elasticsearch' if es_health()['ok'] else 'local'
+    if backend not in ('elasticsearch', 'local'):
+        raise ValueError(f"Unknown matcher backend '{backend}', expected 'elasticsearch', 'local' or 'auto'.")
+    return backend
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _shared_bank_terms(version):
+    df_bank_terms = load_snapshot('bank_terms', version)
+    if df_bank_terms is not None:
+        return df_bank_terms
+    df_bank_terms = shared_table('bank').copy()
+    df_bank_terms['bank search terms'] = df_bank_terms['sender'].fillna('') + ' ' + df_bank_terms['description'].fillna('')
+    log("Bank search terms prepared.")
+    return save_snapshot('bank_terms', df_bank_terms, version)
+
+
+def match_generation(backend):
+    """Returns the generation a stored result from a resolved backend must carry to be current."""
+    return get_index_generation(db_path) if backend == 'elasticsearch' else get_local_generation(db_path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _shared_bank_matched(bank_version, match_version, backend, generation):
+    df_bank_terms = _shared_bank_terms(bank_version)
+    keys = normalize_search_terms(df_bank_terms['bank search terms'])
+    df_matches = bank_matches.load()
+    stored = df_matches.set_index('id')
+    df_bank_matched = df_bank_terms.drop(columns='bank search terms')
+    df_bank_matched['matched client id'] = df_bank_matched['id'].map(stored['client_id']).astype('Int64')
+    df_bank_matched['match score'] = df_bank_matched['id'].map(stored['score']).astype('float64')
+    df_bank_matched['match score margin'] = df_bank_matched['id'].map(stored['margin']).astype('float64')
+    df_bank_matched['match method'] = df_bank_matched['id'].map(stored['method'])
+    df_bank_matched['matched at'] = df_bank_matched['id'].map(stored['matched_at'])
+    df_bank_matched.attrs['pending'] = int(pending_mask(df_bank_terms, keys, df_matches, backend, generation).sum())
+    return df_bank_matched
+
+
+def shared_bank_matched():
+    """Returns the bank transactions with their stored match results, rebuilt once per bank or result change.
+
+    attrs['pending'] counts the transactions whose result is missing or from an older generation or search term.
+    """
+    backend = matcher_backend()
+    return _shared_bank_matched(get_table_version(db_path, 'bank'), get_table_version(db_path, 'bank_match'), backend, match_generation(backend))
+
+
+def ensure_data(page):
+    """Points the session at the latest completed shared data for a page, queuing background jobs for what is stale.
+
+    Pages render right away from whatever is ready; job_progress() polls the jobs and reruns the page when they finish.
+    """
+    if 'logs' not in st.session_state:
+        st.session_state.logs = log_buffer()
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = []
+    metrics_server()
+    collect_finished_jobs()
+
+    if page == 'page1':
+        if 'initialized' not in st.session_state:
+            # Fetch and sync transactions on initial load
+            fetch_transactions_job(st.session_state['start_date'], st.session_state['end_date'])
+            st.session_state['initialized'] = True  # Mark as initialized to prevent re-fetching on reloads
 
-    dataframe['matched client id'] = dataframe['bank search terms'].apply(get_clientid).astype('Int64')
-    log(f"Elasticsearch queries completed in {time.time() - start_time:.2f} seconds.")
+    # Sessions only hold references; frames are rebuilt once per data change for all of them
+    if page in ['page3', 'page4']:
+        st.session_state.df_bank = shared_table('bank')
+    if page in ['page2', 'page3', 'page4']:
+        st.session_state.df_client = shared_table('client')
+        st.session_state.df_student = shared_table('student')
+
+    if page in ['page4', 'page5']:
+        st.session_state.df_bank_matched = shared_bank_matched()
+        if st.session_state.df_bank_matched.attrs['pending'] and retry_due('match'):
+            submit_job(['match'])
+
+    if page in ['page3', 'page4', 'page5', 'page6']:
+        # On the matching pages a stale combine runs on through matching, as the index change leaves results to redo
+        df_client_combined = pipeline_output('combine', targets=['match'] if page in ['page4', 'page5'] else ['index'])
+        if df_client_combined is not None:
+            st.session_state.df_client_combined = df_client_combined
+
+
+@timed()
+def build_client_combined(df_client, df_student, max_students=None):
+    """Puts each client and up to max_students of their students in one row ('grade 1', 'student name 1', ...).
+
+    Clients without students or with empty fields are kept, and rows come out sorted by client id.
+    """
+    students = df_student.assign(n=df_student.groupby('associated client id').cumcount() + 1)
+    if max_students is not None:
+        students = students[students['n'] <= max_students]
+    wide = students.set_index(['associated client id', 'n'])[['grade', 'student last name', 'student name']].unstack('n')
+    wide.columns = [f"{value} {n}" for value, n in wide.columns]
+    df_client_combined = df_client.merge(wide, left_on='client id', right_index=True, how='left')
+    return df_client_combined.sort_values('client id', kind='stable').reset_index(drop=True)
+
+
+@timed()
+def combine_clients(full_rebuild=False):
+    """Queues a recombine of client and student data for every session, and its upload to Elasticsearch."""
+    invalidate_shared_data('client_combined')
+    return submit_job(['index'], full_rebuild=full_rebuild)
+
+
+@timed()
+def upload_data_to_elasticsearch(full_rebuild=False):
+    """Streams the stored combined clients to the Elasticsearch alias, sending only changed or removed documents."""
+    from es_client import get_client as get_es_client
+
+    es = get_es_client()
+    report = sync_client_index(es, db_path, alias=INDEX_ALIAS, full_rebuild=full_rebuild)
+    if report['mode'] == 'rebuild':
+        log(f"Rebuilt index '{report['index']}' and pointed alias '{INDEX_ALIAS}' to it.")
+    log(f"Index sync: {report['skipped']} skipped, {report['updated']} updated, {report['deleted']} deleted in {report['seconds']:.2f} seconds.")
+
+    if report['updated'] or report['deleted']:
+        # Cached matches were scored against the previous index contents
+        generation = bump_index_generation(db_path)
+        match_cache.invalidate(keep_generation=generation)
+    return report
+
+
+def match_query(text):
+    """Returns the query a bank search term is matched with: any of its words in the folded copy of every column."""
+    from elasticsearch_dsl import Q
+
+    return Q('match', **{SEARCH_FIELD: {'query': text, 'minimum_should_match': "1"}})
+
+
+@timed()
+def _msearch_clientids(es, index_name, texts, min_score_difference):
+    """Runs one _msearch request for a batch of search terms, returning (client id, top score, score margin) per term."""
+    from elasticsearch_dsl import MultiSearch, Search
+
+    ms = MultiSearch(using=es, index=index_name)
+    for text in texts:
+        ms = ms.add(Search().query(match_query(text)).extra(size=2))
+
+    results = []
+    for response in ms.execute():
+        hits = response.hits
+        if len(hits) == 0:
+            results.append((None, None, None))
+        elif len(hits) == 1:
+            results.append((int(hits[0].meta.id), hits[0].meta.score, hits[0].meta.score))
+        else:
+            margin = hits[0].meta.score - hits[1].meta.score
+            results.append((int(hits[0].meta.id) if margin >= min_score_difference else None, hits[0].meta.score, margin))
+    return results
+
+
+@timed()
+def get_highest_relevance_clientid(dataframe, index_name, min_score_difference=1.0, batch_size=200, max_workers=4, es=None, use_cache=True, backend=None, prematch=None):
+    """Finds the highest relevance client ID for each bank search term.
+
+    With prematch (default: EXACT_PREMATCH from config), terms holding a client's exact account number, email
+    or handle are resolved first without a search (see exact_match.py), and only the rest are fuzzy matched.
+    The Elasticsearch backend sends the terms in concurrent _msearch batches, and results already cached for the
+    current index generation skip it. The local backend scores all terms in-process (see local_matcher.py).
+    backend defaults to MATCHER_BACKEND from config. Identical terms are searched once.
+    Writes 'matched client id', 'match score' (the top score) and 'match score margin' (top-1 minus top-2 score,
+    or the top score when there is a single hit), both empty for exact matches, and 'match method' ('exact' or
+    the backend the term went to).
+    """
+    start_time = time.time()
+    backend = matcher_backend(backend)
+    if backend == 'elasticsearch' and es is None:
+        from es_client import get_client as get_es_client
+        es = get_es_client()
+    # The cache holds Elasticsearch results; the local matcher is cheap enough to rerun
+    use_cache = use_cache and backend == 'elasticsearch'
+
+    dataframe = dataframe.copy()  # the bank frames are shared across sessions
+    keys = normalize_search_terms(dataframe['bank search terms'])
+    empty = int((keys == '').sum())
+    if empty:
+        log(f"Skipped searching {empty} rows due to empty search terms.")
+    unique_keys = [key for key in keys.unique() if key]
+
+    exact = {}
+    if EXACT_PREMATCH if prematch is None else prematch:
+        prematch_start = time.perf_counter()
+        resolved = exact_matcher().match(pd.Series(unique_keys, dtype=object))
+        exact = {key: (int(client_id), None, None) for key, client_id in zip(unique_keys, resolved) if not pd.isna(client_id)}
+        prematch_seconds = time.perf_counter() - prematch_start
+        metrics.inc('match_terms_total', len(exact), source='exact')
+    fuzzy_keys = [key for key in unique_keys if key not in exact]
+
+    found = {}
+    if use_cache:
+        generation = get_index_generation(db_path)
+        found = match_cache.get_many(fuzzy_keys, generation)
+    pending = [key for key in fuzzy_keys if key not in found]
+    fuzzy_start = time.perf_counter()
+
+    if backend == 'local':
+        searched = dict(zip(pending, local_matcher().match(pending, min_score_difference)))
+        log(f"Local matcher scored {len(pending)} unique search terms.")
+    else:
+        # Search threads must not touch st.session_state, so all logging stays on the calling thread
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        results_in_order = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch in executor.map(lambda batch: _msearch_clientids(es, index_name, batch, min_score_difference), batches):
+                results_in_order.extend(batch)
+        searched = dict(zip(pending, results_in_order))
+    fuzzy_seconds = time.perf_counter() - fuzzy_start
+    if use_cache:
+        match_cache.put_many(searched, generation)
+        log(f"Match cache: {len(found)} of {len(fuzzy_keys)} unique search terms cached, {len(pending)} sent to Elasticsearch in {len(batches)} _msearch batches.")
+        stats = match_cache.stats()
+        log(f"Match cache since start: {stats['hit_rate']:.1%} hit rate ({stats['hits']} hits, {stats['misses']} misses), {stats['evictions']} evictions.")
+    found.update(searched)
+    metrics.inc('match_terms_total', len(found) - len(searched), source='cache')
+    metrics.inc('match_terms_total', len(searched), source=backend)
+
+    no_hits = sum(1 for _, _, margin in found.values() if margin is None)
+    ambiguous = sum(1 for client_id, _, margin in found.values() if client_id is None and margin is not None)
+    log(f"Matched {len(found) - no_hits - ambiguous} of {len(found)} unique search terms with {backend} ({ambiguous} ambiguous, {no_hits} without matches).")
+    if exact:
+        # What the exactly matched terms would have cost at this call's fuzzy matching rate
+        saved = len(exact) * fuzzy_seconds / len(pending) - prematch_seconds if pending else 0.0
+        log(f"Exact keys resolved {len(exact)} of {len(unique_keys)} unique search terms in {prematch_seconds:.2f} seconds, saving about {saved:.2f} seconds of {backend} matching.")
+    found.update(exact)
+
+    results = keys.map(lambda key: found.get(key, (None, None, None)))
+    dataframe['matched client id'] = results.str[0].astype('Int64')
+    dataframe['match score'] = results.str[1].astype('float64')
+    dataframe['match score margin'] = results.str[2].astype('float64')
+    dataframe['match method'] = keys.map(lambda key: 'exact' if key in exact else backend if key else None)
+    if len(dataframe):
+        by_exact = int((dataframe['match method'] == 'exact').sum())
+        by_fuzzy = int(dataframe['matched client id'].notna().sum()) - by_exact
+        log(f"Rows resolved: {by_exact / len(dataframe):.1%} by exact keys, {by_fuzzy / len(dataframe):.1%} by {backend}, "
+            f"{1 - (by_exact + by_fuzzy) / len(dataframe):.1%} unresolved.")
+    log(f"{'Elasticsearch queries' if backend == 'elasticsearch' else 'Local matching'} completed in {time.time() - start_time:.2f} seconds.")
+    msearch = metrics.histogram('es_request_seconds', endpoint='POST _msearch')
+    if backend == 'elasticsearch' and pending and msearch:
+        errors = metrics.snapshot()['counters'].get('es_request_errors_total{endpoint="POST _msearch"}', 0)
+        log(f"_msearch latency over {msearch['count']} requests: p50 {msearch['p50_ms']:.0f} ms, p95 {msearch['p95_ms']:.0f} ms, {errors} errors.")
     return dataframe
 
 
 def search_index():
     """Searches an Elasticsearch index or a DataFrame and displays results in Streamlit, updated dynamically."""
+    from st_keyup import st_keyup
+
     search_type = st.radio('Select search type:', ['Permissive', 'Elastic ClientID for Bank Transactions'], index=0, horizontal=True, label_visibility="collapsed")
-    query = st_keyup('Enter search words:', key="search_query", label_visibility="collapsed", placeholder="Type search terms to start filtering through all combined databases..")  # Dynamic input
+    query = st_keyup('Enter search words:', key="search_query", label_visibility="collapsed", debounce=SEARCH_DEBOUNCE_MS, placeholder="Type search terms to start filtering through all combined databases..")  # Dynamic input
 
     if search_type == 'Permissive':
         if 'df_client_combined' in st.session_state:
-            df = st.session_state.df_client_combined
+            searcher = client_search(st.session_state.df_client_combined)
+            df = searcher.frame
             if query:  # Filter DataFrame based on input
-                filter_condition = df.apply(lambda row: query.lower() in str(row).lower(), axis=1)
-                filtered_df = df[filter_condition]
+                # While typing, a query that extends the previous one can only narrow its matches
+                previous = st.session_state.get('permissive_search')
+                within = None
+                if previous and previous['searcher'] is searcher and query.startswith(previous['query']):
+                    within = previous['positions']
+                positions = searcher.search(query, within=within)
+                st.session_state.permissive_search = {'searcher': searcher, 'query': query, 'positions': positions}
+                filtered_df = df.iloc[positions[:SEARCH_RESULT_LIMIT]]
+                st.caption(f"Showing {len(filtered_df)} of {len(positions)} matching clients.")
                 st.dataframe(filtered_df, hide_index=True, width=2000, column_config={"client id": st.column_config.NumberColumn(format="%f")})
-            else:  # No input, display the whole DataFrame
-                st.dataframe(df, hide_index=True, width=2000, column_config={"client id": st.column_config.NumberColumn(format="%f")})
+            else:  # No input, display the first rows of the whole DataFrame
+                st.caption(f"Showing {min(len(df), SEARCH_RESULT_LIMIT)} of {len(df)} clients.")
+                st.dataframe(df.head(SEARCH_RESULT_LIMIT), hide_index=True, width=2000, column_config={"client id": st.column_config.NumberColumn(format="%f")})
+        elif st.session_state.get('jobs'):
+            st.info("Combining clients and students in the background...")
         else:
             st.error("Data is not available. Please run the combine clients process.")
 
     else:  # Bank transaction ClientID option
-        # Elasticsearch connection
-        es = Elasticsearch(
-            'https://elastic:9200',
-            http_auth=('elastic', 'password'),
-            verify_certs=False,
-            ssl_show_warn=False
-        )
-        index_name = 'es_client_combined'
+        from elasticsearch_dsl import Q, Search
+        from es_client import get_client as get_es_client, health as es_health
+
+        # Shared Elasticsearch connection
+        es = get_es_client()
+        index_name = INDEX_ALIAS
+        status = es_health()
+        if not status['ok']:
+            st.error(f"Elasticsearch is not available: {status['error'] or status['status']}")
+            return
 
         # Adjust the Elasticsearch query based on user input
         if query:
-            search_query = Q('multi_match', query=query, fields=['*'], type='best_fields')  # asciifolding, lowercase, ngram, tie_breaker, ^importance
+            # Whole words and word prefixes (edge n-grams) of the folded copy of every column
+            search_query = Q('multi_match', query=query, fields=[SEARCH_FIELD, f'{SEARCH_FIELD}.prefix'], type='most_fields')
         else:
             search_query = Q('match_all')
 
@@ -284,3 +755,176 @@ def search_index():
         else:
             st.write("No results found.")
 
+
+def _stage_fetch(inputs, from_date=None, to_date=None, **params):
+    return found_transactions(from_date, to_date)
+
+
+def _stage_sync(inputs, **params):
+    sync_transactions(inputs['fetch'])
+
+
+def _stage_combine(inputs, **params):
+    versions = combined_versions()
+    df_client_combined = _shared_client_combined(versions)
+    client_search(df_client_combined)
+    return df_client_combined
+
+
+def _stage_index(inputs, full_rebuild=False, **params):
+    return sync_shared_index(full_rebuild=full_rebuild)
+
+
+def _stage_preload(inputs, **params):
+    """Loads the shared frames and builds the matchers the pages would otherwise build on a first render (see warmup.py)."""
+    for table_name in ('bank', 'client', 'student'):
+        shared_table(table_name)
+    shared_bank_matched()
+    exact_matcher()
+    if matcher_backend() == 'local':
+        local_matcher()
+
+
+def _stage_match(inputs, **params):
+    """Matches the transactions without a current stored result, storing each chunk as soon as it is done."""
+    backend = matcher_backend()
+    generation = match_generation(backend)
+    df_bank_terms = _shared_bank_terms(get_table_version(db_path, 'bank'))
+    keys = normalize_search_terms(df_bank_terms['bank search terms'])
+    pending = pending_mask(df_bank_terms, keys, bank_matches.load(), backend, generation)
+    df_pending, keys = df_bank_terms[pending], keys[pending]
+    log(f"{len(df_pending)} of {len(df_bank_terms)} transactions need matching against {backend} generation {generation}.")
+
+    columns = ['matched client id', 'match score', 'match score margin', 'match method']
+    for start in range(0, len(df_pending), MATCH_CHUNK_ROWS):
+        chunk = get_highest_relevance_clientid(df_pending.iloc[start:start + MATCH_CHUNK_ROWS], INDEX_ALIAS, backend=backend)
+        results = chunk[columns].astype(object).where(chunk[columns].notna(), None).itertuples(index=False, name=None)
+        bank_matches.store(chunk['id'], keys.iloc[start:start + MATCH_CHUNK_ROWS], results, backend, generation)
+        invalidate_shared_data('bank_match')
+        report_progress(min(start + MATCH_CHUNK_ROWS, len(df_pending)) / len(df_pending))
+
+
+def _stage_erp(inputs, **params):
+    """Adds newly matched incoming payments to the ERP outbox, then posts every payment due in it to the ERP."""
+    queued = erp_outbox.enqueue(build_payments(shared_bank_matched(), erp_outbox.load()))
+    log(f"{queued} matched payments added to the ERP outbox.")
+    report = export_payments(
+        erp_outbox, erp_connector(), batch_size=ERP_BATCH_SIZE, workers=ERP_WORKERS,
+        progress=lambda done, total: report_progress(done / total if total else 1.0)
+    )
+    report['queued'] = queued
+    log(
+        f"{report['sent']} payments posted to the ERP ({report['duplicates']} already there) in {report['batches']} batches, "
+        f"{report['payments_per_second']:.0f} payments/s; {report['rejected']} rejected, {report['failed']} in failed batches."
+    )
+    return report
+
+
+# Stage: (function, stages whose output it needs, stages it waits for when they run in the same job)
+PIPELINE = {
+    'fetch': (_stage_fetch, (), ()),
+    'sync': (_stage_sync, ('fetch',), ()),
+    'combine': (_stage_combine, (), ()),
+    'index': (_stage_index, ('combine',), ()),
+    'match': (_stage_match, ('index',), ('sync',)),
+    'erp': (_stage_erp, (), ('match',)),
+    'preload': (_stage_preload, (), ('combine',)),
+}
+
+# Tables whose versions a stage output reflects; the output is stale once any of them changes
+STAGE_TABLES = {
+    'combine': ('client', 'student', 'client_combined'),
+}
+
+
+@st.cache_resource(show_spinner=False)
+def job_runner():
+    """One background job runner per process, shared by every session."""
+    return JobRunner(db_path, PIPELINE)
+
+
+def submit_job(targets, **params):
+    """Queues a job running the target stages (and the stages they need), and follows it from this session."""
+    job_id = job_runner().submit(targets, **params)
+    if job_id not in st.session_state.jobs:
+        st.session_state.jobs.append(job_id)
+    return job_id
+
+
+def fetch_transactions_job(from_date, to_date):
+    """Queues a fetch and sync of the remote bank transactions within a date range."""
+    return submit_job(['sync'], from_date=str(pd.Timestamp(from_date).date()), to_date=str(pd.Timestamp(to_date).date()))
+
+
+def match_job():
+    return submit_job(['match'])
+
+
+def erp_sync_job():
+    """Queues a job posting the matched payments to the ERP, after matching what is pending."""
+    return submit_job(['match', 'erp'] if st.session_state.df_bank_matched.attrs['pending'] else ['erp'])
+
+
+def erp_status():
+    """Returns the outbox counts per status, the report of the last ERP sync (or None) and the failed payments."""
+    latest = job_runner().latest('erp')
+    df_outbox = erp_outbox.load()
+    return erp_outbox.counts(), latest['output'] if latest else None, df_outbox[df_outbox['status'] == 'failed']
+
+
+def retry_due(stage):
+    """Tells whether a stage may be queued again; after a failure, reruns wait a while rather than retrying on every poll."""
+    failed = job_runner().seconds_since_failure(stage)
+    return failed is None or failed > JOB_RETRY_SECONDS
+
+
+def pipeline_output(stage, targets=None):
+    """Returns the latest completed output of a stage, or None before its first run.
+
+    When that output is missing or its tables have changed since, a job running targets (default: the stage)
+    is queued; an equal job that is already running is joined instead.
+    """
+    runner = job_runner()
+    latest = runner.latest(stage)
+    output = latest['output'] if latest else None
+    versions = tuple(get_table_version(db_path, table_name) for table_name in STAGE_TABLES[stage])
+    if (output is None or output.attrs.get('versions') != versions) and retry_due(stage):
+        submit_job(targets or [stage])
+    return output
+
+
+def collect_finished_jobs():
+    """Moves the log lines of this session's finished jobs into its logs, and stops following those jobs."""
+    runner = job_runner()
+    following = []
+    for job_id in st.session_state.jobs:
+        job = runner.job(job_id)
+        if job is None:
+            continue
+        if job['status'] in ('queued', 'running'):
+            following.append(job_id)
+            continue
+        st.session_state.logs.extend(job['logs'])
+        if job['status'] == 'failed':
+            st.session_state.logs.append(f"{datetime.now().strftime('%d-%m-%Y - %H:%M')}     job {job_id}\t\t{job['error']}")
+    st.session_state.jobs = following
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress():
+    runner = job_runner()
+    jobs = [job for job in (runner.job(job_id) for job_id in st.session_state.jobs) if job]
+    if not any(job['status'] in ('queued', 'running') for job in jobs):
+        st.rerun()
+    for job in jobs:
+        stages = ', '.join(
+            f"{name} {stage['status']}" + (f" ({stage['seconds']:.1f}s)" if stage['seconds'] is not None else '')
+            for name, stage in job['stages'].items()
+        )
+        st.progress(job['progress'], text=f"Job {job['id']} {job['status']}: {stages}")
+
+
+def job_progress():
+    """Shows the progress of the background jobs this session follows, rerunning the page once they finish."""
+    if st.session_state.get('jobs'):
+        _job_progress()
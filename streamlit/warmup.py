@@ -0,0 +1,93 @@
+"""Starts the Streamlit server and warms up the shared data in the same process, reporting readiness.
+
+    python warmup.py --server.port=8501 --server.address=0.0.0.0   # what the container runs
+    python warmup.py --check                                       # healthcheck: exits 0 once warmed up
+
+The shared frames, matchers and search index are process-wide caches (st.cache_resource in utils.py), so they
+can only be built ahead of the first session inside the server process. Arguments other than --check go to
+`streamlit run Bank_API.py`.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+from config import WARMUP_STATUS_FILE
+
+MAIN_SCRIPT = 'Bank_API.py'
+# Stages of the warm-up job (see utils.PIPELINE): combined clients and Permissive search, the Elasticsearch
+# index, then the shared frames and matchers
+WARMUP_TARGETS = ['index', 'preload']
+# How often the warm-up checks on its job
+POLL_SECONDS = 0.5
+
+
+def write_status(status, path=WARMUP_STATUS_FILE):
+    """Replaces the status file in one step, so --check never reads half of it."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as status_file:
+        json.dump(status, status_file)
+    os.replace(temporary, path)
+
+
+def read_status(path=WARMUP_STATUS_FILE):
+    try:
+        with open(path, encoding='utf-8') as status_file:
+            return json.load(status_file)
+    except (OSError, ValueError):
+        return None
+
+
+def warm_up(path=WARMUP_STATUS_FILE):
+    """Imports the app and runs the warm-up job, recording its state and timings in the status file, and returns them.
+
+    The state goes from 'warming' to 'ready', to 'degraded' when a stage failed (the pages queue what is missing
+    again, so the app still serves), or to 'failed' when the app could not even be imported.
+    """
+    started = time.time()
+    status = {'state': 'warming', 'pid': os.getpid(), 'started_at': started}
+    write_status(status, path)
+    try:
+        start = time.perf_counter()
+        import utils
+        status['import_seconds'] = round(time.perf_counter() - start, 3)
+
+        runner = utils.job_runner()
+        job_id = runner.submit(WARMUP_TARGETS)
+        while (job := runner.job(job_id))['status'] in ('queued', 'running'):
+            time.sleep(POLL_SECONDS)
+        status.update(
+            state='ready' if job['status'] == 'succeeded' else 'degraded', job=job_id, error=job['error'],
+            stages={name: {'status': stage['status'], 'seconds': stage['seconds']} for name, stage in job['stages'].items()},
+        )
+        # No session follows this job, so its log goes to the container's output
+        for line in job['logs']:
+            print(line, flush=True)
+    except Exception as e:
+        status.update(state='failed', error=f"{type(e).__name__}: {e}")
+    status['seconds'] = round(time.time() - started, 3)
+    write_status(status, path)
+    print(f"Warm-up {status['state']} in {status['seconds']:.1f} seconds" + (f": {status['error']}" if status.get('error') else '.'), flush=True)
+    return status
+
+
+def check(path=WARMUP_STATUS_FILE):
+    """Prints the warm-up status and returns the healthcheck's exit code: 0 once ready or degraded, 1 otherwise."""
+    status = read_status(path)
+    print(json.dumps(status))
+    return 0 if status and status['state'] in ('ready', 'degraded') else 1
+
+
+def main(argv):
+    if argv[:1] == ['--check']:
+        return check()
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+    from streamlit.web import cli
+
+    sys.argv = ['streamlit', 'run', MAIN_SCRIPT, *argv]
+    return cli.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
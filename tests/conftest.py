@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the Streamlit app modules importable the same way the app imports them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'streamlit'))
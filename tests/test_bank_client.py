@@ -0,0 +1,21 @@
+from datetime import date
+
+from bank_client import advance_watermark, plan_ranges
+
+
+def test_backfill_before_the_covered_span_fetches_the_gap():
+    """A backfill that ends before the covered span must not leave a hole that later syncs count as covered."""
+    watermark = {'start': '2024-03-01', 'date': '2024-03-31', 'id': 500}
+
+    ranges = plan_ranges(date(2024, 1, 1), date(2024, 1, 31), watermark)
+    assert ranges == [(date(2024, 1, 1), date(2024, 2, 29), None)]
+
+    rows = [{'date': '2024-01-15', 'id': 100}, {'date': '2024-02-10', 'id': 200}]
+    watermark = advance_watermark(watermark, date(2024, 1, 1), rows)
+    assert watermark == {'start': '2024-01-01', 'date': '2024-03-31', 'id': 500}
+    assert plan_ranges(date(2024, 2, 1), date(2024, 2, 28), watermark) == []
+
+
+def test_sync_after_the_watermark_resumes_from_its_key():
+    watermark = {'start': '2024-03-01', 'date': '2024-03-31', 'id': 500}
+    assert plan_ranges(date(2024, 3, 1), date(2024, 4, 30), watermark) == [(date(2024, 3, 31), date(2024, 4, 30), '2024-03-31,500')]
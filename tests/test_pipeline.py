@@ -0,0 +1,49 @@
+import os
+import shutil
+import time
+
+import pytest
+import streamlit as st
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import ApiError
+
+import es_client
+import utils
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class UnavailableCluster:
+    """Elasticsearch client of a cluster still warming up: every API call answers 503."""
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        meta = ApiResponseMeta(503, '1.1', HttpHeaders(), 0.0, NodeConfig('http', 'localhost', 9200))
+        raise ApiError('search_phase_execution_exception', meta, {'status': 503})
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'databases')
+    shutil.copy(os.path.join(REPO_ROOT, 'databases', 'streamlit.db'), tmp_path / 'databases' / 'streamlit.db')
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    yield tmp_path
+    st.cache_resource.clear()
+
+
+def test_local_matching_runs_when_the_cluster_answers_with_errors(app_dir, monkeypatch):
+    monkeypatch.setattr(utils, 'MATCHER_BACKEND', 'local')
+    monkeypatch.setattr(es_client, 'get_client', UnavailableCluster)
+
+    runner = utils.job_runner()
+    job_id = runner.submit(['match'])
+    while (job := runner.job(job_id))['status'] in ('queued', 'running'):
+        time.sleep(0.05)
+
+    assert job['status'] == 'succeeded', job['error']
+    assert job['stages']['index']['status'] == 'succeeded'
+    assert job['stages']['match']['status'] == 'succeeded'
+    assert any('Elasticsearch unavailable' in line for line in job['logs'])
@@ -0,0 +1,54 @@
+import os
+import threading
+
+import pandas as pd
+
+import snapshots
+from snapshots import SnapshotStore
+
+
+def test_save_returns_the_frame_when_a_concurrent_save_replaced_the_snapshot(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path / 'snapshots'), str(tmp_path / 'streamlit.db'))
+    replace = os.replace
+
+    def replace_then_save_newer(source, destination):
+        replace(source, destination)
+        # Another session saves the next version between this save's replace and its load
+        monkeypatch.setattr(snapshots.os, 'replace', replace)
+        store.save('bank', pd.DataFrame({'id': [1, 2]}), version=2)
+
+    monkeypatch.setattr(snapshots.os, 'replace', replace_then_save_newer)
+    frame = pd.DataFrame({'id': [1]})
+    frame.attrs['source'] = 'sql'
+
+    saved = store.save('bank', frame, version=1)
+    assert saved is frame
+    assert store.load('bank', 1) is None
+    assert store.load('bank', 2)['id'].tolist() == [1, 2]
+
+
+def test_threads_saving_different_versions_leave_one_whole_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshots'), str(tmp_path / 'streamlit.db'))
+    frames = {version: pd.DataFrame({'id': range(200000), 'version': version}) for version in (1, 2)}
+    start = threading.Barrier(len(frames))
+    errors = []
+
+    def save_repeatedly(version):
+        start.wait()
+        try:
+            for _ in range(10):
+                store.save('bank', frames[version], version)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save_repeatedly, args=(version,)) for version in frames]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    loaded = [store.load('bank', version) for version in frames]
+    version, frame = next((version, frame) for version, frame in zip(frames, loaded) if frame is not None)
+    assert frame.equals(frames[version])
+    assert os.listdir(tmp_path / 'snapshots') == ['bank.arrow']
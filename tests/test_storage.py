@@ -0,0 +1,21 @@
+import sqlite3
+
+import pandas as pd
+
+import storage
+
+
+def test_upsert_counts_inserts_and_updates_and_stamps_updated_rows(tmp_path):
+    db_path = str(tmp_path / 'bank.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE bank (id INTEGER, amount REAL, bank_sync_date TEXT)")
+        conn.execute("CREATE UNIQUE INDEX idx_bank_id ON bank (id)")
+    first = pd.DataFrame({'id': [1, 2, 3], 'amount': [10.0, 20.0, 30.0], 'bank_sync_date': 'day 1'})
+    assert storage.upsert(db_path, 'bank', first, key='id', update_columns=['amount'], stamp_columns=['bank_sync_date']) == (3, 0)
+
+    second = pd.DataFrame({'id': [2, 3, 4], 'amount': [20.0, 35.0, 40.0], 'bank_sync_date': 'day 2'})
+    assert storage.upsert(db_path, 'bank', second, key='id', update_columns=['amount'], stamp_columns=['bank_sync_date']) == (1, 1)
+    with storage.reading(db_path) as conn:
+        rows = conn.execute("SELECT id, amount, bank_sync_date FROM bank ORDER BY id").fetchall()
+    # The unchanged row keeps its sync date; the changed one is stamped
+    assert rows == [(1, 10.0, 'day 1'), (2, 20.0, 'day 1'), (3, 35.0, 'day 2'), (4, 40.0, 'day 2')]